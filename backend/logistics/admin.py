@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Staff, Customer, GoodsCategory, Shipment, Receipt, ReceiptItem
+from .models import Staff, Customer, GoodsCategory, Shipment, ShipmentEvent, Receipt, ReceiptItem, Job, Change
 
 
 @admin.register(Staff)
@@ -37,6 +37,14 @@ class ShipmentAdmin(admin.ModelAdmin):
     search_fields = ('tracking_number', 'customer__company_name')
 
 
+@admin.register(ShipmentEvent)
+class ShipmentEventAdmin(admin.ModelAdmin):
+    list_display = ('shipment', 'from_status', 'to_status', 'created_by', 'created_at')
+    list_filter = ('to_status',)
+    search_fields = ('shipment__tracking_number', 'note')
+    raw_id_fields = ('shipment',)
+
+
 @admin.register(Receipt)
 class ReceiptAdmin(admin.ModelAdmin):
     list_display = ('receipt_number', 'customer', 'created_by', 'created_at')
@@ -49,3 +57,16 @@ class ReceiptItemAdmin(admin.ModelAdmin):
     list_display = ('description', 'receipt', 'category', 'cbm', 'unit_price', 'total_price')
     list_filter = ('category',)
     search_fields = ('description', 'receipt__receipt_number')
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'attempts', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'locked_by', 'locked_at')
+
+
+@admin.register(Change)
+class ChangeAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'object_id', 'action', 'created_at')
+    list_filter = ('kind', 'action')
@@ -0,0 +1,138 @@
+"""
+Revenue, volume and receipt time series for /analytics/.
+
+Series are read from the daily rollups kept by dashboard.py, never from receipts or
+items: ``DailyReceiptStats`` for totals, ``DailyCategoryStats`` per goods category and
+``DailyCustomerStats`` per customer. A year at day granularity is ~365 rows per group,
+and weeks and months are summed from the days in the database (``TruncWeek`` /
+``TruncMonth`` over the day column), so the cost does not grow with the item count.
+
+Revenue is receipt ``total_amount``; per category it is the items' ``total_price``,
+which adds up to the same figure. Category series count items instead of receipts,
+since a receipt can hold several categories.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+BUCKETS = {
+    'day': lambda field: F(field),
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+GROUPS = ('category', 'customer')
+DEFAULT_DAYS = 365
+MAX_GROUPS = 100
+# Periods one request may span (a little over three years of days), since every empty
+# period is filled in and grouped series return a row per period and group
+MAX_PERIODS = 1200
+CENTS = Decimal('0.01')
+CBM_PLACES = Decimal('0.001')
+
+
+def _source(group, customer, category):
+    """(rollup model, count field, group field or None) for the requested breakdown"""
+    from .models import DailyCategoryStats, DailyCustomerStats, DailyReceiptStats
+
+    if group == 'category' or category is not None:
+        return DailyCategoryStats, 'items', 'category_id' if group else None
+    if group == 'customer' or customer is not None:
+        return DailyCustomerStats, 'receipts', 'customer_id' if group else None
+    return DailyReceiptStats, 'receipts', None
+
+
+def bucket_start(day, bucket):
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def period_count(date_from, date_to, bucket):
+    """How many buckets the range from date_from to date_to (inclusive) spans"""
+    start, end = bucket_start(date_from, bucket), bucket_start(date_to, bucket)
+    if bucket == 'month':
+        return (end.year - start.year) * 12 + end.month - start.month + 1
+    return (end - start).days // (7 if bucket == 'week' else 1) + 1
+
+
+def _periods(date_from, date_to, bucket):
+    """Every bucket start from date_from's bucket to date_to's, for filling empty periods"""
+    period = bucket_start(date_from, bucket)
+    while period <= date_to:
+        yield period
+        if bucket == 'month':
+            period = date(period.year + period.month // 12, period.month % 12 + 1, 1)
+        else:
+            period += timedelta(days=7 if bucket == 'week' else 1)
+
+
+def _names(group, ids):
+    from . import categories
+    from .models import Customer
+
+    if group == 'category':
+        names = {}
+        for pk in ids:
+            category = categories.get_category(pk) if pk is not None else None
+            names[pk] = category.name if category else None
+        return names
+    return dict(Customer.objects.filter(pk__in=ids).values_list('pk', 'company_name'))
+
+
+def series(date_from, date_to, bucket='day', group=None, customer=None, category=None, limit=20):
+    """
+    Totals per bucket between two dates (inclusive), optionally per category or customer
+    (the limit groups with most revenue in the range) or for one customer or category.
+    """
+    model, count_field, group_field = _source(group, customer, category)
+    queryset = model.objects.filter(day__gte=date_from, day__lte=date_to).order_by()
+    if customer is not None:
+        queryset = queryset.filter(customer_id=customer)
+    if category is not None:
+        queryset = queryset.filter(category_id=category)
+
+    group_ids = None
+    if group_field:
+        group_ids = list(queryset.values(group_field).annotate(total=Sum('revenue'))
+                         .order_by('-total', group_field).values_list(group_field, flat=True)[:limit])
+        condition = Q(**{f'{group_field}__in': [pk for pk in group_ids if pk is not None]})
+        if None in group_ids:
+            # Items without a category
+            condition |= Q(**{f'{group_field}__isnull': True})
+        queryset = queryset.filter(condition)
+
+    keys = ['period'] + ([group_field] if group_field else [])
+    rows = (queryset.annotate(period=BUCKETS[bucket]('day')).values(*keys)
+            .annotate(count=Sum(count_field), revenue=Sum('revenue'), cbm=Sum('cbm'))
+            .order_by(*keys))
+    results = []
+    for row in rows:
+        period = row['period'].date() if hasattr(row['period'], 'date') else row['period']
+        results.append({'period': period, count_field: row['count'] or 0,
+                        'revenue': row['revenue'] or Decimal('0'), 'cbm': row['cbm'] or Decimal('0'),
+                        **({group: row[group_field]} if group_field else {})})
+
+    if not group_field:
+        # Periods without receipts are reported as zeros, so charts get an even axis
+        by_period = {result['period']: result for result in results}
+        results = [by_period.get(period) or {'period': period, count_field: 0, 'revenue': Decimal('0'),
+                                             'cbm': Decimal('0')}
+                   for period in _periods(date_from, date_to, bucket)]
+    else:
+        names = _names(group, group_ids)
+        for result in results:
+            result[f'{group}_name'] = names.get(result[group])
+
+    totals = {count_field: sum(result[count_field] for result in results),
+              'revenue': sum((result['revenue'] for result in results), Decimal('0')),
+              'cbm': sum((result['cbm'] for result in results), Decimal('0'))}
+    # Decimals as strings at the columns' scale, like the API's serializers and the dashboard
+    # payload (zeros filled in above and SQLite's sums come without it)
+    for row in results + [totals]:
+        row['revenue'] = str(row['revenue'].quantize(CENTS))
+        row['cbm'] = str(row['cbm'].quantize(CBM_PLACES))
+    return {'totals': totals, 'results': results}
@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import status
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from . import analytics
+
+
+def _error(message):
+    return Response({'error': message}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def _id(value):
+    """An id query parameter: None if absent, False if not a number"""
+    if value in (None, ''):
+        return None
+    return int(value) if value.isdigit() else False
+
+
+@api_view(['GET'])
+def analytics_series(request):
+    """
+    Receipts (or items), revenue and CBM per day, week or month, from the daily rollups.
+    ?bucket=day|week|month, ?date_from=&date_to= (default: the last 365 days),
+    ?group=category|customer (top ?limit= groups by revenue), ?customer= or ?category= to filter.
+    """
+    params = request.query_params
+    bucket = params.get('bucket', 'day')
+    if bucket not in analytics.BUCKETS:
+        return _error(f"Unknown bucket: {bucket}. Choose from {', '.join(analytics.BUCKETS)}")
+    group = params.get('group') or None
+    if group is not None and group not in analytics.GROUPS:
+        return _error(f"Unknown group: {group}. Choose from {', '.join(analytics.GROUPS)}")
+
+    try:
+        date_to = parse_date(params['date_to']) if params.get('date_to') else timezone.localdate()
+        date_from = (parse_date(params['date_from']) if params.get('date_from')
+                     else date_to - timedelta(days=analytics.DEFAULT_DAYS - 1) if date_to else None)
+    except ValueError:
+        date_from = date_to = None
+    if date_from is None or date_to is None:
+        return _error('date_from and date_to must be dates (YYYY-MM-DD)')
+    if date_from > date_to:
+        return _error('date_from must not be after date_to')
+    if analytics.period_count(date_from, date_to, bucket) > analytics.MAX_PERIODS:
+        return _error(f'The range spans more than {analytics.MAX_PERIODS} {bucket}s; '
+                      f'narrow it or use a longer bucket')
+
+    customer, category = _id(params.get('customer')), _id(params.get('category'))
+    if customer is False or category is False:
+        return _error('customer and category must be ids')
+    requested = {group, 'customer' if customer is not None else None, 'category' if category is not None else None}
+    if requested >= {'customer', 'category'}:
+        return _error('Customer and category breakdowns cannot be combined')
+    try:
+        limit = min(max(int(params.get('limit', 20)), 1), analytics.MAX_GROUPS)
+    except ValueError:
+        limit = 20
+
+    data = analytics.series(date_from, date_to, bucket=bucket, group=group, customer=customer,
+                            category=category, limit=limit)
+    return Response({
+        'bucket': bucket,
+        'group': group,
+        'date_from': date_from,
+        'date_to': date_to,
+        'totals': data['totals'],
+        'results': data['results'],
+    })
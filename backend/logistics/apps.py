@@ -2,4 +2,8 @@ from django.apps import AppConfig
 
 
 class LogisticsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
     name = 'logistics'
+
+    def ready(self):
+        from . import metrics, signals  # noqa: F401
@@ -0,0 +1,150 @@
+"""
+Async versions of the read-heavy endpoints, for serving under an ASGI server (uvicorn).
+
+DRF views are synchronous, so these are plain Django ``async def`` views. They use the
+async ORM and cache, authenticate with the same token cache as the API (a cache hit
+never leaves the event loop), and return the same JSON as their synchronous
+counterparts. Querysets are shaped from the serializers like the viewsets' are, so
+serializing a fetched page needs no further queries.
+"""
+import asyncio
+import functools
+
+from django.http import Http404, HttpResponseNotAllowed, HttpResponseNotModified, JsonResponse
+from rest_framework import exceptions
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.views import exception_handler
+
+from . import categories, dashboard, search
+from .authentication import aauthenticate
+from .models import Receipt, Shipment
+from .pagination import KeysetPagination
+from .querysets import shape_queryset
+from .serializers import ReceiptSerializer, ShipmentSerializer
+from .views import ACTIVE_CATEGORIES_KEY, ReceiptViewSet, active_categories_data, etag_matches
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+def async_api_view(view):
+    """GET-only async view that requires token authentication and maps API errors to JSON"""
+    # require_GET is not async-aware before Django 5.0, so the method is checked here
+    @functools.wraps(view)
+    async def wrapped(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+        try:
+            authenticated = await aauthenticate(request)
+            if authenticated is None:
+                raise exceptions.NotAuthenticated()
+            request.user, request.auth = authenticated
+            return await view(request, *args, **kwargs)
+        except (exceptions.APIException, Http404) as e:
+            # Same error bodies as the DRF views
+            error = exception_handler(e, {})
+            response = json_response(error.data, status=error.status_code)
+            if isinstance(e, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                response['WWW-Authenticate'] = 'Token'
+            return response
+    return wrapped
+
+
+def cancel_on_disconnect(application):
+    """
+    Wrap the ASGI application so a request is cancelled when its client disconnects.
+    Django 4.2 stops calling receive() once it has read the request body, so it never
+    sees http.disconnect, and uvicorn silently drops what is sent after it; a
+    /changes/stream/ would run on to CHANGES_STREAM_SECONDS with nobody reading.
+    Django 5.0 does this itself.
+    """
+    async def app(scope, receive, send):
+        if scope['type'] != 'http':
+            return await application(scope, receive, send)
+        body_read = asyncio.Event()
+
+        async def receive_body():
+            message = await receive()
+            if message['type'] == 'http.disconnect' or not message.get('more_body'):
+                body_read.set()
+            return message
+
+        async def disconnected():
+            await body_read.wait()
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        handler = asyncio.create_task(application(scope, receive_body, send))
+        watcher = asyncio.create_task(disconnected())
+        try:
+            await asyncio.wait({handler, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            watcher.cancel()
+            if not handler.done():
+                handler.cancel()
+                # Let the response close (and the stream unsubscribe) before returning
+                await asyncio.wait({handler})
+        if not handler.cancelled():
+            handler.result()
+    return app
+
+
+def _receipts():
+    return shape_queryset(Receipt.objects.all(), ReceiptSerializer)
+
+
+@async_api_view
+async def receipt_list(request):
+    """Async /receipts/: same filters (customer, payment_status, search) and keyset pages"""
+    receipts = _receipts()
+    for name in ReceiptViewSet.filterset_fields:
+        value = request.GET.get(name)
+        if value:
+            if name == 'customer' and not value.isdigit():
+                raise exceptions.ValidationError(
+                    {'customer': ['Select a valid choice. That choice is not one of the available choices.']})
+            receipts = receipts.filter(**{name: value})
+    text = request.GET.get('search', '').strip()
+    if text:
+        # A subquery, run with the page query
+        receipts = receipts.filter(pk__in=search.matching_ids(ReceiptViewSet.search_document_type, text))
+
+    paginator = KeysetPagination()
+    page = await paginator.apaginate_queryset(receipts, request, view=ReceiptViewSet)
+    return json_response(paginator.get_paginated_data(ReceiptSerializer(page, many=True).data))
+
+
+@async_api_view
+async def receipt_detail(request, pk):
+    try:
+        receipt = await _receipts().aget(pk=pk)
+    except Receipt.DoesNotExist:
+        raise Http404
+    return json_response(ReceiptSerializer(receipt).data)
+
+
+@async_api_view
+async def shipment_track(request, tracking_number):
+    """A shipment by tracking number"""
+    try:
+        shipment = await shape_queryset(Shipment.objects.all(), ShipmentSerializer).aget(tracking_number=tracking_number)
+    except Shipment.DoesNotExist:
+        raise Http404
+    return json_response(ShipmentSerializer(shipment).data)
+
+
+@async_api_view
+async def dashboard_stats(request):
+    return json_response(await dashboard.adashboard_stats())
+
+
+@async_api_view
+async def category_list(request):
+    """Active categories with the same versioned ETag as /categories/"""
+    version, data = await categories.aserialized(ACTIVE_CATEGORIES_KEY, active_categories_data)
+    etag = f'"categories-{version}"'
+    response = HttpResponseNotModified() if etag_matches(request, etag) else json_response(data)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
@@ -1,9 +1,10 @@
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.response import Response
 from django.contrib.auth import authenticate
 from rest_framework.authtoken.models import Token
+from logistics import authentication
 from logistics.models import Staff
 
 
@@ -109,3 +110,10 @@ def staff_profile(request):
             {'error': 'Staff profile not found'},
             status=status.HTTP_404_NOT_FOUND
         )
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def token_cache_stats(request):
+    """Hit rate of the token authentication cache in this worker process"""
+    return Response(authentication.stats())
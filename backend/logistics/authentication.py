@@ -0,0 +1,234 @@
+"""
+Token authentication with a two-level cache.
+
+DRF's ``TokenAuthentication`` joins ``authtoken_token`` to ``auth_user`` on every request,
+and views reading ``request.user.staff_profile`` add another query. Here the user and
+staff profile behind a token are snapshotted once and kept in a small per-process LRU
+(``TOKEN_CACHE_LOCAL_TTL`` seconds) in front of the shared cache (``TOKEN_CACHE_TTL``
+seconds). User objects are rebuilt from the snapshot for every request, with the
+password left deferred, so nothing is shared between requests.
+
+Entries are dropped on logout, token deletion and any ``User``/``Staff`` save (which
+covers ``is_active_staff`` changes). Other processes' LRUs only expire by TTL, which is
+why the local TTL is kept short. Without Redis (CACHE_SHARED) the shared cache is per
+process as well, so TOKEN_CACHE_TTL defaults to seconds and ``prime()`` does nothing.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+
+USER_FIELDS = ['id', 'username', 'first_name', 'last_name', 'email', 'is_staff', 'is_active',
+               'is_superuser', 'last_login', 'date_joined']
+STAFF_FIELDS = ['id', 'user_id', 'role', 'department', 'phone', 'employee_id', 'is_active_staff',
+                'created_at', 'updated_at']
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def cache_key(token_key):
+    # Never put raw tokens in cache keys
+    return 'auth:token:' + hashlib.sha256(token_key.encode('utf-8')).hexdigest()
+
+
+class LocalLRU:
+    """Thread-safe LRU of token snapshots with a per-entry TTL"""
+
+    def __init__(self):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl, max_size):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_cache = LocalLRU()
+_stats_lock = threading.Lock()
+_stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def stats():
+    """Hit/miss counters for this process since start"""
+    with _stats_lock:
+        counts = dict(_stats)
+    lookups = sum(counts.values())
+    counts['lookups'] = lookups
+    counts['hit_rate'] = round((counts['local_hits'] + counts['shared_hits']) / lookups, 4) if lookups else None
+    return counts
+
+
+def snapshot_token(token):
+    """Plain-data snapshot of a token's user and staff profile (no password hash)"""
+    user = token.user
+    try:
+        staff = user.staff_profile
+    except User.staff_profile.RelatedObjectDoesNotExist:
+        staff = None
+    return {
+        'key': token.key,
+        'created': token.created,
+        'user': {name: getattr(user, name) for name in USER_FIELDS},
+        'staff': {name: getattr(staff, name) for name in STAFF_FIELDS} if staff else None,
+    }
+
+
+def _from_snapshot(model, values, db):
+    # from_db() marks every field not given (e.g. the password) as deferred
+    fields = [field.attname for field in model._meta.concrete_fields if field.attname in values]
+    return model.from_db(db, fields, [values[name] for name in fields])
+
+
+def build_user(snapshot, db='default'):
+    """A fresh (User, Token) pair from a snapshot, with staff_profile preloaded"""
+    from .models import Staff
+
+    user = _from_snapshot(User, snapshot['user'], db)
+    staff = _from_snapshot(Staff, snapshot['staff'], db) if snapshot['staff'] else None
+    User.staff_profile.related.set_cached_value(user, staff)
+    if staff is not None:
+        Staff.user.field.set_cached_value(staff, user)
+    token = Token.from_db(db, ['key', 'user_id', 'created'], [snapshot['key'], user.pk, snapshot['created']])
+    Token.user.field.set_cached_value(token, user)
+    return user, token
+
+
+def invalidate_token(token_key):
+    """Forget a token in this process and the shared cache once the transaction commits"""
+    key = cache_key(token_key)
+    local_cache.delete(key)
+    transaction.on_commit(lambda: (local_cache.delete(key), cache.delete(key)))
+
+
+def invalidate_user(user_id):
+    for token_key in Token.objects.filter(user_id=user_id).values_list('key', flat=True):
+        invalidate_token(token_key)
+
+
+def _remember(cached_key, snapshot):
+    local_cache.set(cached_key, snapshot, _setting('TOKEN_CACHE_LOCAL_TTL', 10),
+                    _setting('TOKEN_CACHE_LOCAL_SIZE', 1024))
+
+
+def load_snapshot(key):
+    """Snapshot of the token from the database, stored in both cache levels"""
+    try:
+        token = Token.objects.select_related('user', 'user__staff_profile').get(key=key)
+    except Token.DoesNotExist:
+        raise exceptions.AuthenticationFailed('Invalid token.')
+    snapshot = snapshot_token(token)
+    cached_key = cache_key(key)
+    cache.set(cached_key, snapshot, _setting('TOKEN_CACHE_TTL', 300))
+    _remember(cached_key, snapshot)
+    return snapshot
+
+
+def prime(limit):
+    """
+    Cache the tokens of the most recently active users (e.g. at startup); returns how many.
+    Skipped without a shared cache, where the entries would only outlive their tokens.
+    """
+    if not settings.CACHE_SHARED:
+        return 0
+    tokens = (Token.objects.select_related('user', 'user__staff_profile').filter(user__is_active=True)
+              .order_by(F('user__last_login').desc(nulls_last=True))[:limit])
+    snapshots = {cache_key(token.key): snapshot_token(token) for token in tokens}
+    cache.set_many(snapshots, _setting('TOKEN_CACHE_TTL', 300))
+    for cached_key, snapshot in snapshots.items():
+        _remember(cached_key, snapshot)
+    return len(snapshots)
+
+
+def _checked(snapshot):
+    if not snapshot['user']['is_active']:
+        raise exceptions.AuthenticationFailed('User inactive or deleted.')
+    return build_user(snapshot)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """``TokenAuthentication`` backed by the local LRU and shared cache"""
+
+    def authenticate_credentials(self, key):
+        cached_key = cache_key(key)
+        snapshot = local_cache.get(cached_key)
+        if snapshot is not None:
+            _count('local_hits')
+        else:
+            snapshot = cache.get(cached_key)
+            if snapshot is not None:
+                _count('shared_hits')
+                _remember(cached_key, snapshot)
+            else:
+                _count('misses')
+                snapshot = load_snapshot(key)
+        return _checked(snapshot)
+
+
+async def aauthenticate(request):
+    """
+    Token authentication for async views: (user, token) or None without a token header.
+    Only a cache miss leaves the event loop, to load the token from the database.
+    """
+    header = get_authorization_header(request).split()
+    if not header or header[0].lower() != CachedTokenAuthentication.keyword.lower().encode():
+        return None
+    if len(header) != 2:
+        raise exceptions.AuthenticationFailed('Invalid token header.')
+    try:
+        key = header[1].decode()
+    except UnicodeError:
+        raise exceptions.AuthenticationFailed('Invalid token header. Token string should not contain invalid characters.')
+
+    cached_key = cache_key(key)
+    snapshot = local_cache.get(cached_key)
+    if snapshot is not None:
+        _count('local_hits')
+    else:
+        snapshot = await cache.aget(cached_key)
+        if snapshot is not None:
+            _count('shared_hits')
+            _remember(cached_key, snapshot)
+        else:
+            _count('misses')
+            snapshot = await sync_to_async(load_snapshot)(key)
+    return _checked(snapshot)
@@ -0,0 +1,354 @@
+"""
+Benchmark dataset and endpoint measurements.
+
+``generate()`` bulk-inserts a synthetic dataset of any size (customers, shipments in
+every status, receipts spread over past days with several items each) in constant
+memory, then rebuilds what bulk inserts skip: the search index and dashboard rollups.
+
+``run()`` requests every GET endpoint of the API router (lists, details, list/detail
+actions, each filter field and full-text search) in process through the test client,
+as a staff user, and records latency percentiles, query counts and database time per
+endpoint. Results are plain JSON, so runs from different commits can be compared with
+``compare()``.
+"""
+import json
+import platform
+import random
+import re
+import subprocess
+import time
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.test import Client
+from django.utils import timezone
+
+BENCH_USERNAME = 'benchmark'
+PAYMENT_STATUSES = ['pending', 'paid', 'paid', 'paid']
+CITIES = ['Guangzhou', 'Shenzhen', 'Yiwu', 'Shanghai', 'Ningbo', 'Tema', 'Accra', 'Kumasi', 'Lagos', 'Lome']
+GOODS = ['Furniture', 'Electronics', 'Textiles', 'Auto parts', 'Ceramic tiles', 'Cosmetics', 'Shoes',
+         'Machinery', 'Kitchenware', 'Toys', 'Lighting', 'Building materials']
+
+
+def _money(value):
+    return Decimal(value).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def _batches(total, size):
+    for start in range(0, total, size):
+        yield start, min(size, total - start)
+
+
+def generate(customers=10000, receipts=1000000, items_per_receipt=10, shipments=None, categories=20,
+             days=730, batch_size=5000, seed=42, build_search_index=True, progress=lambda message: None):
+    """Insert a synthetic dataset; returns the number of rows created per model"""
+    from . import categories as category_registry, dashboard, search
+    from .models import Customer, GoodsCategory, Receipt, ReceiptItem, Shipment, ShipmentEvent
+
+    rng = random.Random(seed)
+    shipments = customers * 5 if shipments is None else shipments
+    created = {}
+    now = timezone.now()
+
+    names = [f'Benchmark {GOODS[i % len(GOODS)]} {i // len(GOODS) + 1}' for i in range(categories)]
+    GoodsCategory.objects.bulk_create(
+        [GoodsCategory(name=name, unit_price=_money(rng.uniform(50, 400))) for name in names],
+        ignore_conflicts=True,
+    )
+    category_registry.bump_version()
+    category_prices = list(GoodsCategory.objects.filter(name__in=names).values_list('id', 'unit_price'))
+    created['categories'] = len(category_prices)
+
+    customer_ids = []
+    for start, count in _batches(customers, batch_size):
+        codes = Customer.generate_customer_codes(count)
+        batch = [Customer(
+            company_name=f'{rng.choice(CITIES)} Trading {start + i + 1}',
+            customer_code=code,
+            contact_person=f'Contact {start + i + 1}',
+            phone=f'+233{rng.randrange(10 ** 8, 10 ** 9)}',
+            email=f'customer{start + i + 1}@example.com',
+            address=f'{rng.randrange(1, 500)} Harbour Road, {rng.choice(CITIES)}',
+        ) for i, code in enumerate(codes)]
+        with transaction.atomic():
+            customer_ids.extend(customer.pk for customer in Customer.objects.bulk_create(batch))
+        progress(f'customers: {len(customer_ids)}/{customers}')
+    created['customers'] = len(customer_ids)
+
+    # Shipment i belongs to customer i % customers, so items can pick one of their customer's
+    first_tracking = (Shipment.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+    statuses = [status for status, _ in Shipment.STATUS_CHOICES]
+    shipments_by_customer = [[] for _ in customer_ids]
+    for start, count in _batches(shipments, batch_size):
+        batch = []
+        for i in range(start, start + count):
+            status = rng.choices(statuses, weights=[3, 4, 8, 1])[0]
+            shipped = now - timedelta(days=rng.randrange(days)) if status != 'pending' else None
+            batch.append(Shipment(
+                tracking_number=f'BENCH{first_tracking + i:010d}',
+                customer_id=customer_ids[i % len(customer_ids)],
+                origin=rng.choice(CITIES[:5]), destination=rng.choice(CITIES[5:]),
+                description=rng.choice(GOODS),
+                weight=_money(rng.uniform(10, 5000)),
+                status=status,
+                shipped_date=shipped,
+                estimated_delivery=shipped + timedelta(days=45) if shipped else None,
+                actual_delivery=shipped + timedelta(days=rng.randrange(35, 60)) if status == 'delivered' else None,
+            ))
+        with transaction.atomic():
+            for i, shipment in enumerate(Shipment.objects.bulk_create(batch)):
+                shipments_by_customer[(start + i) % len(customer_ids)].append(shipment.pk)
+            ShipmentEvent.objects.bulk_create(
+                ShipmentEvent(shipment_id=shipment.pk, to_status=shipment.status) for shipment in batch)
+        progress(f'shipments: {start + count}/{shipments}')
+    created['shipments'] = shipments
+
+    containers = max(1, receipts // 50)
+    items_created = 0
+    receipt_batch_size = max(1, batch_size // max(1, items_per_receipt))
+    for start, count in _batches(receipts, receipt_batch_size):
+        numbers = Receipt.generate_receipt_numbers(count)
+        batch, batch_items = [], []
+        for number in numbers:
+            customer_index = rng.randrange(len(customer_ids))
+            issued = now - timedelta(days=rng.randrange(days), seconds=rng.randrange(86400))
+            receipt = Receipt(
+                receipt_number=number,
+                customer_id=customer_ids[customer_index],
+                issue_date=issued,
+                payment_status=rng.choice(PAYMENT_STATUSES),
+                payment_method=rng.choice(['Bank transfer', 'Cash', 'Mobile money']),
+                loading_date=issued.date(),
+                eta=(issued + timedelta(days=45)).date(),
+                container_number=f'MSKU{rng.randrange(containers):07d}',
+            )
+            customer_shipments = shipments_by_customer[customer_index]
+            items = []
+            for _ in range(rng.randint(1, 2 * items_per_receipt - 1) if items_per_receipt > 1 else 1):
+                category_id, unit_price = rng.choice(category_prices)
+                cbm = Decimal(rng.uniform(0.1, 15)).quantize(Decimal('0.001'))
+                items.append(ReceiptItem(
+                    category_id=category_id, description=f'{rng.choice(GOODS)} lot {rng.randrange(1, 999)}',
+                    cbm=cbm, unit_price=unit_price, total_price=_money(cbm * unit_price),
+                    shipment_id=rng.choice(customer_shipments) if customer_shipments and rng.random() < 0.7 else None,
+                ))
+            receipt.total_amount = sum((item.total_price for item in items), Decimal('0'))
+            batch.append(receipt)
+            batch_items.append(items)
+        with transaction.atomic():
+            Receipt.objects.bulk_create(batch)
+            for receipt, items in zip(batch, batch_items):
+                for item in items:
+                    item.receipt_id = receipt.pk
+            flat = [item for items in batch_items for item in items]
+            ReceiptItem.objects.bulk_create(flat)
+            items_created += len(flat)
+        progress(f'receipts: {start + count}/{receipts} ({items_created} items)')
+    created['receipts'] = receipts
+    created['receipt_items'] = items_created
+
+    # Bulk inserts skip the signal handlers that maintain these
+    progress('rebuilding dashboard rollups')
+    dashboard.rebuild()
+    if build_search_index:
+        for model in (Customer, Shipment, Receipt):
+            progress(f'indexing {model._meta.verbose_name_plural}')
+            search.index_queryset(model.objects.all())
+    return created
+
+
+def benchmark_client():
+    """Test client authenticated as the benchmark staff user (created on first use)"""
+    from rest_framework.authtoken.models import Token
+
+    from .models import Staff
+
+    user, _ = User.objects.get_or_create(username=BENCH_USERNAME, defaults={'is_staff': True})
+    Staff.objects.get_or_create(user=user, defaults={'role': 'admin'})
+    token, _ = Token.objects.get_or_create(user=user)
+    return Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+
+def _sample(model):
+    """A row from the middle of the table, so lookups are not all at one end of an index"""
+    bounds = model.objects.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return None
+    return model.objects.filter(pk__gte=(bounds['low'] + bounds['high']) // 2).order_by('pk').first()
+
+
+def _search_term(obj):
+    from . import search
+
+    entry = search._builders().get(type(obj))
+    if entry is None:
+        return None
+    words = search.query_terms(entry[1](obj)[0])
+    return max(words, key=len) if words else None
+
+
+def endpoints():
+    """[(name, path)] for every GET endpoint of the router, with sample ids, filters and searches"""
+    from .models import Customer, Shipment
+    from .search import FullTextSearchFilter
+    from .urls import router
+
+    cases = []
+    for prefix, viewset, _ in router.registry:
+        model = viewset.queryset.model
+        sample = _sample(model)
+        cases.append((f'{prefix} list', f'/{prefix}/'))
+        for field in getattr(viewset, 'filterset_fields', []):
+            value = getattr(sample, model._meta.get_field(field).attname, None) if sample else None
+            if value not in (None, ''):
+                cases.append((f'{prefix} list ?{field}', f'/{prefix}/?{field}={value}'))
+        if FullTextSearchFilter in getattr(viewset, 'filter_backends', []) and sample:
+            term = _search_term(sample)
+            if term:
+                cases.append((f'{prefix} list ?search', f'/{prefix}/?search={term}'))
+        lookup = None
+        if sample:
+            lookup = sample.pk if viewset.lookup_field == 'pk' else getattr(
+                sample, model._meta.get_field(viewset.lookup_field).attname)
+            cases.append((f'{prefix} detail', f'/{prefix}/{lookup}/'))
+        for action in viewset.get_extra_actions():
+            # Actions taking URL arguments (e.g. export formats) are left to their own benchmarks
+            if 'get' not in action.mapping or '(' in action.url_path:
+                continue
+            if action.detail:
+                if sample:
+                    cases.append((f'{prefix} {action.url_path}', f'/{prefix}/{lookup}/{action.url_path}/'))
+            else:
+                cases.append((f'{prefix} {action.url_path}', f'/{prefix}/{action.url_path}/'))
+    customer = _sample(Customer)
+    term = _search_term(customer) if customer else None
+    if term:
+        cases.append(('global search', f'/search/?q={term}'))
+    shipment = _sample(Shipment)
+    if shipment:
+        cases.append(('track', f'/track/{shipment.tracking_number}/'))
+    cases += [('container fill', '/containers/fill/'), ('container plan', '/containers/plan/'),
+              ('analytics daily', '/analytics/'), ('analytics monthly by category', '/analytics/?bucket=month&group=category'),
+              ('analytics weekly by customer', '/analytics/?bucket=week&group=customer')]
+    return cases
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))]
+
+
+_DB_TIMING = re.compile(r'(?:^|,\s*)db;dur=([\d.]+)')
+
+
+def _request(client, path):
+    started = time.perf_counter()
+    response = client.get(path)
+    body = b''.join(response.streaming_content) if response.streaming else response.content
+    elapsed = (time.perf_counter() - started) * 1000
+    db_timing = _DB_TIMING.search(response.get('Server-Timing', ''))
+    return response.status_code, elapsed, len(body), float(db_timing.group(1)) if db_timing else None
+
+
+def measure(client, name, path, requests=20, warmup=2):
+    for _ in range(warmup):
+        _request(client, path)
+    # Counted with a wrapper: connection.queries stops growing once DEBUG fills its log
+    queries = []
+    with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+        status, _, size, _ = _request(client, path)
+    timings, db_timings = [], []
+    for _ in range(requests):
+        _, elapsed, _, db_ms = _request(client, path)
+        timings.append(elapsed)
+        if db_ms is not None:
+            db_timings.append(db_ms)
+    return {
+        'name': name, 'path': path, 'status': status, 'requests': requests,
+        'min_ms': round(min(timings), 2),
+        'p50_ms': round(percentile(timings, 0.5), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'p99_ms': round(percentile(timings, 0.99), 2),
+        'max_ms': round(max(timings), 2),
+        'mean_ms': round(sum(timings) / len(timings), 2),
+        'db_p50_ms': round(percentile(db_timings, 0.5), 2) if db_timings else None,
+        'queries': len(queries),
+        'bytes': size,
+    }
+
+
+def _git(*args):
+    try:
+        return subprocess.run(['git', *args], cwd=settings.BASE_DIR, capture_output=True, text=True,
+                              timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def dataset_counts():
+    from .models import Customer, Receipt, ReceiptItem, Shipment
+
+    tables = {model._meta.db_table: model for model in (Customer, Shipment, Receipt, ReceiptItem)}
+    estimates = {}
+    if connection.vendor == 'postgresql':
+        # Exact counts of 10M-row tables take seconds, so big tables use the planner's estimate
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT relname, reltuples::bigint FROM pg_class WHERE relname = ANY(%s)', [list(tables)])
+            estimates = dict(cursor.fetchall())
+    return {table: estimates[table] if estimates.get(table, 0) >= 1000000 else model.objects.count()
+            for table, model in tables.items()}
+
+
+def run(requests=20, warmup=2, only=None, progress=lambda result: None):
+    """Measure every endpoint (names containing only, if given); returns the JSON-able report"""
+    client = benchmark_client()
+    results = []
+    for name, path in endpoints():
+        if only and only not in name:
+            continue
+        result = measure(client, name, path, requests=requests, warmup=warmup)
+        results.append(result)
+        progress(result)
+    return {
+        'meta': {
+            'commit': _git('rev-parse', 'HEAD'),
+            'dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'dataset': dataset_counts(),
+            'requests': requests,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold=0.2, min_ms=2.0):
+    """
+    Per-endpoint changes between two reports: [(name, baseline, current, regressed)].
+    An endpoint regressed if its p95 grew by more than threshold (and min_ms, to ignore
+    noise on fast endpoints) or it makes more queries.
+    """
+    before = {result['name']: result for result in baseline['results']}
+    changes = []
+    for result in current['results']:
+        old = before.get(result['name'])
+        if old is None:
+            changes.append((result['name'], None, result, False))
+            continue
+        slower = (result['p95_ms'] > old['p95_ms'] * (1 + threshold)
+                  and result['p95_ms'] - old['p95_ms'] > min_ms)
+        changes.append((result['name'], old, result, slower or result['queries'] > old['queries']))
+    return changes
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,107 @@
+"""
+Versioned registry of goods categories.
+
+Categories change rarely but are read on every receipt form load and for every item
+priced. The full set is cached in the shared cache under a version token that changes
+on any ``GoodsCategory`` write, and each process keeps its own copy for as long as the
+token is unchanged. Reads cost one cache lookup of the token and no database queries;
+the token doubles as the ETag of the category list.
+
+The token is only shared if the cache is (Redis, see CACHE_SHARED). With the
+per-process memory cache, a write in one process or in the job worker can't reach the
+others. So there the token is derived from the table itself: its row count and latest
+``updated_at``. Each process keeps it for CATEGORY_VERSION_TTL seconds, which is how
+long another process's change can take to show.
+"""
+import hashlib
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+
+VERSION_KEY = 'categories:version'
+DATA_KEY = 'categories:data:{version}'
+
+# This process's copy: replaced wholesale when the version changes, never mutated
+# apart from filling in serialized payloads for its own version
+_snapshot = {'version': None, 'categories': {}, 'serialized': {}}
+
+
+def _table_version():
+    from .models import GoodsCategory
+
+    state = GoodsCategory.objects.aggregate(count=Count('pk'), updated=Max('updated_at'))
+    return hashlib.sha1(f"{state['count']}:{state['updated']}".encode()).hexdigest()[:32]
+
+
+def current_version():
+    """The version token, created if the cache has none (e.g. after eviction or expiry)"""
+    if settings.CACHE_SHARED:
+        return cache.get_or_set(VERSION_KEY, uuid.uuid4().hex, None)
+    return cache.get_or_set(VERSION_KEY, _table_version, settings.CATEGORY_VERSION_TTL)
+
+
+def bump_version():
+    """Give the category set a new version once the current transaction commits"""
+    if settings.CACHE_SHARED:
+        transaction.on_commit(lambda: cache.set(VERSION_KEY, uuid.uuid4().hex, None))
+    else:
+        # Re-read from the table on the next lookup; other processes see it within the TTL
+        transaction.on_commit(lambda: cache.delete(VERSION_KEY))
+
+
+def _load(version):
+    from .models import GoodsCategory
+
+    categories = cache.get(DATA_KEY.format(version=version))
+    if categories is None:
+        categories = {category.pk: category for category in GoodsCategory.objects.order_by('name')}
+        cache.set(DATA_KEY.format(version=version), categories, 24 * 60 * 60)
+    return categories
+
+
+def snapshot():
+    """The current {'version', 'categories', 'serialized'} snapshot, reloaded if the version moved"""
+    global _snapshot
+    version = current_version()
+    current = _snapshot
+    if current['version'] != version:
+        current = {'version': version, 'categories': _load(version), 'serialized': {}}
+        _snapshot = current
+    return current
+
+
+def get_categories():
+    """All categories by id (active and inactive), in name order"""
+    return snapshot()['categories']
+
+
+def get_category(pk):
+    """The category with this id, or None"""
+    try:
+        return get_categories().get(int(pk))
+    except (TypeError, ValueError):
+        return None
+
+
+def serialized(key, build):
+    """
+    Serialized form of the categories (e.g. an API payload) built by build(categories),
+    memoized per process until the version changes. Returns (version, data).
+    """
+    current = snapshot()
+    if key not in current['serialized']:
+        current['serialized'][key] = build(current['categories'])
+    return current['version'], current['serialized'][key]
+
+
+async def aserialized(key, build):
+    """serialized() for async views; only a version change leaves the event loop"""
+    version = await cache.aget(VERSION_KEY)
+    current = _snapshot
+    if version is not None and current['version'] == version and key in current['serialized']:
+        return version, current['serialized'][key]
+    return await sync_to_async(serialized)(key, build)
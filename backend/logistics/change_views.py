@@ -0,0 +1,76 @@
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from . import changes
+from .async_views import async_api_view, json_response
+from .models import Change
+
+EXPIRED = 'Changes after this cursor have been pruned; reload and start again from the returned cursor'
+
+
+def _params(params, last_event_id=None):
+    """(since or None, kinds) from the query string; raises ValueError with the message for a 400"""
+    since = params.get('since') or last_event_id or None
+    if since is not None and not since.isdigit():
+        raise ValueError('since must be a cursor from a previous response')
+    kinds = set(params.get('kinds', '').split(',')) - {''} or set(dict(Change.KIND_CHOICES))
+    unknown = kinds - set(dict(Change.KIND_CHOICES))
+    if unknown:
+        raise ValueError(f"Unknown kind: {', '.join(sorted(unknown))}. Choose from {', '.join(dict(Change.KIND_CHOICES))}")
+    return (int(since) if since is not None else None), kinds
+
+
+@api_view(['GET'])
+def change_list(request):
+    """
+    Shipment and receipt changes after ?since= (a cursor), oldest first, up to ?limit=.
+    Without since, returns no changes and the current cursor to start from. ?kinds=shipment,receipt filters.
+    """
+    try:
+        since, kinds = _params(request.query_params)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    limit = request.query_params.get('limit', str(changes.DEFAULT_LIMIT))
+    limit = int(limit) if limit.isdigit() else 0
+    if not 1 <= limit <= changes.MAX_LIMIT:
+        return Response({'error': f'limit must be between 1 and {changes.MAX_LIMIT}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if since is None:
+        return Response({'cursor': changes.latest_cursor(), 'has_more': False, 'results': []})
+    if changes.expired(since):
+        return Response({'error': EXPIRED, 'cursor': changes.latest_cursor()}, status=status.HTTP_410_GONE)
+    entries, cursor, more = changes.read(since, limit)
+    return Response({'cursor': cursor, 'has_more': more,
+                     'results': [changes.serialize(change) for change in entries if change.kind in kinds]})
+
+
+@async_api_view
+async def change_stream(request):
+    """
+    Server-Sent Events of shipment and receipt changes after ?since= or the Last-Event-ID
+    header (default: from now), then as they happen. Same ?kinds= filter as /changes/.
+    Served by the ASGI app only (rockman_logistics.asgi, which ends the stream when the
+    client disconnects); under WSGI each stream would hold a worker, so it answers 501.
+    """
+    if not isinstance(request, ASGIRequest):
+        return json_response({'error': 'The change stream is only served by the ASGI app; poll /changes/ instead'},
+                             status=status.HTTP_501_NOT_IMPLEMENTED)
+    try:
+        since, kinds = _params(request.GET, request.headers.get('Last-Event-ID'))
+    except ValueError as e:
+        return json_response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if since is None:
+        since = await sync_to_async(changes.latest_cursor)()
+    elif await sync_to_async(changes.expired)(since):
+        return json_response({'error': EXPIRED, 'cursor': await sync_to_async(changes.latest_cursor)()},
+                             status=status.HTTP_410_GONE)
+
+    response = StreamingHttpResponse(changes.stream(since, kinds), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Don't let nginx-style proxies buffer the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,343 @@
+"""
+Change feed: an append-only log of shipment and receipt writes for incremental clients.
+
+Writes add ``Change`` entries once their transaction commits. Signals cover single saves
+and deletes, and the bulk paths (receipt bulk create, manifest imports, batch status
+transitions) call ``record()`` / ``record_ids()`` themselves. An entry's id is its cursor:
+``read(since)`` returns the entries after it, for ``GET /changes/?since=`` and the
+``/changes/stream/`` Server-Sent Events stream.
+
+Ids are taken when a row is inserted but only become visible when its transaction
+commits, so a larger id can be seen before a smaller one. Entries are therefore written
+in their own short transaction right after the data commits, which keeps that window to
+milliseconds, and ``read()`` stops in front of a missing id until the entry after it is
+CHANGES_GAP_SECONDS old (an id whose insert rolled back never appears). A cursor never
+skips an entry that was about to commit.
+
+Streams fan out from one ``Notifier`` per process, which reads each new batch of entries
+once and hands it to every open stream. On PostgreSQL it wakes on the ``NOTIFY`` sent
+with every write, over its own ``LISTEN`` connection. Behind PgBouncer in transaction
+mode (DB_PGBOUNCER), where LISTEN doesn't work, and on SQLite it polls every
+CHANGES_POLL_INTERVAL seconds instead.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.db import close_old_connections, connection, connections, transaction
+from django.db.models import DecimalField
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'logistics_changes'
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 1000
+# Fields copied into each entry's data, as named by the API's serializers
+FIELDS = {
+    'shipment': ('tracking_number', 'status', 'customer_id'),
+    'receipt': ('receipt_number', 'customer_id', 'payment_status', 'total_amount', 'container_number'),
+}
+MODELS = {'shipment': 'Shipment', 'receipt': 'Receipt'}
+# Batches a stream may fall behind by before new ones are dropped (it then re-reads them)
+STREAM_QUEUE_SIZE = 100
+RELISTEN_SECONDS = 30
+
+
+def _data(values):
+    return {name.removesuffix('_id'): str(value) if isinstance(value, Decimal) else value
+            for name, value in values.items()}
+
+
+def _snapshot(kind, obj):
+    values = {}
+    for name in FIELDS[kind]:
+        field, value = obj._meta.get_field(name), getattr(obj, name)
+        if isinstance(field, DecimalField) and value is not None:
+            # As the database returns it, whatever was assigned
+            value = Decimal(value).quantize(Decimal(1).scaleb(-field.decimal_places))
+        values[name] = value
+    return _data(values)
+
+
+def _write(kind, entries):
+    """Insert (object_id, action, data) entries and wake the listening notifiers"""
+    from .models import Change
+
+    if not entries:
+        return
+    try:
+        with transaction.atomic():
+            Change.objects.bulk_create([Change(kind=kind, object_id=object_id, action=action, data=data)
+                                        for object_id, action, data in entries])
+            if connection.vendor == 'postgresql':
+                # Delivered when this transaction commits
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, kind])
+    except Exception:
+        # The data is already committed; a lost entry must not fail the request that made it
+        logger.exception('Could not record %s %s change(s)', len(entries), kind)
+
+
+def record(kind, objects, action):
+    """Log objects ('shipment' or 'receipt' instances) as created, updated or deleted once the transaction commits"""
+    entries = {obj.pk: (obj.pk, action, _snapshot(kind, obj)) for obj in objects if obj.pk is not None}
+    if entries:
+        transaction.on_commit(lambda: _write(kind, list(entries.values())))
+
+
+def record_ids(kind, ids, action='updated'):
+    """Like record(), for when only ids are at hand; the objects are read after the commit"""
+    ids = {pk for pk in ids if pk is not None}
+    if not ids:
+        return
+
+    def write():
+        model = apps.get_model('logistics', MODELS[kind])
+        rows = model.objects.filter(pk__in=ids).order_by('pk').values('pk', *FIELDS[kind])
+        _write(kind, [(row.pop('pk'), action, _data(row)) for row in rows])
+    transaction.on_commit(write)
+
+
+def serialize(change):
+    return {
+        'id': change.pk,
+        'kind': change.kind,
+        'object_id': change.object_id,
+        'action': change.action,
+        'data': change.data,
+        'created_at': change.created_at,
+    }
+
+
+def read(since, limit=DEFAULT_LIMIT):
+    """
+    (entries after the since cursor, the cursor to continue from, whether more are waiting).
+    Stops in front of a recent gap in the ids, which may be an entry still being committed.
+    """
+    from .models import Change
+
+    rows = list(Change.objects.filter(pk__gt=since).order_by('pk')[:limit])
+    settled = timezone.now() - timedelta(seconds=settings.CHANGES_GAP_SECONDS)
+    entries = []
+    cursor = since
+    for change in rows:
+        if change.pk != cursor + 1 and change.created_at > settled:
+            return entries, cursor, False
+        entries.append(change)
+        cursor = change.pk
+    return entries, cursor, len(rows) == limit
+
+
+def latest_cursor():
+    """The cursor a new client starts from: past every entry already committed"""
+    from .models import Change
+
+    settled = timezone.now() - timedelta(seconds=settings.CHANGES_GAP_SECONDS)
+    cursor = (Change.objects.filter(created_at__lte=settled).order_by('-pk').values_list('pk', flat=True).first()
+              or (Change.objects.order_by('pk').values_list('pk', flat=True).first() or 1) - 1)
+    more = True
+    while more:
+        _, cursor, more = read(cursor, MAX_LIMIT)
+    return cursor
+
+
+def expired(since):
+    """Whether entries after since have been pruned, so the client has to reload instead. 0 reads from the oldest kept."""
+    from .models import Change
+
+    oldest = Change.objects.order_by('pk').values_list('pk', flat=True).first()
+    return since > 0 and oldest is not None and since < oldest - 1
+
+
+def prune(before):
+    """Delete entries created before the given time. The newest entry is always kept, so ids keep growing."""
+    from .models import Change
+
+    newest = Change.objects.order_by('-pk').values_list('pk', flat=True).first()
+    if newest is None:
+        return 0
+    deleted, _ = Change.objects.filter(created_at__lt=before, pk__lt=newest).delete()
+    return deleted
+
+
+def event(change):
+    """A change as one Server-Sent Events message"""
+    return f'id: {change.pk}\nevent: change\ndata: {json.dumps(serialize(change), cls=JSONEncoder)}\n\n'
+
+
+def _listen_enabled():
+    return settings.CHANGES_LISTEN and settings.DATABASES['default']['ENGINE'].endswith('postgresql')
+
+
+class Notifier:
+    """
+    Reads new entries once per wake-up and queues them, as (start cursor, end cursor,
+    [(id, kind, message)]) batches, to every stream open in this process. Runs on the
+    event loop while any stream is subscribed.
+    """
+
+    def __init__(self):
+        self.subscribers = set()
+        self.cursor = None
+        self.task = None
+        self.wakeup = None
+        self.listener = None
+        self.listen_attempted = 0.0
+
+    def subscribe(self):
+        queue = asyncio.Queue(STREAM_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        loop = asyncio.get_running_loop()
+        if self.task is None or self.task.done() or self.task.get_loop() is not loop:
+            self.wakeup = asyncio.Event()
+            # Not in the request's context: its thread for sync calls goes away when the request ends
+            self.task = contextvars.Context().run(loop.create_task, self.run())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    async def run(self):
+        self.cursor = await sync_to_async(latest_cursor)()
+        try:
+            while self.subscribers:
+                if self.listener is None and _listen_enabled() and time.monotonic() - self.listen_attempted > RELISTEN_SECONDS:
+                    await self.listen()
+                # Listening, still look again once a held back gap may have settled
+                timeout = settings.CHANGES_POLL_INTERVAL if self.listener is None else settings.CHANGES_GAP_SECONDS
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                self.wakeup.clear()
+                # Outside any request, so nothing else drops a connection the server or
+                # pooler closed (or, past DB_CONN_MAX_AGE, one that is due to be replaced)
+                try:
+                    await sync_to_async(close_old_connections)()
+                    await self.publish()
+                except Exception:
+                    logger.exception('Could not read the change log')
+                    await sync_to_async(close_old_connections)()
+        finally:
+            self.unlisten()
+
+    async def publish(self):
+        more = True
+        while more:
+            start = self.cursor
+            entries, self.cursor, more = await sync_to_async(read)(start)
+            if self.cursor == start:
+                return
+            batch = (start, self.cursor, [(change.pk, change.kind, event(change)) for change in entries])
+            for queue in self.subscribers:
+                try:
+                    queue.put_nowait(batch)
+                except asyncio.QueueFull:
+                    # The stream re-reads from the database once it sees the next batch's start
+                    pass
+
+    async def listen(self):
+        self.listen_attempted = time.monotonic()
+
+        def connect():
+            wrapper = connections.create_connection('default')
+            raw = wrapper.get_new_connection(wrapper.get_connection_params())
+            raw.autocommit = True
+            with raw.cursor() as cursor:
+                cursor.execute(f'LISTEN {CHANNEL}')
+            return raw
+
+        try:
+            self.listener = await sync_to_async(connect)()
+        except Exception:
+            logger.warning('Could not LISTEN for changes, polling instead', exc_info=True)
+            return
+        asyncio.get_running_loop().add_reader(self.listener.fileno(), self.notified)
+
+    def notified(self):
+        try:
+            self.listener.poll()
+            self.listener.notifies.clear()
+        except Exception:
+            logger.warning('Lost the change LISTEN connection, polling instead', exc_info=True)
+            self.unlisten()
+        self.wakeup.set()
+
+    def unlisten(self):
+        if self.listener is None:
+            return
+        try:
+            asyncio.get_running_loop().remove_reader(self.listener.fileno())
+        except Exception:
+            pass
+        try:
+            self.listener.close()
+        except Exception:
+            pass
+        self.listener = None
+
+
+notifier = Notifier()
+
+
+def stats():
+    """Open streams in this process and whether they are woken by NOTIFY"""
+    return {'streams': len(notifier.subscribers), 'listening': int(notifier.listener is not None)}
+
+
+async def _catch_up(cursor, kinds):
+    """Messages for the entries after cursor read from the database, and the new cursor"""
+    messages = []
+    more = True
+    while more:
+        entries, cursor, more = await sync_to_async(read)(cursor)
+        messages.extend(event(change) for change in entries if change.kind in kinds)
+    return messages, cursor
+
+
+async def stream(since, kinds):
+    """
+    Server-Sent Events for the entries after since, then live as they are written.
+    Ends after CHANGES_STREAM_SECONDS; EventSource reconnects with Last-Event-ID.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.CHANGES_STREAM_SECONDS
+    queue = notifier.subscribe()
+    try:
+        yield f'retry: {settings.CHANGES_STREAM_RETRY_MS}\n\n'
+        messages, cursor = await _catch_up(since, kinds)
+        if messages:
+            yield ''.join(messages)
+        while loop.time() < deadline:
+            try:
+                start, end, batch = await asyncio.wait_for(
+                    queue.get(), min(settings.CHANGES_STREAM_HEARTBEAT, max(deadline - loop.time(), 0)))
+            except asyncio.TimeoutError:
+                if notifier.cursor is not None and notifier.cursor > cursor:
+                    # Batches were dropped while this stream was behind
+                    messages, cursor = await _catch_up(cursor, kinds)
+                    if messages:
+                        yield ''.join(messages)
+                yield ': keep-alive\n\n'
+                continue
+            if start > cursor:
+                messages, cursor = await _catch_up(cursor, kinds)
+                if messages:
+                    yield ''.join(messages)
+                if start > cursor:
+                    continue
+            messages = [message for pk, kind, message in batch if kind in kinds and pk > cursor]
+            cursor = max(cursor, end)
+            if messages:
+                yield ''.join(messages)
+    finally:
+        notifier.unsubscribe(queue)
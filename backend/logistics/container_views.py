@@ -0,0 +1,62 @@
+from rest_framework import status
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from . import loadplan
+from .models import ContainerStats, Receipt
+from .pagination import KeysetPagination
+
+
+def _unknown_types(types):
+    unknown = set(types) - set(loadplan.CONTAINER_TYPES)
+    if unknown:
+        return Response({'error': f"Unknown container type: {', '.join(sorted(unknown))}. "
+                                  f"Choose from {', '.join(loadplan.CONTAINER_TYPES)}"},
+                        status=status.HTTP_400_BAD_REQUEST)
+    return None
+
+
+class ContainerFillPagination(KeysetPagination):
+    ordering = ('container_number',)
+
+
+@api_view(['GET'])
+def container_fill(request):
+    """
+    CBM loaded and fill ratio per container number, a keyset-paginated page at a time.
+    Container types are not recorded, so fill_ratio is against the capacity of ?type=
+    (default 40hc) for every container.
+    """
+    container_type = request.query_params.get('type', loadplan.DEFAULT_CONTAINER_TYPE)
+    error = _unknown_types([container_type])
+    if error:
+        return error
+    paginator = ContainerFillPagination()
+    containers = paginator.paginate_queryset(ContainerStats.objects.filter(items__gt=0), request)
+    return Response({
+        'container_type': container_type,
+        'capacity_cbm': loadplan.CONTAINER_TYPES[container_type],
+        'fill_ratio_basis': f'CBM loaded / capacity of one {container_type} container; '
+                            f'the containers\' actual types are not recorded',
+        **paginator.get_paginated_data(loadplan.fill_ratios(containers, container_type)),
+    })
+
+
+@api_view(['GET'])
+def container_plan(request):
+    """
+    Proposed container loads for receipts without a container number, packed by CBM.
+    ?types=20ft,40hc limits the container types used; ?customer= plans one customer's receipts.
+    """
+    types = [name for name in request.query_params.get('types', '').split(',') if name] or list(loadplan.CONTAINER_TYPES)
+    error = _unknown_types(types)
+    if error:
+        return error
+
+    receipts = Receipt.objects.all()
+    customer = request.query_params.get('customer')
+    if customer:
+        if not customer.isdigit():
+            return Response({'error': 'customer must be a customer id'}, status=status.HTTP_400_BAD_REQUEST)
+        receipts = receipts.filter(customer_id=customer)
+    return Response(loadplan.plan(loadplan.pending_receipts(receipts), types))
@@ -0,0 +1,350 @@
+"""
+Dashboard metrics: small rollup tables kept current on write, served from the cache.
+
+* ``DailyReceiptStats`` (with its per category and per customer breakdowns),
+  ``ContainerStats`` and ``CustomerStats`` are refreshed for just the day/container/
+  customer a receipt or item write touched, with grouped aggregates over that key's rows.
+* ``ShipmentStatusStats`` is adjusted by +1/-1 as shipments are created, change status
+  or are deleted.
+
+``rebuild()`` recomputes them all without emptying them first, so like a concurrent
+``REFRESH MATERIALIZED VIEW`` it never leaves readers with partial tables.
+
+``dashboard_stats()`` builds the dashboard payload from those tables and caches it for
+``DASHBOARD_CACHE_TTL`` seconds; every refresh deletes the cached payload once its
+transaction commits, so the next load sees fresh numbers.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+CACHE_KEY = 'dashboard:stats'
+RECENT_DAYS = 30
+TOP_CONTAINERS = 20
+
+
+def invalidate():
+    """Drop the cached dashboard payload after the current transaction commits"""
+    transaction.on_commit(lambda: cache.delete(CACHE_KEY))
+
+
+def receipt_day(issue_date):
+    return timezone.localdate(issue_date) if timezone.is_aware(issue_date) else issue_date.date()
+
+
+def _day_range(day):
+    start = datetime.combine(day, time.min)
+    if settings.USE_TZ:
+        start = timezone.make_aware(start)
+    return start, start + timedelta(days=1)
+
+
+def refresh_days(days):
+    """
+    Recompute DailyReceiptStats, DailyCategoryStats and DailyCustomerStats for the given
+    dates from the receipts issued on them
+    """
+    from .models import DailyCategoryStats, DailyCustomerStats, DailyReceiptStats, Receipt, ReceiptItem
+
+    days = {day for day in days if day}
+    if not days:
+        return
+    receipt_filter = Q()
+    item_filter = Q()
+    for day in days:
+        start, end = _day_range(day)
+        receipt_filter |= Q(issue_date__gte=start, issue_date__lt=end)
+        item_filter |= Q(receipt__issue_date__gte=start, receipt__issue_date__lt=end)
+
+    now = timezone.now()
+    stats = {day: DailyReceiptStats(day=day, receipts=0, revenue=Decimal('0'), cbm=Decimal('0'), updated_at=now)
+             for day in days}
+    customers = {}
+    for row in (Receipt.objects.filter(receipt_filter).order_by()
+                .annotate(day=TruncDate('issue_date')).values('day', 'customer_id')
+                .annotate(receipts=Count('id'), revenue=Sum('total_amount'))):
+        customers[row['day'], row['customer_id']] = DailyCustomerStats(
+            day=row['day'], customer_id=row['customer_id'], receipts=row['receipts'],
+            revenue=row['revenue'] or 0, cbm=Decimal('0'), updated_at=now)
+        stats[row['day']].receipts += row['receipts']
+        stats[row['day']].revenue += row['revenue'] or 0
+    for row in (ReceiptItem.objects.filter(item_filter).order_by()
+                .annotate(day=TruncDate('receipt__issue_date')).values('day', 'receipt__customer_id')
+                .annotate(cbm=Sum('cbm'))):
+        # A receipt committed between the two queries has items but no customer row yet
+        customer = customers.setdefault((row['day'], row['receipt__customer_id']), DailyCustomerStats(
+            day=row['day'], customer_id=row['receipt__customer_id'], receipts=0, revenue=Decimal('0'),
+            updated_at=now))
+        customer.cbm = row['cbm'] or 0
+        stats[row['day']].cbm += row['cbm'] or 0
+    categories = [
+        DailyCategoryStats(day=row['day'], category_id=row['category_id'], items=row['items'],
+                           cbm=row['cbm'] or 0, revenue=row['revenue'] or 0, updated_at=now)
+        for row in (ReceiptItem.objects.filter(item_filter).order_by()
+                    .annotate(day=TruncDate('receipt__issue_date')).values('day', 'category_id')
+                    .annotate(items=Count('id'), cbm=Sum('cbm'), revenue=Sum('total_price')))
+    ]
+
+    with transaction.atomic():
+        # Upserting the day rows first (in a fixed order) locks those days, so concurrent
+        # refreshes of a day take turns replacing its category and customer rows
+        DailyReceiptStats.objects.bulk_create(
+            sorted(stats.values(), key=lambda row: row.day), update_conflicts=True, unique_fields=['day'],
+            update_fields=['receipts', 'revenue', 'cbm', 'updated_at'],
+        )
+        DailyCategoryStats.objects.filter(day__in=days).delete()
+        DailyCategoryStats.objects.bulk_create(categories)
+        DailyCustomerStats.objects.filter(day__in=days).delete()
+        DailyCustomerStats.objects.bulk_create(customers.values())
+    invalidate()
+
+
+def refresh_containers(container_numbers):
+    """Recompute ContainerStats for the given container numbers from their receipts' items"""
+    from .models import ContainerStats, ReceiptItem
+
+    container_numbers = {number for number in container_numbers if number}
+    if not container_numbers:
+        return
+
+    stats = {number: ContainerStats(container_number=number, items=0, receipts=0, customers=0, cbm=Decimal('0'),
+                                    revenue=Decimal('0'))
+             for number in container_numbers}
+    for row in (ReceiptItem.objects.filter(receipt__container_number__in=container_numbers).order_by()
+                .values('receipt__container_number')
+                .annotate(items=Count('id'), receipts=Count('receipt', distinct=True),
+                          customers=Count('receipt__customer', distinct=True), cbm=Sum('cbm'),
+                          revenue=Sum('total_price'))):
+        stat = stats[row['receipt__container_number']]
+        stat.items, stat.receipts, stat.customers = row['items'], row['receipts'], row['customers']
+        stat.cbm, stat.revenue = row['cbm'] or 0, row['revenue'] or 0
+
+    now = timezone.now()
+    for row in stats.values():
+        row.updated_at = now
+    ContainerStats.objects.bulk_create(
+        stats.values(), update_conflicts=True, unique_fields=['container_number'],
+        update_fields=['items', 'receipts', 'customers', 'cbm', 'revenue', 'updated_at'],
+    )
+    invalidate()
+
+
+def refresh_customers(customer_ids):
+    """Recompute CustomerStats for the given customers from their receipts"""
+    from .models import Customer, CustomerStats, Receipt
+
+    customer_ids = {pk for pk in customer_ids if pk}
+    if not customer_ids:
+        return
+    # Customers deleted since (their stats went with them)
+    customer_ids = set(Customer.objects.filter(pk__in=customer_ids).values_list('pk', flat=True))
+    if not customer_ids:
+        return
+
+    now = timezone.now()
+    stats = {pk: CustomerStats(customer_id=pk, receipts=0, total_amount=Decimal('0'), paid_amount=Decimal('0'),
+                               outstanding_amount=Decimal('0'), by_payment_status={}, last_receipt_at=None,
+                               updated_at=now)
+             for pk in customer_ids}
+    for row in (Receipt.objects.filter(customer_id__in=customer_ids).order_by()
+                .values('customer_id', 'payment_status')
+                .annotate(receipts=Count('id'), amount=Sum('total_amount'), last=Max('issue_date'))):
+        stat = stats[row['customer_id']]
+        amount = row['amount'] or Decimal('0')
+        stat.receipts += row['receipts']
+        stat.total_amount += amount
+        if row['payment_status'] == 'paid':
+            stat.paid_amount += amount
+        else:
+            stat.outstanding_amount += amount
+        stat.by_payment_status[row['payment_status']] = {'receipts': row['receipts'], 'amount': f'{amount:.2f}'}
+        if stat.last_receipt_at is None or row['last'] > stat.last_receipt_at:
+            stat.last_receipt_at = row['last']
+
+    # Customers without receipts have no row, as after a rebuild
+    empty = [pk for pk, stat in stats.items() if not stat.receipts]
+    if empty:
+        CustomerStats.objects.filter(customer_id__in=empty).delete()
+    CustomerStats.objects.bulk_create(
+        [stat for stat in stats.values() if stat.receipts], update_conflicts=True, unique_fields=['customer'],
+        update_fields=['receipts', 'total_amount', 'paid_amount', 'outstanding_amount', 'by_payment_status',
+                       'last_receipt_at', 'updated_at'],
+    )
+
+
+def _refresh_on_commit(days, containers, customers):
+    # Refresh once the write is committed, so item totals applied later in the same
+    # transaction are included and a rolled back write refreshes nothing
+    def refresh():
+        refresh_days(days)
+        refresh_containers(containers)
+        refresh_customers(customers)
+    transaction.on_commit(refresh)
+
+
+def receipts_changed(receipts, previous_keys=()):
+    """
+    Refresh the day, container and customer rollups touched by the given receipts.
+    previous_keys are (issue_date, container_number, customer_id) the receipts had before.
+    """
+    days = {receipt_day(receipt.issue_date) for receipt in receipts}
+    containers = {receipt.container_number for receipt in receipts}
+    customers = {receipt.customer_id for receipt in receipts}
+    for issue_date, container_number, customer_id in previous_keys:
+        if issue_date:
+            days.add(receipt_day(issue_date))
+        containers.add(container_number)
+        customers.add(customer_id)
+    _refresh_on_commit(days, containers, customers)
+
+
+def receipt_ids_changed(receipt_ids):
+    """Like receipts_changed, for when only the receipt ids are at hand"""
+    from .models import Receipt
+
+    def refresh():
+        keys = list(Receipt.objects.filter(pk__in=receipt_ids)
+                    .values_list('issue_date', 'container_number', 'customer_id'))
+        refresh_days({receipt_day(issue_date) for issue_date, _, _ in keys})
+        refresh_containers({container_number for _, container_number, _ in keys})
+        refresh_customers({customer_id for _, _, customer_id in keys})
+    transaction.on_commit(refresh)
+
+
+def bump_shipment_status(status, delta):
+    """Add delta to the shipment count for status, creating the row on first use"""
+    from .models import ShipmentStatusStats
+
+    if not status or not delta:
+        return
+    if not ShipmentStatusStats.objects.filter(status=status).update(shipments=F('shipments') + delta,
+                                                                      updated_at=timezone.now()):
+        try:
+            with transaction.atomic():
+                ShipmentStatusStats.objects.create(status=status, shipments=delta)
+        except IntegrityError:
+            # Created concurrently; apply the delta to that row instead
+            ShipmentStatusStats.objects.filter(status=status).update(shipments=F('shipments') + delta)
+    invalidate()
+
+
+def rebuild(batch_size=500):
+    """
+    Recompute every rollup from scratch (for reconciling drift). Rows are upserted in
+    batches, each in its own transaction, and rows left over from keys that no longer
+    exist are deleted at the end, so readers see complete tables throughout.
+    """
+    from .models import (ContainerStats, CustomerStats, DailyCategoryStats, DailyCustomerStats, DailyReceiptStats,
+                         Receipt, Shipment, ShipmentStatusStats)
+
+    started = timezone.now()
+    days = (Receipt.objects.order_by().annotate(day=TruncDate('issue_date'))
+            .values_list('day', flat=True).distinct())
+    containers = (Receipt.objects.exclude(container_number='').order_by()
+                  .values_list('container_number', flat=True).distinct())
+    customers = Receipt.objects.order_by().values_list('customer_id', flat=True).distinct()
+    for refresh, keys in ((refresh_days, days), (refresh_containers, containers), (refresh_customers, customers)):
+        keys = list(keys)
+        for start in range(0, len(keys), batch_size):
+            with transaction.atomic():
+                refresh(keys[start:start + batch_size])
+
+    with transaction.atomic():
+        ShipmentStatusStats.objects.bulk_create([
+            ShipmentStatusStats(status=row['status'], shipments=row['shipments'], updated_at=timezone.now())
+            for row in Shipment.objects.order_by().values('status').annotate(shipments=Count('id'))
+        ], update_conflicts=True, unique_fields=['status'], update_fields=['shipments', 'updated_at'])
+        # Every row still backed by data was just refreshed
+        for model in (DailyReceiptStats, DailyCategoryStats, DailyCustomerStats, ContainerStats, CustomerStats,
+                      ShipmentStatusStats):
+            model.objects.filter(updated_at__lt=started).delete()
+        invalidate()
+
+
+def _stats_querysets():
+    from .models import ContainerStats, Customer, DailyReceiptStats, ShipmentStatusStats, Staff
+
+    since = timezone.localdate() - timedelta(days=RECENT_DAYS - 1)
+    return {
+        'staff': Staff.objects.filter(is_active_staff=True),
+        'customers': Customer.objects.filter(is_active=True),
+        'statuses': ShipmentStatusStats.objects.values_list('status', 'shipments'),
+        'days': DailyReceiptStats.objects.all(),
+        'recent_days': DailyReceiptStats.objects.filter(day__gte=since).order_by('day'),
+        'containers': ContainerStats.objects.filter(items__gt=0).order_by('-updated_at')[:TOP_CONTAINERS],
+    }
+
+
+def _payload(staff, customers, statuses, totals, recent_days, containers):
+    shipments_by_status = dict(statuses)
+    return {
+        'total_staff': staff,
+        'total_customers': customers,
+        'total_shipments': sum(shipments_by_status.values()),
+        'total_receipts': totals['receipts'] or 0,
+        'total_revenue': str(totals['revenue'] or Decimal('0.00')),
+        'shipments_by_status': shipments_by_status,
+        'receipts_per_day': [
+            {'day': row.day.isoformat(), 'receipts': row.receipts, 'revenue': str(row.revenue), 'cbm': str(row.cbm)}
+            for row in recent_days
+        ],
+        'cbm_per_container': [
+            {'container_number': row.container_number, 'items': row.items, 'cbm': str(row.cbm),
+             'revenue': str(row.revenue)}
+            for row in containers
+        ],
+        'generated_at': timezone.now().isoformat(),
+    }
+
+
+def _build_stats():
+    querysets = _stats_querysets()
+    return _payload(
+        querysets['staff'].count(),
+        querysets['customers'].count(),
+        list(querysets['statuses']),
+        querysets['days'].aggregate(receipts=Sum('receipts'), revenue=Sum('revenue')),
+        list(querysets['recent_days']),
+        list(querysets['containers']),
+    )
+
+
+async def _abuild_stats():
+    async def rows(queryset):
+        return [row async for row in queryset]
+
+    # Awaited in turn: on Django 4.2 every async ORM call runs on the same database
+    # thread, so gathering them would not overlap the queries
+    querysets = _stats_querysets()
+    return _payload(
+        await querysets['staff'].acount(),
+        await querysets['customers'].acount(),
+        await rows(querysets['statuses']),
+        await querysets['days'].aaggregate(receipts=Sum('receipts'), revenue=Sum('revenue')),
+        await rows(querysets['recent_days']),
+        await rows(querysets['containers']),
+    )
+
+
+def dashboard_stats():
+    """The dashboard payload, from the cache when possible"""
+    stats = cache.get(CACHE_KEY)
+    if stats is None:
+        stats = _build_stats()
+        cache.set(CACHE_KEY, stats, getattr(settings, 'DASHBOARD_CACHE_TTL', 60))
+    return stats
+
+
+async def adashboard_stats():
+    """dashboard_stats() for async views"""
+    stats = await cache.aget(CACHE_KEY)
+    if stats is None:
+        stats = await _abuild_stats()
+        await cache.aset(CACHE_KEY, stats, getattr(settings, 'DASHBOARD_CACHE_TTL', 60))
+    return stats
@@ -0,0 +1,61 @@
+"""
+PostgreSQL backend that measures how long requests wait for a usable connection.
+
+It is Django's own backend plus timing: every health check (``CONN_HEALTH_CHECKS``)
+and every new connection (a TLS handshake to Supabase or its pooler) is added to
+per-connection counters. ``ConnectionTimingMiddleware`` resets them at the start of
+each request and reports them in a ``Server-Timing`` header;
+``stats()`` has the totals for this process.
+"""
+import threading
+import time
+
+from django.db.backends.postgresql import base
+
+_stats_lock = threading.Lock()
+_stats = {'connections': 0, 'connect_seconds': 0.0, 'health_checks': 0, 'health_check_seconds': 0.0}
+
+
+def _record(count_name, seconds_name, seconds):
+    with _stats_lock:
+        _stats[count_name] += 1
+        _stats[seconds_name] += seconds
+
+
+def stats():
+    """Connection counters for this process since start"""
+    with _stats_lock:
+        counts = dict(_stats)
+    counts['connect_seconds'] = round(counts['connect_seconds'], 4)
+    counts['health_check_seconds'] = round(counts['health_check_seconds'], 4)
+    counts['avg_connect_ms'] = (round(counts['connect_seconds'] * 1000 / counts['connections'], 2)
+                                if counts['connections'] else None)
+    return counts
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reset_acquire_stats()
+
+    def reset_acquire_stats(self):
+        self.acquire_seconds = 0.0
+        self.new_connections = 0
+
+    def get_new_connection(self, conn_params):
+        started = time.perf_counter()
+        connection = super().get_new_connection(conn_params)
+        elapsed = time.perf_counter() - started
+        self.acquire_seconds += elapsed
+        self.new_connections += 1
+        _record('connections', 'connect_seconds', elapsed)
+        return connection
+
+    def close_if_health_check_failed(self):
+        if self.connection is None or not self.health_check_enabled or self.health_check_done:
+            return
+        started = time.perf_counter()
+        super().close_if_health_check_failed()
+        elapsed = time.perf_counter() - started
+        self.acquire_seconds += elapsed
+        _record('health_checks', 'health_check_seconds', elapsed)
@@ -0,0 +1,237 @@
+"""
+Streaming receipt exports for accounting.
+
+``export_rows()`` yields one flat row per receipt item (receipts without items get one
+row with blank item columns) straight from a server-side cursor, and ``csv_chunks()`` /
+``xlsx_chunks()`` turn those rows into encoded chunks as they go. Nothing holds more
+than one cursor chunk of rows, so month-sized exports run in constant memory. The
+XLSX writer streams a minimal workbook through ``zipfile`` and needs no extra packages.
+
+Under ASGI, Django 4.2 reads a synchronous streaming iterator to the end before sending
+any of it, so views served there wrap the chunks in ``aiter_chunks()``.
+"""
+import csv
+import zipfile
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+CHUNK_SIZE = 2000
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+COLUMNS = [
+    ('Receipt number', 'receipt_number'),
+    ('Issue date', 'issue_date'),
+    ('Customer code', 'customer__customer_code'),
+    ('Customer', 'customer__company_name'),
+    ('Container number', 'container_number'),
+    ('Payment status', 'payment_status'),
+    ('Payment method', 'payment_method'),
+    ('Receipt total', 'total_amount'),
+    ('Item description', 'items__description'),
+    ('Category', 'items__category__name'),
+    ('CBM', 'items__cbm'),
+    ('Unit price', 'items__unit_price'),
+    ('Item total', 'items__total_price'),
+]
+HEADERS = [header for header, _ in COLUMNS]
+
+
+def _day_start(day):
+    start = datetime.combine(day, time.min)
+    return timezone.make_aware(start) if settings.USE_TZ else start
+
+
+def filter_receipts(queryset, date_from=None, date_to=None, customer=None, payment_status=None):
+    """
+    Narrow a Receipt queryset by issue date range (inclusive ISO dates), customer id and
+    payment status. Raises ValueError for malformed dates.
+    """
+    if date_from:
+        day = parse_date(date_from)
+        if day is None:
+            raise ValueError(f'Invalid date_from: {date_from}')
+        queryset = queryset.filter(issue_date__gte=_day_start(day))
+    if date_to:
+        day = parse_date(date_to)
+        if day is None:
+            raise ValueError(f'Invalid date_to: {date_to}')
+        queryset = queryset.filter(issue_date__lt=_day_start(day + timedelta(days=1)))
+    if customer:
+        queryset = queryset.filter(customer_id=customer)
+    if payment_status:
+        queryset = queryset.filter(payment_status=payment_status)
+    return queryset
+
+
+def export_rows(receipts, chunk_size=CHUNK_SIZE):
+    """Flat rows (tuples in COLUMNS order) for the receipts' items, oldest receipt first"""
+    rows = (receipts.order_by('issue_date', 'id', 'items__id')
+            .values_list(*[field for _, field in COLUMNS]))
+    return rows.iterator(chunk_size=chunk_size)
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return str(value)
+
+
+class _Echo:
+    """File-like object that hands back what is written, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def csv_chunks(rows, rows_per_chunk=500):
+    """UTF-8 CSV (with a BOM, so Excel detects the encoding) in chunks of rows"""
+    writer = csv.writer(_Echo())
+    yield '\ufeff'.encode('utf-8') + writer.writerow(HEADERS).encode('utf-8')
+    lines = []
+    for row in rows:
+        lines.append(writer.writerow([_text(value) for value in row]))
+        if len(lines) >= rows_per_chunk:
+            yield ''.join(lines).encode('utf-8')
+            lines = []
+    if lines:
+        yield ''.join(lines).encode('utf-8')
+
+
+class _Buffer:
+    """Unseekable sink for zipfile; zipfile then writes data descriptors and never seeks"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Receipts" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '<Relationship Id="rId2" Target="styles.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"/>'
+        '</Relationships>'
+    ),
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+
+
+def _xlsx_cell(value):
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    # Drop control characters XML 1.0 does not allow
+    text = ''.join(char for char in _text(value) if char >= ' ' or char in '\t\n\r')
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>'
+
+
+def xlsx_chunks(rows, rows_per_chunk=500):
+    """A single-sheet XLSX workbook of the rows, zipped and emitted as it is written"""
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS.items():
+            archive.writestr(name, content)
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                         '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                         '<sheetData>' + _xlsx_row(HEADERS)).encode('utf-8'))
+            pending = []
+            for row in rows:
+                pending.append(_xlsx_row(row))
+                if len(pending) >= rows_per_chunk:
+                    sheet.write(''.join(pending).encode('utf-8'))
+                    pending = []
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            sheet.write((''.join(pending) + '</sheetData></worksheet>').encode('utf-8'))
+    yield buffer.drain()
+
+
+def export_chunks(file_format, rows):
+    """Encoded chunks of the rows in 'csv' or 'xlsx' format"""
+    if file_format == 'xlsx':
+        return xlsx_chunks(rows)
+    return csv_chunks(rows)
+
+
+async def aiter_chunks(chunks):
+    """
+    An async iterator over a sync chunk generator, producing each chunk in the request's
+    thread (where its database cursor lives) so it is sent before the next is read.
+    """
+    next_chunk = sync_to_async(next)
+    try:
+        while True:
+            chunk = await next_chunk(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        # Release the server-side cursor in the thread that opened it
+        await sync_to_async(chunks.close)()
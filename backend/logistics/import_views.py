@@ -0,0 +1,38 @@
+import io
+
+from rest_framework import status
+from rest_framework.decorators import api_view, parser_classes
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+
+from . import imports, jobs
+from .serializers import JobSerializer
+
+
+@api_view(['POST'])
+@parser_classes([MultiPartParser])
+def import_manifest(request):
+    """Import customers, shipments and receipt items from an uploaded manifest CSV (?dry_run=1 to validate only, ?background=1 to queue it as a job)"""
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'error': 'A CSV file upload (file) is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+    dry_run = request.query_params.get('dry_run', '').lower() in ('1', 'true', 'yes')
+    if request.query_params.get('background', '').lower() in ('1', 'true', 'yes'):
+        # Store the file with the job and let a worker import it; poll /jobs/{id}/ for the summary
+        job = jobs.enqueue('import_manifest', {'dry_run': dry_run}, created_by=request.user,
+                           files={jobs.MANIFEST_FILE: upload.read()})
+        return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    # Read the upload as a stream rather than loading it into memory
+    stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+    try:
+        summary = imports.import_manifest(stream, dry_run=dry_run, created_by=request.user)
+    except imports.ManifestError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except UnicodeDecodeError:
+        return Response({'error': 'The manifest must be UTF-8 encoded'}, status=status.HTTP_400_BAD_REQUEST)
+    finally:
+        stream.detach()
+
+    return Response(dict(summary.as_dict(), dry_run=dry_run))
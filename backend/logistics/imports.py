@@ -0,0 +1,404 @@
+"""
+Bulk import of customers, shipments and receipt items from a manifest CSV.
+
+Each row describes a customer and, optionally, a shipment (when ``tracking_number`` is
+set) and a receipt item (when ``item_description`` is set). Recognised columns::
+
+    customer_code, company_name, contact_person, phone, email, address
+    tracking_number, origin, destination, weight, dimensions, status, shipment_description
+    receipt_number, container_number, category, item_description, cbm, unit_price
+
+Rows are read as a stream and handled in batches. Each batch is one transaction that
+runs a fixed number of queries whatever its size: one lookup each for the customers,
+shipments and receipts it names, then ``bulk_create`` upserts (customers on
+``customer_code``, shipments on ``tracking_number``) and bulk inserts. Categories come
+from the in-process registry (matched by name or id). Blank cells never overwrite
+existing values. Customer codes and receipt numbers taken from the manifest move their
+counters past them, so later generated numbers don't collide.
+
+The items listed for a receipt that already existed replace that receipt's items, so
+re-importing a manifest does not duplicate them. Shipment status changes must be allowed
+by ``Shipment.STATUS_TRANSITIONS`` and are logged as ``ShipmentEvent`` rows, as for batch
+transitions. Bad rows are skipped and reported by line number; the rest of their batch
+is still imported.
+"""
+import csv
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import categories, changes, dashboard, search, totals, tracking
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+CUSTOMER_FIELDS = ['company_name', 'contact_person', 'phone', 'email', 'address']
+SHIPMENT_FIELDS = {
+    'origin': 'origin',
+    'destination': 'destination',
+    'weight': 'weight',
+    'dimensions': 'dimensions',
+    'status': 'status',
+    'shipment_description': 'description',
+}
+REQUIRED_COLUMNS = {'customer_code', 'company_name'}
+
+
+class ManifestError(ValueError):
+    """The manifest as a whole can't be imported (e.g. missing columns)"""
+
+
+class RowError(ValueError):
+    pass
+
+
+def _header(name):
+    return (name or '').strip().lower().replace(' ', '_')
+
+
+def _decimal(row, column, required=False):
+    value = row.get(column, '')
+    if not value:
+        if required:
+            raise RowError(f'{column} is required')
+        return None
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        raise RowError(f'{column} must be a number')
+    if not number.is_finite() or number < 0:
+        raise RowError(f'{column} must be a non-negative number')
+    return number
+
+
+def _category_lookup():
+    by_name = {}
+    for category in categories.get_categories().values():
+        by_name.setdefault(category.name.strip().lower(), category)
+    return by_name
+
+
+def _category(value, by_name):
+    if not value:
+        return None
+    category = by_name.get(value.strip().lower())
+    if category is None and value.isdigit():
+        category = categories.get_category(value)
+    if category is None:
+        raise RowError(f'Unknown category: {value}')
+    return category
+
+
+def parse_row(raw, category_names):
+    """Normalise and check one CSV row; raises RowError"""
+    from .models import Shipment
+
+    row = {_header(key): (value or '').strip() for key, value in raw.items() if key is not None}
+    if not row.get('customer_code') and not row.get('company_name'):
+        raise RowError('customer_code or company_name is required')
+
+    if row.get('tracking_number'):
+        row['weight'] = _decimal(row, 'weight')
+        statuses = dict(Shipment.STATUS_CHOICES)
+        if row.get('status') and row['status'] not in statuses:
+            raise RowError(f"status must be one of: {', '.join(statuses)}")
+
+    if row.get('item_description') or row.get('cbm'):
+        if not row.get('receipt_number'):
+            raise RowError('receipt_number is required for items')
+        if not row.get('item_description'):
+            raise RowError('item_description is required for items')
+        row['cbm'] = _decimal(row, 'cbm', required=True)
+        row['unit_price'] = _decimal(row, 'unit_price')
+        row['category'] = _category(row.get('category'), category_names)
+        row['has_item'] = True
+    return row
+
+
+class ImportSummary:
+    """Counters and row errors collected over an import"""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.errors = []
+        self.error_count = 0
+        # Existing receipts whose items were already replaced during this import
+        self.replaced_receipts = set()
+
+    def error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def as_dict(self):
+        data = {name: self.counts[name] for name in (
+            'rows', 'imported', 'customers_created', 'customers_updated', 'shipments_created',
+            'shipments_updated', 'receipts_created', 'items_created',
+        )}
+        data['error_count'] = self.error_count
+        data['errors'] = self.errors
+        return data
+
+
+def _merge(obj, values):
+    """Copy non-blank values onto obj; returns whether anything changed"""
+    changed = False
+    for name, value in values.items():
+        if value not in (None, '') and getattr(obj, name) != value:
+            setattr(obj, name, value)
+            changed = True
+    return changed
+
+
+def _upsert(model, objects, unique_field, update_fields):
+    """bulk_create upsert that leaves every object with its primary key set"""
+    if not objects:
+        return
+    model.objects.bulk_create(objects, update_conflicts=True, unique_fields=[unique_field],
+                              update_fields=update_fields + ['updated_at'])
+    missing = {getattr(obj, unique_field): obj for obj in objects if obj.pk is None}
+    if missing:
+        # Older Django versions don't return ids from upserts
+        for key, pk in model.objects.filter(**{f'{unique_field}__in': list(missing)}).values_list(unique_field, 'pk'):
+            missing[key].pk = pk
+
+
+def _import_customers(rows, summary):
+    """Upsert the batch's customers; returns {row index: Customer}"""
+    from .models import Customer
+
+    codes = {row['customer_code'] for _, row in rows if row.get('customer_code')}
+    names = {row['company_name'] for _, row in rows if not row.get('customer_code')}
+    by_code, by_name = {}, {}
+    for customer in Customer.objects.filter(Q(customer_code__in=codes) | Q(company_name__in=names)).order_by('pk'):
+        by_code[customer.customer_code] = customer
+        by_name.setdefault(customer.company_name, customer)
+
+    resolved, created, changed, renamed = {}, [], {}, []
+    for index, row in rows:
+        code = row.get('customer_code')
+        customer = by_code.get(code) if code else by_name.get(row['company_name'])
+        if customer is None:
+            customer = Customer(customer_code=code or None, company_name=row.get('company_name') or code)
+            if code:
+                by_code[code] = customer
+            else:
+                by_name[customer.company_name] = customer
+            created.append(customer)
+        previous_name = customer.company_name
+        values = {name: row.get(name, '') for name in CUSTOMER_FIELDS}
+        if _merge(customer, values) and customer.pk:
+            changed[customer.pk] = customer
+            if customer.company_name != previous_name:
+                renamed.append(customer.pk)
+        resolved[index] = customer
+
+    uncoded = [customer for customer in created if not customer.customer_code]
+    for customer, code in zip(uncoded, Customer.generate_customer_codes(len(uncoded)) if uncoded else []):
+        customer.customer_code = code
+
+    _upsert(Customer, created + list(changed.values()), 'customer_code', CUSTOMER_FIELDS)
+    # Later generated codes must not collide with the manifest's own
+    Customer.reserve_customer_codes([customer.customer_code for customer in created])
+    summary.counts['customers_created'] += len(created)
+    summary.counts['customers_updated'] += len(changed)
+    search.index_objects(created + list(changed.values()))
+    if renamed:
+        # Receipts and shipments are indexed with their customer's name
+        from .models import Receipt, Shipment
+        search.index_queryset(Receipt.objects.filter(customer_id__in=renamed))
+        search.index_queryset(Shipment.objects.filter(customer_id__in=renamed))
+        # So do their cached tracking projections
+        tracking.invalidate(Shipment.objects.filter(customer_id__in=renamed).values_list('tracking_number', flat=True))
+    if created or changed:
+        dashboard.invalidate()
+    return resolved
+
+
+def _import_shipments(rows, customers, summary, created_by):
+    """Upsert the batch's shipments; returns {row index: Shipment}"""
+    from .models import Shipment, ShipmentEvent
+
+    numbers = {row['tracking_number'] for _, row in rows}
+    existing = {shipment.tracking_number: shipment
+                for shipment in Shipment.objects.filter(tracking_number__in=numbers)}
+    previous_status = {number: shipment.status for number, shipment in existing.items()}
+
+    now = timezone.now()
+    resolved, created, changed, events = {}, {}, {}, []
+    for index, row in rows:
+        number = row['tracking_number']
+        shipment = existing.get(number)
+        status = row.get('status')
+        if shipment is None:
+            missing = [name for name in ('origin', 'destination', 'weight') if row.get(name) in (None, '')]
+            if missing:
+                summary.error(row['line'], f"New shipment {number} needs {', '.join(missing)}")
+                continue
+            shipment = Shipment(tracking_number=number, customer=customers[index], created_by=created_by,
+                                status=status or 'pending')
+            existing[number] = created[number] = shipment
+            events.append((shipment, '', shipment.status))
+        elif shipment.customer_id != customers[index].pk:
+            summary.error(row['line'], f'Shipment {number} belongs to another customer')
+            continue
+        elif status and status != shipment.status:
+            # Same state machine as batch transitions and API updates
+            if status not in Shipment.STATUS_TRANSITIONS.get(shipment.status, ()):
+                summary.error(row['line'], f'Shipment {number} cannot change from {shipment.status} to {status}')
+                continue
+            events.append((shipment, shipment.status, status))
+            if status == 'in_transit' and shipment.shipped_date is None:
+                shipment.shipped_date = now
+            elif status == 'delivered' and shipment.actual_delivery is None:
+                shipment.actual_delivery = now
+        values = {field: row.get(column, '') for column, field in SHIPMENT_FIELDS.items()}
+        if _merge(shipment, values) and shipment.pk:
+            changed[number] = shipment
+        shipment.customer = customers[index]
+        resolved[index] = shipment
+
+    objects = list(created.values()) + list(changed.values())
+    _upsert(Shipment, objects, 'tracking_number',
+            ['customer', 'shipped_date', 'actual_delivery'] + list(SHIPMENT_FIELDS.values()))
+    # Bulk writes skip the signal that logs creations and status changes
+    ShipmentEvent.objects.bulk_create([
+        ShipmentEvent(shipment_id=shipment.pk, from_status=previous, to_status=status, created_by=created_by,
+                      created_at=now)
+        for shipment, previous, status in events
+    ])
+    summary.counts['shipments_created'] += len(created)
+    summary.counts['shipments_updated'] += len(changed)
+    search.index_objects(objects)
+    changes.record('shipment', created.values(), 'created')
+    changes.record('shipment', changed.values(), 'updated')
+    # Numbers looked up before they were imported are cached as not found
+    tracking.invalidate(list(created) + list(changed))
+
+    # Bulk writes skip the signal handlers that keep the status rollup current
+    deltas = Counter(shipment.status for shipment in created.values())
+    for number, shipment in changed.items():
+        if shipment.status != previous_status[number]:
+            deltas[previous_status[number]] -= 1
+            deltas[shipment.status] += 1
+    for status, delta in deltas.items():
+        dashboard.bump_shipment_status(status, delta)
+    return resolved
+
+
+def _import_items(rows, customers, shipments, summary, created_by):
+    from .models import Receipt, ReceiptItem
+
+    numbers = {row['receipt_number'] for _, row in rows}
+    receipts = {receipt.receipt_number: receipt for receipt in Receipt.objects.filter(receipt_number__in=numbers)}
+    previous_keys = [(receipt.issue_date, receipt.container_number, receipt.customer_id) for receipt in receipts.values()]
+
+    created, moved, replace, items, imported = {}, {}, [], [], set()
+    for index, row in rows:
+        number, customer = row['receipt_number'], customers[index]
+        receipt = receipts.get(number)
+        if receipt is None:
+            receipt = Receipt(receipt_number=number, customer=customer, created_by=created_by)
+            receipts[number] = created[number] = receipt
+        elif receipt.customer_id != customer.pk:
+            summary.error(row['line'], f'Receipt {number} belongs to another customer')
+            continue
+        if _merge(receipt, {'container_number': row.get('container_number', '')}) and receipt.pk:
+            moved[number] = receipt
+        if receipt.pk and receipt.pk not in summary.replaced_receipts:
+            summary.replaced_receipts.add(receipt.pk)
+            replace.append(receipt.pk)
+        receipt.customer = customer
+        shipment = shipments.get(index)
+        items.append((number, ReceiptItem(
+            category=row['category'], description=row['item_description'][:200], cbm=row['cbm'],
+            unit_price=row['unit_price'], shipment_id=shipment.pk if shipment else None,
+        )))
+        imported.add(index)
+
+    if created:
+        Receipt.objects.bulk_create(created.values())
+        missing = {number: receipt for number, receipt in created.items() if receipt.pk is None}
+        for number, pk in Receipt.objects.filter(receipt_number__in=list(missing)).values_list('receipt_number', 'pk'):
+            missing[number].pk = pk
+        summary.replaced_receipts.update(receipt.pk for receipt in created.values())
+        Receipt.reserve_receipt_numbers(created)
+    if moved:
+        Receipt.objects.bulk_update(moved.values(), ['container_number'])
+    if replace:
+        # The receipts' totals are recomputed below, so skip the per-item delete signals
+        # (nothing references receipt items, so no cascade is missed)
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {ReceiptItem._meta.db_table} WHERE receipt_id IN ({', '.join(['%s'] * len(replace))})",
+                           replace)
+
+    for number, item in items:
+        item.receipt = receipts[number]
+        item.calculate_total()
+    ReceiptItem.objects.bulk_create([item for _, item in items])
+
+    touched = {receipts[number].pk: receipts[number] for number, _ in items}
+    totals.recompute_totals(touched)
+    summary.counts['receipts_created'] += len(created)
+    summary.counts['items_created'] += len(items)
+    search.index_objects(list(created.values()) + list(moved.values()))
+    dashboard.receipts_changed(list(touched.values()), previous_keys)
+    # Read back after the commit, for the recomputed totals
+    created_ids = {receipt.pk for receipt in created.values()}
+    changes.record_ids('receipt', created_ids, 'created')
+    changes.record_ids('receipt', (set(touched) | {receipt.pk for receipt in moved.values()}) - created_ids)
+    return imported
+
+
+def _import_batch(batch, summary, created_by):
+    customer_rows = list(enumerate(batch))
+    customers = _import_customers(customer_rows, summary)
+
+    shipment_rows = [(index, row) for index, row in customer_rows if row.get('tracking_number')]
+    shipments = _import_shipments(shipment_rows, customers, summary, created_by) if shipment_rows else {}
+    failed = {index for index, _ in shipment_rows if index not in shipments}
+
+    item_rows = [(index, row) for index, row in customer_rows if row.get('has_item') and index not in failed]
+    imported_items = _import_items(item_rows, customers, shipments, summary, created_by) if item_rows else set()
+    summary.counts['imported'] += len(batch) - len(failed) - (len(item_rows) - len(imported_items))
+
+
+def import_manifest(stream, batch_size=BATCH_SIZE, dry_run=False, created_by=None):
+    """
+    Import a manifest from a text stream of CSV. Returns an ImportSummary; with dry_run
+    every batch is rolled back after it runs. Raises ManifestError for unusable files.
+    """
+    reader = csv.DictReader(stream)
+    columns = {_header(name) for name in reader.fieldnames or []}
+    if not columns & REQUIRED_COLUMNS:
+        raise ManifestError('The manifest needs a customer_code or company_name column')
+
+    summary = ImportSummary()
+    category_names = _category_lookup()
+    batch = []
+
+    def flush():
+        if not batch:
+            return
+        with transaction.atomic():
+            _import_batch(batch, summary, created_by)
+            if dry_run:
+                transaction.set_rollback(True)
+        batch.clear()
+
+    for raw in reader:
+        summary.counts['rows'] += 1
+        try:
+            row = parse_row(raw, category_names)
+        except RowError as e:
+            summary.error(reader.line_num, str(e))
+            continue
+        row['line'] = reader.line_num
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    return summary
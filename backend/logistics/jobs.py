@@ -0,0 +1,334 @@
+"""
+Background jobs, queued in the database.
+
+``enqueue()`` stores a ``Job`` row; ``manage.py run_jobs`` workers claim due jobs with
+``SELECT ... FOR UPDATE SKIP LOCKED`` (on PostgreSQL; elsewhere a conditional UPDATE keeps
+two workers off the same job) and run them outside the request cycle. A failed job is
+retried with exponential backoff until it has used ``max_attempts``, and a job whose
+worker died is picked up again once it has been running longer than ``JOB_TIMEOUT``.
+
+With ``JOBS_EAGER`` set, jobs run in the enqueuing process right after its transaction
+commits instead, which stands in for a worker during local development.
+
+Each kind of job is a ``JobType`` subclass registered with ``@register``.
+
+Files a job reads or writes are ``JobFile`` rows rather than files on local disk, so a
+worker on another machine sees the upload the web process stored, and the web process
+can serve what the worker produced. They are written and read in parts of FILE_PART_SIZE
+bytes, so an export is never held in memory whole. Inputs are deleted once their job succeeds, and the
+workers delete every file of jobs that finished more than JOB_FILES_RETENTION_DAYS ago.
+"""
+import io
+import logging
+import os
+import socket
+import time
+import traceback
+from abc import ABC, abstractmethod
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+JOB_TYPES = {}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# Bytes per JobFile row, so a large output is never held in memory whole
+FILE_PART_SIZE = 4 * 1024 * 1024
+
+
+def save_file(job, name, content, is_input=False):
+    """
+    Store one of the job's files, replacing any of the same name. content is bytes or an
+    iterable of byte chunks, written FILE_PART_SIZE bytes at a time; returns the size.
+    """
+    from .models import JobFile
+
+    chunks = [content] if isinstance(content, (bytes, bytearray)) else content
+    buffer = bytearray()
+    parts = size = 0
+
+    def write(data):
+        nonlocal parts, size
+        JobFile.objects.create(job=job, name=name, part=parts, content=bytes(data), size=len(data),
+                               is_input=is_input)
+        parts += 1
+        size += len(data)
+
+    with transaction.atomic():
+        JobFile.objects.filter(job=job, name=name).delete()
+        for chunk in chunks:
+            buffer += chunk
+            while len(buffer) >= FILE_PART_SIZE:
+                write(buffer[:FILE_PART_SIZE])
+                del buffer[:FILE_PART_SIZE]
+        if buffer or not parts:
+            write(buffer)
+    return size
+
+
+def file_parts(job, name):
+    """
+    Iterator over the bytes of one of the job's files, reading one part at a time;
+    raises JobFile.DoesNotExist
+    """
+    from .models import JobFile
+
+    files = JobFile.objects.filter(job=job, name=name)
+    pks = list(files.order_by('part').values_list('pk', flat=True))
+    if not pks:
+        raise JobFile.DoesNotExist(f'Job {job.pk} has no file {name}')
+    return (bytes(files.values_list('content', flat=True).get(pk=pk)) for pk in pks)
+
+
+def read_file(job, name):
+    """Bytes of one of the job's files; raises JobFile.DoesNotExist"""
+    return b''.join(file_parts(job, name))
+
+
+# Seconds between a worker's sweeps of expired job files
+PRUNE_INTERVAL = 3600
+
+
+def prune_files(before):
+    """Delete the files of jobs that finished before the given time; returns how many"""
+    from .models import JobFile
+
+    deleted, _ = JobFile.objects.filter(job__finished_at__lt=before).delete()
+    return deleted
+
+
+def register(cls):
+    JOB_TYPES[cls.name] = cls()
+    return cls
+
+
+class JobType(ABC):
+    """A kind of background job: validates its params and runs it"""
+    name = None
+    # Whether clients may enqueue it directly through POST /jobs/
+    public = True
+    max_attempts = 3
+
+    def validate(self, params):
+        """Cleaned params; raises ValueError when they are unusable"""
+        return params
+
+    @abstractmethod
+    def run(self, job):
+        """Do the work and return a JSON-able result; raising schedules a retry"""
+
+
+def enqueue(kind, params=None, created_by=None, delay=0, files=None):
+    """
+    Validate and queue a job, storing files ({name: bytes}) as its inputs; raises
+    ValueError for unknown kinds or bad params
+    """
+    from .models import Job
+
+    job_type = JOB_TYPES.get(kind)
+    if job_type is None:
+        raise ValueError(f"Unknown job kind: {kind}. Choose from {', '.join(sorted(JOB_TYPES))}")
+    params = job_type.validate(dict(params or {}))
+    with transaction.atomic():
+        job = Job.objects.create(
+            kind=kind,
+            params=params,
+            max_attempts=job_type.max_attempts,
+            run_after=timezone.now() + timedelta(seconds=delay),
+            created_by=created_by if created_by and created_by.is_authenticated else None,
+        )
+        for name, content in (files or {}).items():
+            save_file(job, name, content, is_input=True)
+    if _setting('JOBS_EAGER', False):
+        transaction.on_commit(lambda: run_job(job.pk))
+    return job
+
+
+def requeue_stale():
+    """Put back jobs whose worker stopped responding, or fail them if out of attempts"""
+    from .models import Job
+
+    now = timezone.now()
+    stale = Job.objects.filter(status='running', locked_at__lt=now - timedelta(seconds=_setting('JOB_TIMEOUT', 3600)))
+    reset = {'locked_by': '', 'locked_at': None}
+    stale.filter(attempts__lt=F('max_attempts')).update(status='queued', run_after=now, **reset)
+    stale.update(status='failed', finished_at=now, error='Worker stopped while running the job', **reset)
+
+
+def claim(worker_id):
+    """Lock the oldest due job for this worker and mark it running; returns it or None"""
+    from .models import Job
+
+    now = timezone.now()
+    with transaction.atomic():
+        job = (Job.objects.select_for_update(skip_locked=True)
+               .filter(status='queued', run_after__lte=now).order_by('run_after', 'id').first())
+        if job is None:
+            return None
+        claimed = Job.objects.filter(pk=job.pk, status='queued').update(
+            status='running', locked_by=worker_id, locked_at=now, attempts=job.attempts + 1,
+            started_at=now, error='',
+        )
+    if not claimed:
+        return None
+    job.refresh_from_db()
+    return job
+
+
+def run_job(job_or_pk, worker_id=None):
+    """Run a job (claiming it first if given by id) and record the outcome"""
+    from .models import Job
+
+    job = job_or_pk
+    if not isinstance(job, Job):
+        claimed = Job.objects.filter(pk=job, status='queued').update(
+            status='running', locked_by=worker_id or 'eager', locked_at=timezone.now(),
+            attempts=F('attempts') + 1, started_at=timezone.now(),
+        )
+        if not claimed:
+            return None
+        job = Job.objects.get(pk=job)
+
+    try:
+        result = JOB_TYPES[job.kind].run(job)
+    except Exception:
+        logger.exception('Job %s (%s) failed on attempt %s', job.pk, job.kind, job.attempts)
+        retry = job.attempts < job.max_attempts
+        backoff = _setting('JOB_RETRY_DELAY', 30) * 2 ** (job.attempts - 1)
+        Job.objects.filter(pk=job.pk).update(
+            status='queued' if retry else 'failed',
+            run_after=timezone.now() + timedelta(seconds=backoff),
+            finished_at=None if retry else timezone.now(),
+            error=traceback.format_exc()[-5000:],
+            locked_by='', locked_at=None,
+        )
+    else:
+        with transaction.atomic():
+            Job.objects.filter(pk=job.pk).update(
+                status='succeeded', result=result, finished_at=timezone.now(), locked_by='', locked_at=None,
+            )
+            job.files.filter(is_input=True).delete()
+    job.refresh_from_db()
+    return job
+
+
+def default_worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def work(worker_id=None, burst=False, poll_interval=2.0, max_jobs=None, should_stop=lambda: False):
+    """Claim and run jobs until stopped; with burst, return once no job is due. Returns jobs run."""
+    worker_id = worker_id or default_worker_id()
+    processed = 0
+    pruned_at = None
+    while not should_stop() and (max_jobs is None or processed < max_jobs):
+        close_old_connections()
+        requeue_stale()
+        if pruned_at is None or time.monotonic() - pruned_at > PRUNE_INTERVAL:
+            prune_files(timezone.now() - timedelta(days=_setting('JOB_FILES_RETENTION_DAYS', 7)))
+            pruned_at = time.monotonic()
+        job = claim(worker_id)
+        if job is None:
+            if burst:
+                break
+            time.sleep(poll_interval)
+            continue
+        run_job(job, worker_id)
+        processed += 1
+    close_old_connections()
+    return processed
+
+
+@register
+class ExportReceiptsJob(JobType):
+    name = 'export_receipts'
+
+    def validate(self, params):
+        from . import exports
+        from .models import Receipt
+
+        params.setdefault('file_format', 'csv')
+        if params['file_format'] not in exports.CONTENT_TYPES:
+            raise ValueError('file_format must be csv or xlsx')
+        exports.filter_receipts(Receipt.objects.none(), params.get('date_from'), params.get('date_to'))
+        return {key: params.get(key) for key in ('file_format', 'date_from', 'date_to', 'customer', 'payment_status')}
+
+    def run(self, job):
+        from . import exports
+        from .models import Receipt
+
+        params = job.params
+        receipts = exports.filter_receipts(Receipt.objects.all(), params['date_from'], params['date_to'],
+                                           params['customer'], params['payment_status'])
+        name = f"receipts.{params['file_format']}"
+        size = save_file(job, name, exports.export_chunks(params['file_format'], exports.export_rows(receipts)))
+        return {'file': name, 'bytes': size}
+
+
+@register
+class ImportManifestJob(JobType):
+    name = 'import_manifest'
+    # Reads the uploaded MANIFEST_FILE, so it is only queued by the upload endpoint
+    public = False
+    # Bad rows are reported rather than raised, so a retry would not do better
+    max_attempts = 1
+
+    def run(self, job):
+        from . import imports
+
+        with io.TextIOWrapper(io.BytesIO(read_file(job, MANIFEST_FILE)), encoding='utf-8-sig', newline='') as f:
+            summary = imports.import_manifest(f, dry_run=job.params.get('dry_run', False),
+                                              created_by=job.created_by)
+        return summary.as_dict()
+
+
+MANIFEST_FILE = 'manifest.csv'
+
+
+@register
+class RenderReceiptsJob(JobType):
+    name = 'render_receipts'
+
+    def validate(self, params):
+        from django.utils.dateparse import parse_date
+
+        day = parse_date(params.get('date') or '') if params.get('date') else timezone.localdate()
+        if day is None:
+            raise ValueError(f"Invalid date: {params.get('date')}")
+        return {'date': day.isoformat(), 'workers': max(1, min(int(params.get('workers') or 2), os.cpu_count() or 1))}
+
+    def run(self, job):
+        from django.utils.dateparse import parse_date
+        from . import receipt_pdf
+
+        receipts_data = [receipt_pdf.receipt_data(receipt)
+                         for receipt in receipt_pdf.receipts_for_day(parse_date(job.params['date']))]
+        results = receipt_pdf.render_many(receipts_data, workers=job.params['workers'])
+        rendered = sum(1 for _, was_rendered in results if was_rendered)
+        return {'receipts': len(results), 'rendered': rendered, 'cached': len(results) - rendered}
+
+
+@register
+class ReconcileTotalsJob(JobType):
+    name = 'reconcile_totals'
+
+    def validate(self, params):
+        return {'batch_size': max(1, int(params.get('batch_size') or 1000)), 'dry_run': bool(params.get('dry_run'))}
+
+    def run(self, job):
+        from .totals import reconcile_receipt_totals
+
+        checked, drifted = 0, []
+        for batch_checked, batch_drifted in reconcile_receipt_totals(job.params['batch_size'], job.params['dry_run']):
+            checked += batch_checked
+            drifted.extend(batch_drifted)
+        return {'checked': checked, 'drifted': len(drifted), 'drifted_ids': drifted[:100]}
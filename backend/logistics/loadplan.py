@@ -0,0 +1,156 @@
+"""
+Container load planning by volume (CBM).
+
+Containers are assigned per receipt (``Receipt.container_number``), so receipts are the
+unit of packing: a receipt's volume is the sum of its items' CBM, and receipts without a
+container number are the ones still waiting to be loaded.
+
+``plan()`` packs them with first-fit decreasing: receipts are taken largest first and
+each goes into the first open container with room, found in O(log n) through a max
+segment tree over the containers' remaining capacity, so tens of thousands of receipts
+plan in about a second. Containers are packed at the largest allowed type's capacity and
+each is then given the smallest type its load fits in. Volumes are handled in whole
+litres to keep the arithmetic exact.
+
+``fill_ratios()`` reports how full each loaded container is, from the ``ContainerStats``
+rollups. Receipts only record a container's number, not its type, so the ratio is
+against the capacity of one chosen type: how full the load would make that container.
+"""
+from decimal import Decimal
+
+from django.db.models import Count, Max, Min, Sum
+
+# Usable loading volume in CBM, below the nominal internal volume to allow for stowage
+CONTAINER_TYPES = {
+    '20ft': Decimal('28'),
+    '40ft': Decimal('58'),
+    '40hc': Decimal('68'),
+}
+DEFAULT_CONTAINER_TYPE = '40hc'
+LITRES = Decimal('1000')
+
+
+def _litres(cbm):
+    return int((Decimal(cbm) * LITRES).to_integral_value())
+
+
+def first_fit_decreasing(sizes, capacity):
+    """
+    Pack sizes (whole numbers) into bins of capacity. Returns (bins, oversized): bins as
+    lists of indexes into sizes, and indexes of sizes larger than capacity.
+    """
+    leaves = 1
+    while leaves < max(len(sizes), 1):
+        leaves *= 2
+    # tree[node] = most room left in any bin below node; leaf i is bin i (unopened bins are empty)
+    tree = [capacity] * (2 * leaves)
+    bins = []
+    oversized = []
+    for index in sorted(range(len(sizes)), key=lambda i: -sizes[i]):
+        size = sizes[index]
+        if size > capacity:
+            oversized.append(index)
+            continue
+        node = 1
+        while node < leaves:
+            node = 2 * node if tree[2 * node] >= size else 2 * node + 1
+        position = node - leaves
+        if position == len(bins):
+            bins.append([])
+        bins[position].append(index)
+        tree[node] -= size
+        node //= 2
+        while node:
+            tree[node] = max(tree[2 * node], tree[2 * node + 1])
+            node //= 2
+    return bins, oversized
+
+
+def smallest_fitting_type(volume, types):
+    """The smallest of types (names in CONTAINER_TYPES) holding volume litres, or None"""
+    for name in sorted(types, key=lambda name: CONTAINER_TYPES[name]):
+        if _litres(CONTAINER_TYPES[name]) >= volume:
+            return name
+    return None
+
+
+def pending_receipts(queryset=None):
+    """(id, receipt_number, customer_id, items, cbm) of receipts with items but no container yet"""
+    from .models import Receipt
+
+    queryset = Receipt.objects.all() if queryset is None else queryset
+    return list(queryset.filter(container_number='').order_by()
+                .annotate(item_count=Count('items'), volume=Sum('items__cbm'))
+                .filter(item_count__gt=0)
+                .values_list('id', 'receipt_number', 'customer_id', 'item_count', 'volume'))
+
+
+def plan(receipts, types=None):
+    """
+    Assign receipts ((id, receipt_number, customer_id, items, cbm) rows) to containers.
+    Returns {'containers': [...], 'oversized': [...], 'summary': {...}}.
+    """
+    types = list(types or CONTAINER_TYPES)
+    largest = max(types, key=lambda name: CONTAINER_TYPES[name])
+    capacity = _litres(CONTAINER_TYPES[largest])
+    sizes = [_litres(row[4] or 0) for row in receipts]
+    bins, oversized = first_fit_decreasing(sizes, capacity)
+
+    containers = []
+    for number, indexes in enumerate(bins, start=1):
+        volume = sum(sizes[i] for i in indexes)
+        container_type = smallest_fitting_type(volume, types)
+        type_capacity = CONTAINER_TYPES[container_type]
+        containers.append({
+            'load': number,
+            'container_type': container_type,
+            'capacity_cbm': type_capacity,
+            'cbm': Decimal(volume) / LITRES,
+            'fill_ratio': round(volume / _litres(type_capacity), 4),
+            'items': sum(receipts[i][3] for i in indexes),
+            'receipts': [{'id': receipts[i][0], 'receipt_number': receipts[i][1], 'customer': receipts[i][2],
+                          'cbm': Decimal(sizes[i]) / LITRES} for i in indexes],
+        })
+
+    planned = sum(sizes) - sum(sizes[i] for i in oversized)
+    capacity_used = sum(_litres(container['capacity_cbm']) for container in containers)
+    by_type = {}
+    for container in containers:
+        by_type[container['container_type']] = by_type.get(container['container_type'], 0) + 1
+    return {
+        'containers': containers,
+        'oversized': [{'id': receipts[i][0], 'receipt_number': receipts[i][1], 'cbm': Decimal(sizes[i]) / LITRES}
+                      for i in oversized],
+        'summary': {
+            'receipts': len(receipts) - len(oversized),
+            'cbm': Decimal(planned) / LITRES,
+            'containers': len(containers),
+            'by_type': by_type,
+            'fill_ratio': round(planned / capacity_used, 4) if capacity_used else None,
+        },
+    }
+
+
+def fill_ratios(containers, container_type=DEFAULT_CONTAINER_TYPE):
+    """
+    CBM, items, receipts and fill ratio against container_type's capacity for ContainerStats
+    rows, with their receipts' loading date and ETA read in one grouped query
+    """
+    from .models import Receipt
+
+    capacity = CONTAINER_TYPES[container_type]
+    dates = {row['container_number']: row for row in (
+        Receipt.objects.filter(container_number__in=[container.container_number for container in containers])
+        .order_by().values('container_number')
+        .annotate(loading_date=Min('loading_date'), eta=Max('eta')))}
+    return [{
+        'container_number': container.container_number,
+        'items': container.items,
+        'receipts': container.receipts,
+        'customers': container.customers,
+        'cbm': container.cbm,
+        'capacity_cbm': capacity,
+        'fill_ratio': round(float(container.cbm / capacity), 4),
+        'loading_date': dates.get(container.container_number, {}).get('loading_date'),
+        'eta': dates.get(container.container_number, {}).get('eta'),
+    } for container in containers]
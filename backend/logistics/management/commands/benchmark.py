@@ -0,0 +1,74 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from logistics import benchmark
+
+
+class Command(BaseCommand):
+    help = ("Measure latency percentiles and query counts of every API GET endpoint in process, "
+            "save them as JSON and optionally compare against an earlier run")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20, help='Timed requests per endpoint (default 20)')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed requests per endpoint first (default 2)')
+        parser.add_argument('--only', help='Only endpoints whose name contains this text')
+        parser.add_argument('--output', help='JSON file to write (default benchmarks/<commit>.json)')
+        parser.add_argument('--compare', help='Earlier JSON result to compare against')
+        parser.add_argument('--threshold', type=float, default=20,
+                            help='p95 growth in percent counted as a regression (default 20)')
+        parser.add_argument('--min-ms', type=float, default=2,
+                            help='Ignore p95 growth smaller than this many ms (default 2)')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='Exit with an error if any endpoint regressed')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['warmup'] < 0:
+            raise CommandError('--requests must be positive and --warmup not negative')
+        baseline = benchmark.load(options['compare']) if options['compare'] else None
+
+        self.stdout.write(f"{'endpoint':<40} {'status':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+                          f"{'db ms':>7} {'queries':>7}")
+        report = benchmark.run(requests=options['requests'], warmup=options['warmup'], only=options['only'],
+                               progress=self.write_result)
+        if not report['results']:
+            raise CommandError('No endpoints matched')
+
+        output = options['output'] or os.path.join(
+            settings.BASE_DIR, 'benchmarks', f"{(report['meta']['commit'] or 'unknown')[:12]}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(f'\nSaved {len(report["results"])} results to {output}')
+
+        if baseline is not None:
+            self.write_comparison(baseline, report, options)
+
+    def write_result(self, result):
+        db_ms = '-' if result['db_p50_ms'] is None else f"{result['db_p50_ms']:.1f}"
+        self.stdout.write(f"{result['name'][:40]:<40} {result['status']:>6} {result['p50_ms']:>8.1f} "
+                          f"{result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} {db_ms:>7} {result['queries']:>7}")
+
+    def write_comparison(self, baseline, report, options):
+        changes = benchmark.compare(baseline, report, threshold=options['threshold'] / 100, min_ms=options['min_ms'])
+        self.stdout.write(f"\nCompared with {(baseline['meta'].get('commit') or 'unknown')[:12]} "
+                          f"(p95 ms, queries)")
+        regressions = 0
+        for name, old, new, regressed in changes:
+            if old is None:
+                self.stdout.write(f"  {name[:40]:<40} new: {new['p95_ms']:.1f} ms, {new['queries']} queries")
+                continue
+            change = (new['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100 if old['p95_ms'] else 0
+            line = (f"  {name[:40]:<40} {old['p95_ms']:>8.1f} -> {new['p95_ms']:>8.1f} ({change:+6.1f}%)  "
+                    f"{old['queries']:>3} -> {new['queries']:<3}")
+            if regressed:
+                regressions += 1
+                self.stdout.write(self.style.ERROR(line + '  REGRESSION'))
+            else:
+                self.stdout.write(line)
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f'{regressions} endpoint(s) regressed')
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS('No regressions'))
@@ -0,0 +1,118 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from logistics.models import Customer, Receipt, ReceiptItem, Shipment
+
+
+class Rollback(Exception):
+    pass
+
+
+def hot_queries():
+    """The filter/search access paths the indexes in 0015_hot_path_indexes are meant to serve"""
+    customer_id = Customer.objects.order_by('pk').values_list('pk', flat=True).first() or 0
+    receipt_id = Receipt.objects.order_by('pk').values_list('pk', flat=True).first() or 0
+    return [
+        ('shipments by customer+status, newest first',
+         Shipment.objects.filter(customer_id=customer_id, status='in_transit').order_by('-created_at')[:20]),
+        ('shipments by status, newest first',
+         Shipment.objects.filter(status='pending').order_by('-created_at')[:20]),
+        ('receipts by customer+payment_status, newest first',
+         Receipt.objects.filter(customer_id=customer_id, payment_status='pending').order_by('-issue_date')[:20]),
+        ('receipts newest first',
+         Receipt.objects.order_by('-issue_date')[:20]),
+        ('receipt_number prefix probe',
+         Receipt.objects.filter(receipt_number__startswith='RCP-20240101-')),
+        ('receipt items of a receipt',
+         ReceiptItem.objects.filter(receipt_id=receipt_id).order_by('id')),
+        ('customer company_name search',
+         Customer.objects.filter(company_name__icontains='logist')),
+        ('shipment tracking_number search',
+         Shipment.objects.filter(tracking_number__icontains='TRK0042')),
+        ('shipment description search',
+         Shipment.objects.filter(description__icontains='fragile')),
+    ]
+
+
+def seed(rows):
+    """Insert synthetic customers, shipments, receipts and one item per receipt server-side (PostgreSQL only)"""
+    customers = max(rows // 100, 1)
+    customer_table = Customer._meta.db_table
+    statements = [
+        f"""
+        INSERT INTO {customer_table} (company_name, customer_code, contact_person, phone, email, address,
+                                      company_registration, created_at, updated_at, is_active)
+        SELECT 'Seed Logistics ' || i, 'SEED' || i, '', '', '', '', '', NOW(), NOW(), TRUE
+        FROM generate_series(1, %(customers)s) AS i
+        """,
+        f"""
+        INSERT INTO {Shipment._meta.db_table} (tracking_number, customer_id, origin, destination, description,
+                                               weight, dimensions, status, created_at, updated_at)
+        SELECT 'TRK' || lpad(i::text, 8, '0'), c.min_id + (i %% %(customers)s), 'Guangzhou', 'Tema',
+               CASE WHEN i %% 50 = 0 THEN 'fragile electronics' ELSE 'general cargo' END,
+               10, '', (ARRAY['pending', 'in_transit', 'delivered', 'cancelled'])[1 + i %% 4],
+               NOW() - (i %% 3650) * INTERVAL '1 day', NOW()
+        FROM generate_series(1, %(rows)s) AS i,
+             (SELECT MIN(id) AS min_id FROM {customer_table} WHERE customer_code LIKE 'SEED%%') AS c
+        """,
+        f"""
+        INSERT INTO {Receipt._meta.db_table} (receipt_number, customer_id, issue_date, total_amount, payment_status,
+                                              payment_method, notes, container_number, created_at, updated_at)
+        SELECT 'RCP-' || to_char(NOW() - (i %% 3650) * INTERVAL '1 day', 'YYYYMMDD') || '-S' || i,
+               c.min_id + (i %% %(customers)s), NOW() - (i %% 3650) * INTERVAL '1 day', 0,
+               (ARRAY['pending', 'paid', 'partial'])[1 + i %% 3], '', '', '', NOW(), NOW()
+        FROM generate_series(1, %(rows)s) AS i,
+             (SELECT MIN(id) AS min_id FROM {customer_table} WHERE customer_code LIKE 'SEED%%') AS c
+        """,
+        f"""
+        INSERT INTO {ReceiptItem._meta.db_table} (receipt_id, description, cbm, unit_price, total_price)
+        SELECT id, CASE WHEN id %% 50 = 0 THEN 'fragile electronics' ELSE 'general cargo' END, 1.5, 100, 150
+        FROM {Receipt._meta.db_table} WHERE receipt_number LIKE 'RCP-%%-S%%'
+        """,
+    ]
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql, {'rows': rows, 'customers': customers})
+        for model in (Customer, Shipment, Receipt, ReceiptItem):
+            cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the hot filter/search queries and report which ones fall back to sequential scans"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Insert this many synthetic shipments and receipts first (PostgreSQL only)')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the seeded rows instead of rolling them back')
+        parser.add_argument('--analyze', action='store_true',
+                            help='Run EXPLAIN ANALYZE to include actual timings')
+
+    def handle(self, *args, **options):
+        if options['seed'] and connection.vendor != 'postgresql':
+            raise CommandError('--seed needs PostgreSQL (it uses generate_series)')
+
+        try:
+            with transaction.atomic():
+                if options['seed']:
+                    self.stdout.write(f"Seeding {options['seed']} shipments and receipts...")
+                    seed(options['seed'])
+                self.report(options['analyze'], options['verbosity'])
+                if options['seed'] and not options['keep']:
+                    raise Rollback
+        except Rollback:
+            self.stdout.write('Seeded rows rolled back')
+
+    def report(self, analyze, verbosity):
+        queries = hot_queries()
+        sequential = 0
+        for label, queryset in queries:
+            plan = queryset.explain(analyze=analyze) if connection.vendor == 'postgresql' else queryset.explain()
+            table = queryset.model._meta.db_table
+            uses_scan = f'Seq Scan on {table}' in plan or f'SCAN {table}' in plan
+            sequential += uses_scan
+            style = self.style.WARNING if uses_scan else self.style.SUCCESS
+            self.stdout.write(style(f"{'SEQ SCAN' if uses_scan else 'INDEX   '}  {label}"))
+            if verbosity > 1 or uses_scan:
+                self.stdout.write('    ' + plan.replace('\n', '\n    '))
+        self.stdout.write(f"{sequential} of {len(queries)} queries use a sequential scan")
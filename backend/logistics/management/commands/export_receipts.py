@@ -0,0 +1,50 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from logistics import exports
+from logistics.models import Receipt
+
+
+class Command(BaseCommand):
+    help = "Export receipts and their items as CSV or XLSX, streamed in constant memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['csv', 'xlsx'], default='csv', dest='file_format',
+                            help='Output format (default csv)')
+        parser.add_argument('--output', '-o',
+                            help='File to write (default stdout; required for xlsx)')
+        parser.add_argument('--date-from', help='First issue date to include (YYYY-MM-DD)')
+        parser.add_argument('--date-to', help='Last issue date to include (YYYY-MM-DD)')
+        parser.add_argument('--customer', type=int, help='Only receipts of this customer id')
+        parser.add_argument('--payment-status', help='Only receipts with this payment status')
+        parser.add_argument('--chunk-size', type=int, default=exports.CHUNK_SIZE,
+                            help=f'Rows fetched per cursor round trip (default {exports.CHUNK_SIZE})')
+
+    def handle(self, *args, **options):
+        if options['file_format'] == 'xlsx' and not options['output']:
+            raise CommandError('--output is required for xlsx exports')
+        try:
+            receipts = exports.filter_receipts(
+                Receipt.objects.all(),
+                date_from=options['date_from'],
+                date_to=options['date_to'],
+                customer=options['customer'],
+                payment_status=options['payment_status'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        chunks = exports.export_chunks(options['file_format'], exports.export_rows(receipts, options['chunk_size']))
+        if not options['output']:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.flush()
+            return
+
+        written = 0
+        with open(options['output'], 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                written += len(chunk)
+        self.stderr.write(self.style.SUCCESS(f"Wrote {written} bytes to {options['output']}"))
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from logistics import benchmark
+
+
+class Command(BaseCommand):
+    help = ("Bulk-insert a synthetic logistics dataset for benchmarking (defaults: 10k customers, "
+            "1M receipts with ~10M items, 50k shipments in every status). Adds to existing data.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=10000)
+        parser.add_argument('--receipts', type=int, default=1000000)
+        parser.add_argument('--items-per-receipt', type=int, default=10,
+                            help='Average items per receipt (default 10)')
+        parser.add_argument('--shipments', type=int, help='Shipments to create (default 5 per customer)')
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--days', type=int, default=730, help='Spread receipts over this many past days')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert (default 5000)')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed, for reproducible datasets')
+        parser.add_argument('--skip-search-index', action='store_true',
+                            help='Do not index the new rows for full-text search (rebuild_search_index later)')
+
+    def handle(self, *args, **options):
+        if min(options['customers'], options['receipts'], options['items_per_receipt'], options['categories'],
+               options['days'], options['batch_size']) < 1:
+            raise CommandError('Counts, --days and --batch-size must be positive')
+        started = time.perf_counter()
+        created = benchmark.generate(
+            customers=options['customers'], receipts=options['receipts'],
+            items_per_receipt=options['items_per_receipt'], shipments=options['shipments'],
+            categories=options['categories'], days=options['days'], batch_size=options['batch_size'],
+            seed=options['seed'], build_search_index=not options['skip_search_index'],
+            progress=lambda message: self.stdout.write(f'  {message}'),
+        )
+        summary = ', '.join(f'{count} {name}' for name, count in created.items())
+        self.stdout.write(self.style.SUCCESS(f'Created {summary} in {time.perf_counter() - started:.0f}s'))
@@ -0,0 +1,45 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from logistics import imports
+
+
+class Command(BaseCommand):
+    help = "Import customers, shipments and receipt items from a manifest CSV in bulk"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Manifest CSV file, or - for stdin")
+        parser.add_argument('--batch-size', type=int, default=imports.BATCH_SIZE,
+                            help=f'Rows written per transaction (default {imports.BATCH_SIZE})')
+        parser.add_argument('--encoding', default='utf-8-sig', help='File encoding (default utf-8-sig)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Validate and run every batch, then roll it back')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        try:
+            if options['path'] == '-':
+                summary = imports.import_manifest(sys.stdin, options['batch_size'], options['dry_run'])
+            else:
+                with open(options['path'], encoding=options['encoding'], newline='') as f:
+                    summary = imports.import_manifest(f, options['batch_size'], options['dry_run'])
+        except (OSError, imports.ManifestError) as e:
+            raise CommandError(str(e))
+        elapsed = time.monotonic() - started
+
+        result = summary.as_dict()
+        for error in result['errors']:
+            self.stderr.write(f"Line {error['line']}: {error['error']}")
+        if result['error_count'] > len(result['errors']):
+            self.stderr.write(f"... and {result['error_count'] - len(result['errors'])} more errors")
+
+        rate = result['rows'] / elapsed * 60 if elapsed else 0
+        action = 'Validated' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} {result['imported']} of {result['rows']} rows in {elapsed:.1f}s ({rate:,.0f} rows/min): "
+            f"{result['customers_created']} customers created, {result['customers_updated']} updated; "
+            f"{result['shipments_created']} shipments created, {result['shipments_updated']} updated; "
+            f"{result['receipts_created']} receipts created, {result['items_created']} items"
+        ))
@@ -0,0 +1,72 @@
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+# (name, sync path, async path)
+ENDPOINT_PAIRS = [
+    ('receipt list', 'receipts/', 'async/receipts/'),
+    ('categories', 'categories/', 'async/categories/'),
+    ('dashboard stats', 'staff/dashboard_stats/', 'async/dashboard/stats/'),
+]
+
+
+class Command(BaseCommand):
+    help = ("Load-test a running server, comparing each read endpoint's sync (DRF) and async path "
+            "under the same concurrency")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000/',
+                            help='API root of the running server (default: http://127.0.0.1:8000/)')
+        parser.add_argument('--async-base-url',
+                            help='API root of the ASGI process serving the async paths (default: --base-url)')
+        parser.add_argument('--token', required=True, help='Staff API token to authenticate with')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight at once (default 50)')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per endpoint (default 500)')
+        parser.add_argument('--only', choices=['sync', 'async'], help='Only test one of the two paths')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError('--concurrency and --requests must be positive')
+        base_urls = {'sync': options['base_url'].rstrip('/') + '/',
+                     'async': (options['async_base_url'] or options['base_url']).rstrip('/') + '/'}
+        headers = {'Authorization': f"Token {options['token']}", 'Accept': 'application/json'}
+
+        self.stdout.write(f"{'endpoint':<18} {'path':<30} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+        for name, sync_path, async_path in ENDPOINT_PAIRS:
+            for mode, endpoint in (('sync', sync_path), ('async', async_path)):
+                if options['only'] and options['only'] != mode:
+                    continue
+                rps, latencies, errors = self.run_endpoint(base_urls[mode] + endpoint, headers,
+                                                           options['concurrency'], options['requests'])
+                p50, p95 = self.percentiles(latencies)
+                self.stdout.write(f"{name:<18} {endpoint:<30} {rps:>8.1f} {p50:>8.1f} {p95:>8.1f} {errors:>7}")
+
+    def run_endpoint(self, url, headers, concurrency, total):
+        def fetch(_):
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=30) as response:
+                    response.read()
+                    ok = response.status < 400
+            except (urllib.error.URLError, OSError):
+                ok = False
+            return time.perf_counter() - started, ok
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(fetch, range(total)))
+        elapsed = time.perf_counter() - started
+
+        latencies = [seconds * 1000 for seconds, ok in results if ok]
+        return total / elapsed, latencies, sum(1 for _, ok in results if not ok)
+
+    def percentiles(self, latencies):
+        if len(latencies) < 2:
+            value = latencies[0] if latencies else 0.0
+            return value, value
+        cuts = statistics.quantiles(latencies, n=100)
+        return cuts[49], cuts[94]
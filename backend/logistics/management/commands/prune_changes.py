@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from logistics.changes import prune
+
+
+class Command(BaseCommand):
+    help = "Delete change feed entries older than the retention period"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.CHANGES_RETENTION_DAYS,
+                            help=f'Days of changes to keep (default CHANGES_RETENTION_DAYS, {settings.CHANGES_RETENTION_DAYS})')
+
+    def handle(self, *args, **options):
+        deleted = prune(timezone.now() - timedelta(days=options['days']))
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} changes older than {options['days']} days"))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from logistics import dashboard
+
+
+class Command(BaseCommand):
+    help = ("Recompute the rollup tables (daily receipts, containers, customers, shipment statuses) from "
+            "scratch, in batches, without emptying them first")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Days/containers/customers recomputed per transaction (default 500)')
+
+    def handle(self, *args, **options):
+        dashboard.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Dashboard statistics rebuilt'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from logistics import search
+from logistics.models import Customer, Receipt, Shipment
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search documents for customers, shipments and receipts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=search.INDEX_BATCH_SIZE,
+                            help=f'Rows indexed per batch (default {search.INDEX_BATCH_SIZE})')
+
+    def handle(self, *args, **options):
+        for model in (Customer, Shipment, Receipt):
+            indexed = search.index_queryset(model.objects.all(), batch_size=options['batch_size'])
+            self.stdout.write(f"Indexed {indexed} {model._meta.verbose_name_plural}")
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from logistics.totals import reconcile_receipt_totals
+
+
+class Command(BaseCommand):
+    help = "Reconcile Receipt.total_amount with the sum of each receipt's items, in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of receipts checked per batch (default 1000)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report drifted receipts without fixing them')
+
+    def handle(self, *args, **options):
+        checked = 0
+        drifted = 0
+        for batch_checked, batch_drifted in reconcile_receipt_totals(options['batch_size'], options['dry_run']):
+            checked += batch_checked
+            drifted += len(batch_drifted)
+            if batch_drifted and options['verbosity'] > 1:
+                self.stdout.write(f"Drifted receipt ids: {', '.join(map(str, batch_drifted))}")
+
+        action = 'found' if options['dry_run'] else 'fixed'
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} receipts, {action} {drifted} with drifted totals"))
@@ -0,0 +1,42 @@
+import os
+import shutil
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from logistics import receipt_pdf
+
+
+class Command(BaseCommand):
+    help = "Render PDFs for all receipts issued on a day, in parallel across worker processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Issue date to render (YYYY-MM-DD, default today)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Worker processes (default: number of CPUs)')
+        parser.add_argument('--output-dir',
+                            help='Also copy the PDFs here as <receipt number>.pdf, e.g. for archiving or email')
+
+    def handle(self, *args, **options):
+        day = parse_date(options['date']) if options['date'] else timezone.localdate()
+        if day is None:
+            raise CommandError(f"Invalid date: {options['date']}")
+
+        started = time.monotonic()
+        receipts_data = [receipt_pdf.receipt_data(receipt) for receipt in receipt_pdf.receipts_for_day(day)]
+        results = receipt_pdf.render_many(receipts_data, workers=max(1, options['workers']))
+
+        if options['output_dir']:
+            output_dir = Path(options['output_dir'])
+            output_dir.mkdir(parents=True, exist_ok=True)
+            for data, (path, _) in zip(receipts_data, results):
+                shutil.copyfile(path, output_dir / f"{data['receipt_number']}.pdf")
+
+        rendered = sum(1 for _, was_rendered in results if was_rendered)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(results)} receipts for {day}: {rendered} rendered, {len(results) - rendered} already cached "
+            f"({time.monotonic() - started:.1f}s)"
+        ))
@@ -0,0 +1,34 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from logistics import jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (exports, imports, PDF rendering, total reconciliation)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once no job is due instead of polling for more')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to wait between polls when the queue is empty (default 2)')
+        parser.add_argument('--max-jobs', type=int, help='Exit after running this many jobs')
+        parser.add_argument('--worker-id', help='Name recorded on claimed jobs (default host:pid)')
+
+    def handle(self, *args, **options):
+        stopping = []
+
+        def stop(signum, frame):
+            # Finish the current job, then exit
+            self.stdout.write('Stopping after the current job...')
+            stopping.append(signum)
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        worker_id = options['worker_id'] or jobs.default_worker_id()
+        self.stdout.write(f"Worker {worker_id} running job kinds: {', '.join(sorted(jobs.JOB_TYPES))}")
+        processed = jobs.work(worker_id, burst=options['burst'], poll_interval=options['poll_interval'],
+                              max_jobs=options['max_jobs'], should_stop=lambda: bool(stopping))
+        self.stdout.write(self.style.SUCCESS(f"Ran {processed} jobs"))
@@ -0,0 +1,102 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter, so nothing is imported yet
+PROFILE_SCRIPT = '''
+import json, sys, time
+
+phases = {}
+started = last = time.perf_counter()
+
+def phase(name):
+    global last
+    now = time.perf_counter()
+    phases[name] = round((now - last) * 1000, 1)
+    last = now
+
+import django
+from django.conf import settings
+settings.INSTALLED_APPS
+phase('settings')
+django.setup()
+phase('django.setup() (apps, models, ready hooks)')
+from django.urls import get_resolver
+get_resolver().url_patterns
+phase('URLconf and views')
+error = None
+if sys.argv[1] == 'warm-up':
+    from logistics import startup
+    state = startup.warm_up()
+    for name, ms in state['steps'].items():
+        if name != 'urls':
+            phases['warm-up: ' + name] = ms
+    error = state['error']
+phases['total'] = round((time.perf_counter() - started) * 1000, 1)
+print(json.dumps({'phases': phases, 'error': error}))
+'''
+
+
+def parse_importtime(lines):
+    """[(module, self_us, cumulative_us, depth)] from `python -X importtime` output (depth 0 = imported directly)"""
+    modules = []
+    for line in lines:
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return modules
+
+
+class Command(BaseCommand):
+    help = ("Profile process startup in a fresh interpreter: time per phase (settings, app "
+            "loading, URLconf, optionally warm-up) and import time by package and module")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--warm-up', action='store_true',
+                            help='Also run the startup warm-up (connects to the database and primes caches)')
+        parser.add_argument('--top', type=int, default=15, help='Slowest modules to list (default 15)')
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE}
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROFILE_SCRIPT, 'warm-up' if options['warm_up'] else 'none'],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        try:
+            report = json.loads(result.stdout.strip().splitlines()[-1])
+        except (IndexError, ValueError):
+            errors = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+            raise CommandError('Profiling run failed:\n' + '\n'.join(errors[-20:]))
+        modules = parse_importtime(result.stderr.splitlines())
+
+        self.stdout.write('Startup phases (ms)')
+        for name, ms in report['phases'].items():
+            self.stdout.write(f'  {name:<45} {ms:>8.1f}')
+        if report['error']:
+            self.stdout.write(self.style.WARNING(f"  warm-up failed: {report['error']}"))
+
+        by_package = defaultdict(lambda: [0, 0])
+        for name, self_us, _, _ in modules:
+            package = by_package[name.split('.')[0]]
+            package[0] += self_us
+            package[1] += 1
+        total_us = sum(self_us for _, self_us, _, _ in modules)
+        self.stdout.write(f'\nImport time by package ({total_us / 1000:.1f} ms in {len(modules)} modules)')
+        for package, (self_us, count) in sorted(by_package.items(), key=lambda item: -item[1][0])[:options['top']]:
+            self.stdout.write(f'  {package:<30} {self_us / 1000:>8.1f} ms {count:>5} modules')
+
+        top_level = [module for module in modules if module[3] == 0]
+        self.stdout.write('\nSlowest top-level imports (including what they import)')
+        for name, _, cumulative_us, _ in sorted(top_level, key=lambda module: -module[2])[:options['top']]:
+            self.stdout.write(f'  {name:<45} {cumulative_us / 1000:>8.1f} ms')
+
+        self.stdout.write('\nSlowest modules (own time)')
+        for name, self_us, _, _ in sorted(modules, key=lambda module: -module[1])[:options['top']]:
+            self.stdout.write(f'  {name:<45} {self_us / 1000:>8.1f} ms')
@@ -0,0 +1,279 @@
+"""
+Request performance instrumentation.
+
+``PerformanceMiddleware`` opens a ``RequestProfile`` for each request. Every database
+connection gets an execute wrapper (installed when the connection is created) that adds
+each query's time and SQL fingerprint to the current profile, and serializers add the
+time spent in ``to_representation``. The results go out as ``Server-Timing`` headers,
+into the Prometheus metrics served at ``/metrics/``, and into a warning with the most
+expensive SQL fingerprints when a request is slower than ``PERF_SLOW_REQUEST_MS``.
+
+Metrics live in this process only, so with several workers each one exposes its own
+series (scrape them per instance, or aggregate in Prometheus).
+"""
+import bisect
+import contextvars
+import hashlib
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_current = contextvars.ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    """Timings gathered while handling one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        # fingerprint -> [count, seconds, example sql]
+        self.fingerprints = {}
+        # (sql, params) seen, to spot exact repeats
+        self.statements = defaultdict(int)
+        self.query_count = 0
+        self._serializing = False
+
+    @property
+    def duplicate_queries(self):
+        """Queries that repeated an earlier query exactly (same SQL and parameters)"""
+        return sum(count - 1 for count in self.statements.values())
+
+    def repeated_fingerprints(self, threshold):
+        """Fingerprints run at least threshold times (N+1 suspects), most frequent first"""
+        return sorted(((fingerprint, entry) for fingerprint, entry in self.fingerprints.items()
+                       if entry[0] >= threshold), key=lambda item: -item[1][0])
+
+    def slowest_fingerprints(self, limit=5):
+        return sorted(self.fingerprints.items(), key=lambda item: -item[1][1])[:limit]
+
+
+def current_profile():
+    return _current.get()
+
+
+@contextmanager
+def profiling():
+    """Profile the block as one request; yields the RequestProfile"""
+    profile = RequestProfile()
+    token = _current.set(profile)
+    try:
+        yield profile
+    finally:
+        _current.reset(token)
+
+
+_IN_LIST = re.compile(r'\((?:%s, )+%s\)')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """SQL with literals and IN-list lengths normalised, so queries differing only in values match"""
+    sql = _IN_LIST.sub('(%s, ...)', sql)
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def fingerprint_id(normalised):
+    return hashlib.sha1(normalised.encode('utf-8')).hexdigest()[:10]
+
+
+_SELECT_LIST = re.compile(r'^SELECT (?:DISTINCT )?.+? FROM ', re.DOTALL)
+
+
+def summary(normalised, length=300):
+    """A fingerprint shortened for logs: the outer SELECT column list is elided"""
+    return _SELECT_LIST.sub('SELECT ... FROM ', normalised, count=1)[:length]
+
+
+def _params_key(params):
+    try:
+        return hash(tuple(params)) if isinstance(params, (list, tuple)) else hash(params)
+    except TypeError:
+        return repr(params)
+
+
+def query_wrapper(execute, sql, params, many, context):
+    """Execute wrapper that records the query in the current request's profile"""
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        profile.db_seconds += elapsed
+        profile.query_count += 1
+        normalised = fingerprint(sql)
+        entry = profile.fingerprints.get(normalised)
+        if entry is None:
+            profile.fingerprints[normalised] = [1, elapsed, sql]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+        if not many:
+            profile.statements[(sql, _params_key(params))] += 1
+
+
+@receiver(connection_created)
+def install_query_wrapper(sender, connection, **kwargs):
+    # connection_created fires again on reconnects of the same wrapper object
+    if query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_wrapper)
+
+
+class TimedRepresentationMixin:
+    """Serializer mixin adding to_representation() time to the request profile (outermost call only)"""
+
+    def to_representation(self, instance):
+        profile = _current.get()
+        if profile is None or profile._serializing:
+            return super().to_representation(instance)
+        profile._serializing = True
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            profile._serializing = False
+            profile.serializer_seconds += time.perf_counter() - started
+
+
+# Prometheus metrics
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name, self.documentation, self.label_names = name, documentation, tuple(labels)
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] += amount
+
+    def samples(self):
+        """[(sample name, label names, label values, value)]"""
+        with self._lock:
+            return [(self.name, self.label_names, labels, value) for labels, value in self._values.items()]
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DURATION_BUCKETS):
+        self.name, self.documentation, self.label_names = name, documentation, tuple(labels)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+
+    def samples(self):
+        samples = []
+        bucket_labels = self.label_names + ('le',)
+        with self._lock:
+            for labels, (counts, total) in self._values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets + ('+Inf',), counts):
+                    cumulative += count
+                    samples.append((f'{self.name}_bucket', bucket_labels, labels + (bound,), cumulative))
+                samples.append((f'{self.name}_sum', self.label_names, labels, total))
+                samples.append((f'{self.name}_count', self.label_names, labels, cumulative))
+        return samples
+
+
+REQUESTS = Counter('http_requests_total', 'Requests handled', ['method', 'view', 'status'])
+REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'Request wall time', ['method', 'view'])
+DB_SECONDS = Histogram('http_request_db_seconds', 'Time in database queries per request', ['view'])
+DB_QUERIES = Histogram('http_request_db_queries', 'Database queries per request', ['view'],
+                       buckets=QUERY_COUNT_BUCKETS)
+DUPLICATE_QUERIES = Counter('http_request_duplicate_queries_total',
+                            'Queries repeating an earlier query of the same request exactly', ['view'])
+SERIALIZER_SECONDS = Histogram('http_request_serializer_seconds', 'Time serializing responses per request', ['view'])
+SLOW_REQUESTS = Counter('http_slow_requests_total', 'Requests slower than PERF_SLOW_REQUEST_MS', ['method', 'view'])
+
+METRICS = [REQUESTS, REQUEST_SECONDS, DB_SECONDS, DB_QUERIES, DUPLICATE_QUERIES, SERIALIZER_SECONDS, SLOW_REQUESTS]
+
+
+def record(method, view, status, profile, wall_seconds, slow):
+    REQUESTS.inc(method, view, str(status))
+    REQUEST_SECONDS.observe(wall_seconds, method, view)
+    DB_SECONDS.observe(profile.db_seconds, view)
+    DB_QUERIES.observe(profile.query_count, view)
+    if profile.duplicate_queries:
+        DUPLICATE_QUERIES.inc(view, amount=profile.duplicate_queries)
+    if profile.serializer_seconds:
+        SERIALIZER_SECONDS.observe(profile.serializer_seconds, view)
+    if slow:
+        SLOW_REQUESTS.inc(method, view)
+
+
+def _format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _gauges():
+    """Process-wide counters kept by other modules, exported as gauges"""
+    from . import authentication, changes, tracking
+
+    gauges = [('token_cache_' + name, 'Token cache ' + name.replace('_', ' '), value)
+              for name, value in authentication.stats().items() if value is not None]
+    gauges += [('tracking_cache_' + name, 'Tracking cache ' + name.replace('_', ' '), value)
+               for name, value in tracking.stats().items() if value is not None]
+    gauges += [('change_feed_' + name, 'Change feed ' + name, value) for name, value in changes.stats().items()]
+    if settings.DATABASES['default']['ENGINE'] == 'logistics.db_backends.postgresql':
+        from .db_backends.postgresql.base import stats as connection_stats
+
+        gauges += [('db_' + name, 'Database ' + name.replace('_', ' '), value)
+                   for name, value in connection_stats().items() if value is not None]
+    return gauges
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in METRICS:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for name, label_names, labels, value in metric.samples():
+            lines.append(f'{name}{_labels(label_names, labels)} {_format_value(value)}')
+    for name, documentation, value in _gauges():
+        lines.append(f'# HELP {name} {documentation} (this process)')
+        lines.append(f'# TYPE {name} gauge')
+        lines.append(f'{name} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
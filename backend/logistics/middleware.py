@@ -0,0 +1,101 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.utils.deprecation import MiddlewareMixin
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def add_server_timing(response, entry):
+    response['Server-Timing'] = ', '.join(filter(None, [response.get('Server-Timing'), entry]))
+
+
+def _timed_connections():
+    return [conn for conn in connections.all(initialized_only=True) if hasattr(conn, 'reset_acquire_stats')]
+
+
+class ConnectionTimingMiddleware(MiddlewareMixin):
+    """
+    Reports the time a request spent getting database connections (connecting, pool
+    checkout and health checks) as ``Server-Timing: db-acquire``, and logs slow ones.
+    Only connections using ``logistics.db_backends.postgresql`` are measured.
+    """
+
+    def process_request(self, request):
+        for conn in _timed_connections():
+            conn.reset_acquire_stats()
+
+    def process_response(self, request, response):
+        seconds, new_connections = 0.0, 0
+        for conn in _timed_connections():
+            seconds += conn.acquire_seconds
+            new_connections += conn.new_connections
+        if seconds:
+            milliseconds = seconds * 1000
+            add_server_timing(response, f'db-acquire;dur={milliseconds:.1f};desc="{new_connections} new connection(s)"')
+            if milliseconds >= getattr(settings, 'DB_ACQUIRE_SLOW_MS', 200):
+                logger.warning('%s %s waited %.0f ms for database connections (%s new)',
+                               request.method, request.path, milliseconds, new_connections)
+        return response
+
+
+class PerformanceMiddleware:
+    """
+    Profiles each request (wall time, database time and queries, repeated queries,
+    serializer time; see metrics.py), adds ``Server-Timing`` entries, feeds the
+    ``/metrics/`` counters and logs slow requests with their costliest SQL fingerprints.
+    Works in both sync and async mode, so async views stay async.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with metrics.profiling() as profile:
+            response = self.get_response(request)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        with metrics.profiling() as profile:
+            response = await self.get_response(request)
+        return self.finish(request, response, profile)
+
+    def finish(self, request, response, profile):
+        wall_seconds = time.perf_counter() - profile.started
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name or match.route) if match else 'unmatched'
+        slow = wall_seconds * 1000 >= getattr(settings, 'PERF_SLOW_REQUEST_MS', 1000)
+        metrics.record(request.method, view, response.status_code, profile, wall_seconds, slow)
+
+        if getattr(settings, 'PERF_SERVER_TIMING', True):
+            add_server_timing(response, f'app;dur={wall_seconds * 1000:.1f}')
+            add_server_timing(response, f'db;dur={profile.db_seconds * 1000:.1f};'
+                                        f'desc="{profile.query_count} queries, {profile.duplicate_queries} duplicate"')
+            if profile.serializer_seconds:
+                add_server_timing(response, f'serialize;dur={profile.serializer_seconds * 1000:.1f}')
+
+        if slow:
+            logger.warning('Slow request: %s %s -> %s in %.0f ms (db %.0f ms, %s queries, %s duplicate)%s',
+                           request.method, request.path, response.status_code, wall_seconds * 1000,
+                           profile.db_seconds * 1000, profile.query_count, profile.duplicate_queries,
+                           self.describe(profile.slowest_fingerprints()))
+        repeated = profile.repeated_fingerprints(getattr(settings, 'PERF_REPEATED_QUERY_THRESHOLD', 20))
+        if repeated:
+            logger.warning('Repeated queries (N+1?) in %s %s:%s', request.method, request.path,
+                           self.describe(repeated[:3]))
+        return response
+
+    def describe(self, fingerprints):
+        return ''.join(f'\n  [{metrics.fingerprint_id(normalised)}] {count}x {seconds * 1000:.1f} ms: {metrics.summary(normalised)}'
+                       for normalised, (count, seconds, _) in fingerprints)
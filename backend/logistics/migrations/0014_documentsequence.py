@@ -0,0 +1,41 @@
+# Generated by Django 6.0.2 on 2026-10-17 18:31
+
+from django.db import migrations, models
+
+
+def seed_sequences(apps, schema_editor):
+    """Start the customer and staff counters after the highest existing code"""
+    DocumentSequence = apps.get_model('logistics', 'DocumentSequence')
+    Customer = apps.get_model('logistics', 'Customer')
+    Staff = apps.get_model('logistics', 'Staff')
+
+    for name, model, field, prefix in [
+        ('customer', Customer, 'customer_code', 'CUST'),
+        ('staff', Staff, 'employee_id', 'EMP'),
+    ]:
+        max_num = 0
+        for code in model.objects.filter(**{f'{field}__startswith': prefix}).values_list(field, flat=True):
+            num_part = code[len(prefix):]
+            if num_part.isdigit():
+                max_num = max(max_num, int(num_part))
+        DocumentSequence.objects.update_or_create(name=name, defaults={'value': max_num})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0013_alter_receipt_total_amount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
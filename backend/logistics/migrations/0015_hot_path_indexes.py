@@ -0,0 +1,80 @@
+# Generated by Django 6.0.2 on 2026-10-17 18:34
+
+from django.db import migrations, models
+
+
+# Trigram indexes for the icontains searches. Django compiles icontains on Postgres to
+# UPPER("col"::text) LIKE UPPER('%term%') (no cast for text columns), so each index is
+# on exactly that expression.
+TRIGRAM_INDEXES = [
+    ('customer_company_name_trgm', 'logistics_customer', 'UPPER(company_name::text)'),
+    ('shipment_tracking_number_trgm', 'logistics_shipment', 'UPPER(tracking_number::text)'),
+    ('shipment_description_trgm', 'logistics_shipment', 'UPPER(description)'),
+    ('receiptitem_description_trgm', 'logistics_receiptitem', 'UPPER(description::text)'),
+]
+
+
+def _has_pg_trgm(schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return False
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if not _has_pg_trgm(schema_editor):
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, expression in TRIGRAM_INDEXES:
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({expression} gin_trgm_ops)')
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, expression in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0014_documentsequence'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='receipt',
+            index=models.Index(fields=['customer', 'payment_status', '-issue_date'], name='receipt_cust_pay_issued'),
+        ),
+        migrations.AddIndex(
+            model_name='receipt',
+            index=models.Index(fields=['payment_status', '-issue_date'], name='receipt_pay_issued'),
+        ),
+        migrations.AddIndex(
+            model_name='receipt',
+            index=models.Index(fields=['-issue_date'], name='receipt_issued_desc'),
+        ),
+        migrations.AddIndex(
+            model_name='receipt',
+            index=models.Index(fields=['receipt_number'], name='receipt_number_pattern', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='receiptitem',
+            index=models.Index(fields=['receipt', 'id'], name='receiptitem_receipt_id'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['customer', 'status', '-created_at'], name='shipment_cust_status_created'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['status', '-created_at'], name='shipment_status_created'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['-created_at'], name='shipment_created_desc'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
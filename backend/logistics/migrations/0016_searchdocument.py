@@ -0,0 +1,103 @@
+# Generated by Django 6.0.2 on 2026-10-17 18:39
+
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+FTS_TABLE = 'logistics_searchdocument_fts'
+DOCUMENT_TABLE = 'logistics_searchdocument'
+
+SQLITE_FTS = [
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(title, body, content='{DOCUMENT_TABLE}', content_rowid='id', prefix='2 3')",
+    f"""CREATE TRIGGER {DOCUMENT_TABLE}_ai AFTER INSERT ON {DOCUMENT_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+    f"""CREATE TRIGGER {DOCUMENT_TABLE}_ad AFTER DELETE ON {DOCUMENT_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+    END""",
+    f"""CREATE TRIGGER {DOCUMENT_TABLE}_au AFTER UPDATE ON {DOCUMENT_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(f'CREATE INDEX searchdocument_vector_gin ON {DOCUMENT_TABLE} USING gin (search_vector)')
+    elif vendor == 'sqlite':
+        for sql in SQLITE_FTS:
+            schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS searchdocument_vector_gin')
+    elif vendor == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {DOCUMENT_TABLE}_{suffix}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def _join(*parts):
+    return ' '.join(str(part) for part in parts if part)
+
+
+def backfill_documents(apps, schema_editor):
+    """Index existing rows (a frozen copy of the document format in logistics/search.py)"""
+    SearchDocument = apps.get_model('logistics', 'SearchDocument')
+    sources = [
+        ('customer', apps.get_model('logistics', 'Customer').objects.all(),
+         lambda c: (c.company_name, c.customer_code or '', _join(c.customer_code, c.contact_person, c.email, c.phone))),
+        ('shipment', apps.get_model('logistics', 'Shipment').objects.select_related('customer'),
+         lambda s: (s.tracking_number, f'{s.origin} → {s.destination}',
+                    _join(s.customer.company_name, s.origin, s.destination, s.description))),
+        ('receipt', apps.get_model('logistics', 'Receipt').objects.select_related('customer'),
+         lambda r: (r.receipt_number, _join(r.customer.company_name, r.container_number),
+                    _join(r.customer.company_name, r.customer.customer_code, r.container_number, r.notes))),
+    ]
+    for kind, queryset, build in sources:
+        documents = []
+        for obj in queryset.iterator(chunk_size=2000):
+            title, subtitle, body = build(obj)
+            documents.append(SearchDocument(kind=kind, object_id=obj.pk, title=title[:200],
+                                            subtitle=subtitle[:200], body=body))
+        SearchDocument.objects.bulk_create(documents, batch_size=1000)
+
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f"UPDATE {DOCUMENT_TABLE} SET search_vector = "
+            "setweight(to_tsvector('simple', regexp_replace(title, '[^[:alnum:]_]+', ' ', 'g')), 'A') || "
+            "setweight(to_tsvector('simple', regexp_replace(body, '[^[:alnum:]_]+', ' ', 'g')), 'B')"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0015_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('customer', 'Customer'), ('shipment', 'Shipment'), ('receipt', 'Receipt')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('title', models.CharField(max_length=200)),
+                ('subtitle', models.CharField(blank=True, max_length=200)),
+                ('body', models.TextField(blank=True)),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField(editable=False, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='searchdocument',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='searchdocument_kind_object'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(backfill_documents, migrations.RunPython.noop),
+    ]
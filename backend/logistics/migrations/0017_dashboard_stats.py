@@ -0,0 +1,96 @@
+# Generated by Django 6.0.2 on 2026-10-17 18:42
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_stats(apps, schema_editor):
+    """Populate the dashboard rollups from existing rows"""
+    Receipt = apps.get_model('logistics', 'Receipt')
+    ReceiptItem = apps.get_model('logistics', 'ReceiptItem')
+    Shipment = apps.get_model('logistics', 'Shipment')
+    DailyReceiptStats = apps.get_model('logistics', 'DailyReceiptStats')
+    ContainerStats = apps.get_model('logistics', 'ContainerStats')
+    ShipmentStatusStats = apps.get_model('logistics', 'ShipmentStatusStats')
+
+    days = {
+        row['day']: DailyReceiptStats(day=row['day'], receipts=row['receipts'], revenue=row['revenue'] or 0)
+        for row in Receipt.objects.order_by().annotate(day=TruncDate('issue_date')).values('day')
+        .annotate(receipts=Count('id'), revenue=Sum('total_amount'))
+    }
+    for row in (ReceiptItem.objects.order_by().annotate(day=TruncDate('receipt__issue_date')).values('day')
+                .annotate(cbm=Sum('cbm'))):
+        if row['day'] in days:
+            days[row['day']].cbm = row['cbm'] or 0
+    DailyReceiptStats.objects.bulk_create(days.values(), batch_size=1000)
+
+    ContainerStats.objects.bulk_create([
+        ContainerStats(container_number=row['receipt__container_number'], items=row['items'],
+                       cbm=row['cbm'] or 0, revenue=row['revenue'] or 0)
+        for row in ReceiptItem.objects.exclude(receipt__container_number='').order_by()
+        .values('receipt__container_number').annotate(items=Count('id'), cbm=Sum('cbm'), revenue=Sum('total_price'))
+    ], batch_size=1000)
+
+    ShipmentStatusStats.objects.bulk_create([
+        ShipmentStatusStats(status=row['status'], shipments=row['shipments'])
+        for row in Shipment.objects.order_by().values('status').annotate(shipments=Count('id'))
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0016_searchdocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContainerStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('container_number', models.CharField(max_length=50, unique=True)),
+                ('items', models.PositiveIntegerField(default=0)),
+                ('cbm', models.DecimalField(decimal_places=3, default=0, max_digits=15)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Container stats',
+                'ordering': ['container_number'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyReceiptStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('receipts', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('cbm', models.DecimalField(decimal_places=3, default=0, max_digits=15)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Daily receipt stats',
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ShipmentStatusStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('in_transit', 'In Transit'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled')], max_length=20, unique=True)),
+                ('shipments', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Shipment status stats',
+                'ordering': ['status'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='receipt',
+            index=models.Index(fields=['container_number'], name='receipt_container_number'),
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
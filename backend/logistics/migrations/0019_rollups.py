@@ -0,0 +1,100 @@
+# Generated by Django 6.0.2 on 2026-10-17 19:38
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+import django.db.models.deletion
+
+
+def backfill_rollups(apps, schema_editor):
+    """Fill the new container columns and the customer rollups from existing rows"""
+    Receipt = apps.get_model('logistics', 'Receipt')
+    ReceiptItem = apps.get_model('logistics', 'ReceiptItem')
+    ContainerStats = apps.get_model('logistics', 'ContainerStats')
+    CustomerStats = apps.get_model('logistics', 'CustomerStats')
+
+    containers = {row.container_number: row for row in ContainerStats.objects.all()}
+    for row in (ReceiptItem.objects.filter(receipt__container_number__in=list(containers)).order_by()
+                .values('receipt__container_number')
+                .annotate(receipts=Count('receipt', distinct=True), customers=Count('receipt__customer', distinct=True))):
+        stat = containers[row['receipt__container_number']]
+        stat.receipts, stat.customers = row['receipts'], row['customers']
+    ContainerStats.objects.bulk_update(containers.values(), ['receipts', 'customers'], batch_size=1000)
+
+    customers = {}
+    for row in (Receipt.objects.order_by().values('customer_id', 'payment_status')
+                .annotate(receipts=Count('id'), amount=Sum('total_amount'), last=Max('issue_date'))):
+        stat = customers.setdefault(row['customer_id'], CustomerStats(
+            customer_id=row['customer_id'], total_amount=Decimal('0'), paid_amount=Decimal('0'),
+            outstanding_amount=Decimal('0'), by_payment_status={}))
+        amount = row['amount'] or Decimal('0')
+        stat.receipts += row['receipts']
+        stat.total_amount += amount
+        if row['payment_status'] == 'paid':
+            stat.paid_amount += amount
+        else:
+            stat.outstanding_amount += amount
+        stat.by_payment_status[row['payment_status']] = {'receipts': row['receipts'], 'amount': str(amount)}
+        if stat.last_receipt_at is None or row['last'] > stat.last_receipt_at:
+            stat.last_receipt_at = row['last']
+    CustomerStats.objects.bulk_create(customers.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0018_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('receipts', models.PositiveIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('paid_amount', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('outstanding_amount', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('by_payment_status', models.JSONField(blank=True, default=dict)),
+                ('last_receipt_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Customer stats',
+                'ordering': ['-outstanding_amount', '-id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='containerstats',
+            name='customers',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='containerstats',
+            name='receipts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='containerstats',
+            index=models.Index(fields=['-cbm', '-id'], name='containerstats_cbm'),
+        ),
+        migrations.AddIndex(
+            model_name='containerstats',
+            index=models.Index(fields=['-revenue', '-id'], name='containerstats_revenue'),
+        ),
+        migrations.AddField(
+            model_name='customerstats',
+            name='customer',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='logistics.customer'),
+        ),
+        migrations.AddIndex(
+            model_name='customerstats',
+            index=models.Index(fields=['-outstanding_amount', '-id'], name='customerstats_outstanding'),
+        ),
+        migrations.AddIndex(
+            model_name='customerstats',
+            index=models.Index(fields=['-total_amount', '-id'], name='customerstats_total'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 6.0.2 on 2026-10-17 19:50
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def backfill_daily_breakdowns(apps, schema_editor):
+    """Populate the per category and per customer daily rollups from existing rows"""
+    Receipt = apps.get_model('logistics', 'Receipt')
+    ReceiptItem = apps.get_model('logistics', 'ReceiptItem')
+    DailyCategoryStats = apps.get_model('logistics', 'DailyCategoryStats')
+    DailyCustomerStats = apps.get_model('logistics', 'DailyCustomerStats')
+
+    DailyCategoryStats.objects.bulk_create([
+        DailyCategoryStats(day=row['day'], category_id=row['category_id'], items=row['items'],
+                           cbm=row['cbm'] or 0, revenue=row['revenue'] or 0)
+        for row in ReceiptItem.objects.order_by().annotate(day=TruncDate('receipt__issue_date'))
+        .values('day', 'category_id').annotate(items=Count('id'), cbm=Sum('cbm'), revenue=Sum('total_price'))
+    ], batch_size=1000)
+
+    customers = {
+        (row['day'], row['customer_id']): DailyCustomerStats(day=row['day'], customer_id=row['customer_id'],
+                                                             receipts=row['receipts'], revenue=row['revenue'] or 0)
+        for row in Receipt.objects.order_by().annotate(day=TruncDate('issue_date')).values('day', 'customer_id')
+        .annotate(receipts=Count('id'), revenue=Sum('total_amount'))
+    }
+    for row in (ReceiptItem.objects.order_by().annotate(day=TruncDate('receipt__issue_date'))
+                .values('day', 'receipt__customer_id').annotate(cbm=Sum('cbm'))):
+        customers[row['day'], row['receipt__customer_id']].cbm = row['cbm'] or 0
+    DailyCustomerStats.objects.bulk_create(customers.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0019_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCategoryStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('items', models.PositiveIntegerField(default=0)),
+                ('cbm', models.DecimalField(decimal_places=3, default=0, max_digits=15)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='logistics.goodscategory')),
+            ],
+            options={
+                'verbose_name_plural': 'Daily category stats',
+                'ordering': ['-day', 'category'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyCustomerStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('receipts', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('cbm', models.DecimalField(decimal_places=3, default=0, max_digits=15)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='logistics.customer')),
+            ],
+            options={
+                'verbose_name_plural': 'Daily customer stats',
+                'ordering': ['-day', 'customer'],
+                'indexes': [models.Index(fields=['customer', 'day'], name='dailycustomerstats_customer')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailycustomerstats',
+            constraint=models.UniqueConstraint(fields=('day', 'customer'), include=('receipts', 'revenue', 'cbm'), name='dailycustomerstats_day_customer'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailycategorystats',
+            constraint=models.UniqueConstraint(fields=('day', 'category'), include=('items', 'cbm', 'revenue'), name='dailycategorystats_day_category'),
+        ),
+        migrations.RunPython(backfill_daily_breakdowns, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 6.0.2 on 2026-10-17 19:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def backfill_events(apps, schema_editor):
+    """Start each existing shipment's history with its current status"""
+    Shipment = apps.get_model('logistics', 'Shipment')
+    ShipmentEvent = apps.get_model('logistics', 'ShipmentEvent')
+    ShipmentEvent.objects.bulk_create(
+        (ShipmentEvent(shipment_id=pk, to_status=status, created_by_id=created_by_id, created_at=created_at)
+         for pk, status, created_by_id, created_at in
+         Shipment.objects.order_by('pk').values_list('pk', 'status', 'created_by_id', 'created_at').iterator()),
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('logistics', '0020_daily_breakdowns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShipmentEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(blank=True, choices=[('pending', 'Pending'), ('in_transit', 'In Transit'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('to_status', models.CharField(choices=[('pending', 'Pending'), ('in_transit', 'In Transit'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('note', models.CharField(blank=True, max_length=500)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='shipment_events', to=settings.AUTH_USER_MODEL)),
+                ('shipment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='logistics.shipment')),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['shipment', '-created_at'], name='shipmentevent_shipment'), models.Index(fields=['-created_at'], name='shipmentevent_created')],
+            },
+        ),
+        migrations.RunPython(backfill_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.2 on 2026-10-17 20:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# receiptitem_receipt_id (receipt_id, id) already covers lookups by receipt, so the
+# foreign key's own index only costs writes. AlterField would also drop and re-add the
+# constraint, re-checking every item row; only the index needs to go.
+FK_INDEX = 'logistics_receiptitem_receipt_id_b6746b2d'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0022_change_feed'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='receiptitem',
+                    name='receipt',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='items', to='logistics.receipt'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    f'DROP INDEX IF EXISTS {FK_INDEX}',
+                    f'CREATE INDEX IF NOT EXISTS {FK_INDEX} ON logistics_receiptitem (receipt_id)',
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.0.2 on 2026-10-17 20:40
+
+from django.db import migrations
+
+
+DOCUMENT_TABLE = 'logistics_searchdocument'
+
+
+def _join(*parts):
+    return ' '.join(str(part) for part in parts if part)
+
+
+def reindex_customers(apps, schema_editor):
+    """Add company_registration to existing customer documents (a frozen copy of logistics/search.py)"""
+    Customer = apps.get_model('logistics', 'Customer')
+    SearchDocument = apps.get_model('logistics', 'SearchDocument')
+    customers = Customer.objects.exclude(company_registration='')
+    for customer in customers.iterator(chunk_size=2000):
+        SearchDocument.objects.filter(kind='customer', object_id=customer.pk).update(body=_join(
+            customer.customer_code, customer.contact_person, customer.email, customer.phone,
+            customer.company_registration))
+
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f"UPDATE {DOCUMENT_TABLE} SET search_vector = "
+            "setweight(to_tsvector('simple', regexp_replace(title, '[^[:alnum:]_]+', ' ', 'g')), 'A') || "
+            "setweight(to_tsvector('simple', regexp_replace(body, '[^[:alnum:]_]+', ' ', 'g')), 'B') "
+            "WHERE kind = 'customer'"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0023_receiptitem_receipt_single_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(reindex_customers, migrations.RunPython.noop),
+    ]
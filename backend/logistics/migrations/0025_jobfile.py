@@ -0,0 +1,30 @@
+# Generated by Django 6.0.2 on 2026-10-17 20:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0024_index_company_registration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('is_input', models.BooleanField(default=False)),
+                ('content', models.BinaryField()),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='files', to='logistics.job')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='jobfile',
+            constraint=models.UniqueConstraint(fields=('job', 'name'), name='jobfile_job_name'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.2 on 2026-10-17 21:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0025_jobfile'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='jobfile',
+            name='jobfile_job_name',
+        ),
+        migrations.AddField(
+            model_name='jobfile',
+            name='part',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddConstraint(
+            model_name='jobfile',
+            constraint=models.UniqueConstraint(fields=('job', 'name', 'part'), name='jobfile_job_name_part'),
+        ),
+    ]
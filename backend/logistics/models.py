@@ -1,10 +1,22 @@
-from django.db import models
+import re
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.db.models import Max
+from django.contrib.postgres.search import SearchVectorField
+from . import categories, sequences, totals
 
 
+class DocumentSequence(models.Model):
+    """Counter row backing generated document numbers (receipt, customer and staff codes)"""
+    name = models.CharField(max_length=100, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
+    def __str__(self):
+        return f"{self.name} = {self.value}"
 
 
 class Staff(models.Model):
@@ -30,19 +42,7 @@ class Staff(models.Model):
     def save(self, *args, **kwargs):
         # Generate employee_id if not provided
         if not self.employee_id:
-            # Get all existing employee IDs that match the EMP format
-            existing_ids = Staff.objects.filter(
-                employee_id__regex=r'^EMP\d+$'
-            ).values_list('employee_id', flat=True)
-            
-            max_num = 0
-            for emp_id in existing_ids:
-                # Extract numeric part and convert to int
-                num_part = emp_id[3:]  # Remove 'EMP' prefix
-                if num_part.isdigit():
-                    max_num = max(max_num, int(num_part))
-            
-            next_num = max_num + 1
+            next_num = sequences.next_value('staff', seed=lambda: sequences.max_code_number(Staff, 'employee_id', 'EMP'))
             self.employee_id = f'EMP{next_num:03d}'
         
         super().save(*args, **kwargs)
@@ -70,17 +70,7 @@ class Customer(models.Model):
         # Only generate customer_code if it's not set and we have a company_name
         if not self.customer_code and self.company_name:
             # Generate customer code like CUST001, CUST002, etc.
-            existing_codes = Customer.objects.filter(
-                customer_code__regex=r'^CUST\d+$'
-            ).exclude(pk=self.pk).values_list('customer_code', flat=True)
-            
-            max_num = 0
-            for code in existing_codes:
-                num_part = code[4:]  # Remove 'CUST' prefix
-                if num_part.isdigit():
-                    max_num = max(max_num, int(num_part))
-            
-            next_num = max_num + 1
+            next_num = sequences.next_value('customer', seed=self._code_seed)
             self.customer_code = f'CUST{next_num:03d}'
         elif not self.customer_code and not self.company_name:
             # Set a temporary code if no company_name to avoid unique constraint
@@ -88,6 +78,22 @@ class Customer(models.Model):
         
         super().save(*args, **kwargs)
 
+    @staticmethod
+    def _code_seed():
+        return sequences.max_code_number(Customer, 'customer_code', 'CUST')
+
+    @classmethod
+    def generate_customer_codes(cls, count):
+        """Reserve count customer codes in one counter update, for bulk creation"""
+        return [f'CUST{num:03d}' for num in sequences.reserve('customer', count, seed=cls._code_seed)]
+
+    @classmethod
+    def reserve_customer_codes(cls, codes):
+        """Move the counter past CUSTNNN codes created outside it (e.g. imported)"""
+        numbers = [int(code[4:]) for code in codes if code and code.startswith('CUST') and code[4:].isdigit()]
+        if numbers:
+            sequences.advance_past('customer', max(numbers))
+
     def __str__(self):
         return f"{self.company_name} ({self.customer_code})"
 
@@ -117,6 +123,13 @@ class Shipment(models.Model):
         ('delivered', 'Delivered'),
         ('cancelled', 'Cancelled'),
     ]
+    # Status changes allowed by batch transitions (see transitions.py) and shipment updates
+    STATUS_TRANSITIONS = {
+        'pending': {'in_transit', 'cancelled'},
+        'in_transit': {'delivered', 'cancelled'},
+        'delivered': set(),
+        'cancelled': set(),
+    }
     
     tracking_number = models.CharField(max_length=50, unique=True)
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='shipments')
@@ -136,8 +149,47 @@ class Shipment(models.Model):
     def __str__(self):
         return f"{self.tracking_number} - {self.customer.company_name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')
+        instance._loaded_tracking_number = instance.__dict__.get('tracking_number')
+        return instance
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # ShipmentViewSet filters by customer and/or status and lists newest first
+            models.Index(fields=['customer', 'status', '-created_at'], name='shipment_cust_status_created'),
+            models.Index(fields=['status', '-created_at'], name='shipment_status_created'),
+            models.Index(fields=['-created_at'], name='shipment_created_desc'),
+        ]
+
+
+class ShipmentEvent(models.Model):
+    """Append-only log of shipment status changes"""
+    shipment = models.ForeignKey(Shipment, on_delete=models.CASCADE, related_name='events')
+    # Blank for the event recording a shipment's creation
+    from_status = models.CharField(max_length=20, choices=Shipment.STATUS_CHOICES, blank=True)
+    to_status = models.CharField(max_length=20, choices=Shipment.STATUS_CHOICES)
+    note = models.CharField(max_length=500, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='shipment_events')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.shipment_id}: {self.from_status or '-'} -> {self.to_status}"
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # A shipment's history, newest first
+            models.Index(fields=['shipment', '-created_at'], name='shipmentevent_shipment'),
+            models.Index(fields=['-created_at'], name='shipmentevent_created'),
+        ]
+
+
+# Generated receipt numbers, as made by Receipt._number_sequence()
+RECEIPT_NUMBER_RE = re.compile(r'RCP-(\d{8})-(\d+)$')
 
 
 class Receipt(models.Model):
@@ -161,24 +213,63 @@ class Receipt(models.Model):
     def __str__(self):
         return f"Receipt {self.receipt_number} - {self.customer.company_name}"
 
+    @staticmethod
+    def _number_sequence():
+        """Today's counter name, receipt number prefix and counter seed"""
+        today = timezone.now().strftime('%Y%m%d')
+        prefix = f'RCP-{today}-'
+        # One counter row per day, seeded from any numbers already issued today
+        return f'receipt:{today}', prefix, lambda: sequences.max_code_number(Receipt, 'receipt_number', prefix)
+
+    @classmethod
+    def generate_receipt_numbers(cls, count):
+        """Reserve count receipt numbers in one counter update, for bulk creation"""
+        name, prefix, seed = cls._number_sequence()
+        return [f'{prefix}{num:03d}' for num in sequences.reserve(name, count, seed=seed)]
+
+    @classmethod
+    def reserve_receipt_numbers(cls, numbers):
+        """Move the daily counters past RCP-YYYYMMDD-NNN numbers created outside them (e.g. imported)"""
+        last = {}
+        for number in numbers:
+            match = RECEIPT_NUMBER_RE.match(number or '')
+            if match:
+                day, num = match.group(1), int(match.group(2))
+                last[day] = max(last.get(day, 0), num)
+        for day, num in last.items():
+            sequences.advance_past(f'receipt:{day}', num)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Dashboard rollup keys the row had when loaded, so moving a receipt refreshes both
+        instance._loaded_metric_keys = (instance.__dict__.get('issue_date'), instance.__dict__.get('container_number'),
+                                        instance.__dict__.get('customer_id'))
+        return instance
+
     def save(self, *args, **kwargs):
         # Generate receipt number if not set
         if not self.receipt_number:
-            today = timezone.now().strftime('%Y%m%d')
-            # Get today's count
-            today_count = Receipt.objects.filter(
-                receipt_number__startswith=f'RCP-{today}'
-            ).count()
-            # Generate new receipt number
-            self.receipt_number = f'RCP-{today}-{today_count + 1:03d}'
+            name, prefix, seed = self._number_sequence()
+            self.receipt_number = f'{prefix}{sequences.next_value(name, seed=seed):03d}'
         super().save(*args, **kwargs)
 
     class Meta:
         ordering = ['-issue_date']
+        indexes = [
+            # ReceiptViewSet filters by customer and/or payment_status and lists newest first
+            models.Index(fields=['customer', 'payment_status', '-issue_date'], name='receipt_cust_pay_issued'),
+            models.Index(fields=['payment_status', '-issue_date'], name='receipt_pay_issued'),
+            models.Index(fields=['-issue_date'], name='receipt_issued_desc'),
+            # Lets receipt_number__startswith use an index under non-C collations
+            models.Index(fields=['receipt_number'], name='receipt_number_pattern', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['container_number'], name='receipt_container_number'),
+        ]
 
 
 class ReceiptItem(models.Model):
-    receipt = models.ForeignKey(Receipt, on_delete=models.CASCADE, related_name='items')
+    # Indexed by receiptitem_receipt_id below, which also serves the item ordering
+    receipt = models.ForeignKey(Receipt, on_delete=models.CASCADE, related_name='items', db_index=False)
     category = models.ForeignKey(GoodsCategory, on_delete=models.SET_NULL, null=True, blank=True, related_name='receipt_items')
     description = models.CharField(max_length=200)
     cbm = models.DecimalField(max_digits=10, decimal_places=3, default=0, help_text="Cubic meters")
@@ -189,14 +280,268 @@ class ReceiptItem(models.Model):
     def __str__(self):
         return f"{self.description} - {self.receipt.receipt_number}"
 
-    def save(self, *args, **kwargs):
-        # Auto-populate unit_price from category if not provided
-        if self.category and not self.unit_price:
-            self.unit_price = self.category.unit_price
+    def calculate_total(self):
+        """Fill unit_price from the category if not provided and compute total_price"""
+        if self.category_id and not self.unit_price:
+            # Price from the category registry rather than loading the category row
+            if ReceiptItem.category.is_cached(self):
+                category = self.category
+            else:
+                category = categories.get_category(self.category_id) or self.category
+            self.unit_price = category.unit_price
         
-        # Calculate total price
-        self.total_price = self.cbm * (self.unit_price or 0)
-        super().save(*args, **kwargs)
+        # Round like the database column so totals summed in Python match SUM(total_price)
+        self.total_price = (Decimal(str(self.cbm)) * Decimal(str(self.unit_price or 0))).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        return self.total_price
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_total()
+        return instance
+
+    def _remember_total(self):
+        # The receipt and total the row has in the database, for incremental receipt totals
+        if 'receipt_id' in self.__dict__ and 'total_price' in self.__dict__:
+            self._saved_total = (self.receipt_id, self.total_price)
+        else:
+            self._saved_total = None
+
+    def save(self, *args, **kwargs):
+        self.calculate_total()
+        previous = getattr(self, '_saved_total', None)
+        created = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            totals.item_saved(self, previous, created)
+        self._remember_total()
 
     class Meta:
         ordering = ['receipt', 'id']
+        indexes = [
+            models.Index(fields=['receipt', 'id'], name='receiptitem_receipt_id'),
+        ]
+
+
+class SearchDocument(models.Model):
+    """Full-text search entry for a customer, shipment or receipt, maintained on write (see search.py)"""
+    KIND_CHOICES = [
+        ('customer', 'Customer'),
+        ('shipment', 'Shipment'),
+        ('receipt', 'Receipt'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    title = models.CharField(max_length=200)
+    subtitle = models.CharField(max_length=200, blank=True)
+    body = models.TextField(blank=True)
+    # Postgres only; the GIN index on it (and the SQLite FTS5 table) are created in the migration
+    search_vector = SearchVectorField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}: {self.title}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='searchdocument_kind_object'),
+        ]
+
+
+class DailyReceiptStats(models.Model):
+    """Receipts, revenue and CBM per issue day, maintained by dashboard.py"""
+    day = models.DateField(unique=True)
+    receipts = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    cbm = models.DecimalField(max_digits=15, decimal_places=3, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-day']
+        verbose_name_plural = 'Daily receipt stats'
+
+
+class DailyCategoryStats(models.Model):
+    """Items, CBM and revenue per issue day and goods category, maintained by dashboard.py"""
+    day = models.DateField()
+    # Null for items without a category
+    category = models.ForeignKey(GoodsCategory, on_delete=models.CASCADE, null=True, blank=True, related_name='daily_stats')
+    items = models.PositiveIntegerField(default=0)
+    cbm = models.DecimalField(max_digits=15, decimal_places=3, default=0)
+    revenue = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-day', 'category']
+        verbose_name_plural = 'Daily category stats'
+        constraints = [
+            # Covers analytics range scans (index-only on PostgreSQL)
+            models.UniqueConstraint(fields=['day', 'category'], name='dailycategorystats_day_category',
+                                    include=['items', 'cbm', 'revenue']),
+        ]
+
+
+class DailyCustomerStats(models.Model):
+    """Receipts, revenue and CBM per issue day and customer, maintained by dashboard.py"""
+    day = models.DateField()
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='daily_stats')
+    receipts = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    cbm = models.DecimalField(max_digits=15, decimal_places=3, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-day', 'customer']
+        verbose_name_plural = 'Daily customer stats'
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'customer'], name='dailycustomerstats_day_customer',
+                                    include=['receipts', 'revenue', 'cbm']),
+        ]
+        indexes = [
+            # One customer's history
+            models.Index(fields=['customer', 'day'], name='dailycustomerstats_customer'),
+        ]
+
+
+class ContainerStats(models.Model):
+    """Items, receipts, customers, CBM and revenue loaded per container number, maintained by dashboard.py"""
+    container_number = models.CharField(max_length=50, unique=True)
+    items = models.PositiveIntegerField(default=0)
+    receipts = models.PositiveIntegerField(default=0)
+    customers = models.PositiveIntegerField(default=0)
+    cbm = models.DecimalField(max_digits=15, decimal_places=3, default=0)
+    revenue = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['container_number']
+        verbose_name_plural = 'Container stats'
+        indexes = [
+            # Keyset orderings of ContainerStatsViewSet
+            models.Index(fields=['-cbm', '-id'], name='containerstats_cbm'),
+            models.Index(fields=['-revenue', '-id'], name='containerstats_revenue'),
+        ]
+
+
+class CustomerStats(models.Model):
+    """Receipts and amounts per customer, split by payment status, maintained by dashboard.py"""
+    customer = models.OneToOneField(Customer, on_delete=models.CASCADE, related_name='stats')
+    receipts = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    paid_amount = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    # Everything not paid yet (any payment_status other than "paid")
+    outstanding_amount = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    # {payment_status: {"receipts": n, "amount": "123.45"}}
+    by_payment_status = models.JSONField(default=dict, blank=True)
+    last_receipt_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-outstanding_amount', '-id']
+        verbose_name_plural = 'Customer stats'
+        indexes = [
+            # Keyset orderings of CustomerStatsViewSet
+            models.Index(fields=['-outstanding_amount', '-id'], name='customerstats_outstanding'),
+            models.Index(fields=['-total_amount', '-id'], name='customerstats_total'),
+        ]
+
+
+class ShipmentStatusStats(models.Model):
+    """Number of shipments in each status, maintained by dashboard.py"""
+    status = models.CharField(max_length=20, choices=Shipment.STATUS_CHOICES, unique=True)
+    shipments = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['status']
+        verbose_name_plural = 'Shipment status stats'
+
+
+class Job(models.Model):
+    """A unit of background work, queued in the database and run by ``manage.py run_jobs`` (see jobs.py)"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Workers poll for the oldest due job
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after'),
+        ]
+
+
+class JobFile(models.Model):
+    """
+    A job's uploaded input or produced output, kept in the database so the web process
+    and the workers, on different machines, both see it
+    """
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='files')
+    name = models.CharField(max_length=255)
+    # Large files are stored as consecutive parts of at most jobs.FILE_PART_SIZE bytes
+    part = models.PositiveIntegerField(default=0)
+    # Inputs are deleted once their job succeeds; outputs are kept for download
+    is_input = models.BooleanField(default=False)
+    content = models.BinaryField()
+    size = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} (job #{self.job_id})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['job', 'name', 'part'], name='jobfile_job_name_part'),
+        ]
+
+
+class Change(models.Model):
+    """Append-only feed of shipment and receipt writes, read by id cursor (see changes.py)"""
+    KIND_CHOICES = [
+        ('shipment', 'Shipment'),
+        ('receipt', 'Receipt'),
+    ]
+    ACTION_CHOICES = [
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=20, choices=ACTION_CHOICES)
+    # The object's headline fields as of the change, so clients can update without a fetch
+    data = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"#{self.pk} {self.kind} {self.object_id} {self.action}"
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # Pruning removes the oldest entries
+            models.Index(fields=['created_at'], name='change_created'),
+        ]
@@ -0,0 +1,195 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def estimate_count(queryset):
+    """
+    Row count from the PostgreSQL planner's estimate for the queryset, which costs one
+    EXPLAIN instead of a full COUNT(*). Falls back to an exact count on other databases.
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset.count()
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def query_params(request):
+    # DRF requests have query_params; plain Django requests (async views) only GET
+    return getattr(request, 'query_params', request.GET)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over a fixed, unique ordering.
+
+    Each page is fetched with ``WHERE (ordering) after <last row> LIMIT page_size`` so deep
+    pages cost the same as the first one and no COUNT(*) is run. The ``count`` field is
+    opt-in: ``?count=exact`` runs COUNT(*), ``?count=estimate`` uses the planner estimate.
+    Views can override the ordering with a ``keyset_ordering`` attribute; the last field
+    must be unique (normally the primary key) to break ties.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 20)
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.prepare(queryset, request, view)
+        self.count = self.get_count(queryset, request)
+        return self.finish(list(self.page_queryset(queryset)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() for async views, using the async ORM"""
+        queryset = self.prepare(queryset, request, view)
+        self.count = await sync_to_async(self.get_count)(queryset, request) if self.wants_count(request) else None
+        return self.finish([row async for row in self.page_queryset(queryset)])
+
+    def prepare(self, queryset, request, view):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.fields = self.get_ordering(view)
+        self.page_size = self.get_page_size(request)
+        self.reverse, self.cursor_position = self.decode_cursor(request)
+        return queryset
+
+    def page_queryset(self, queryset):
+        """The next page_size + 1 rows after the cursor (the extra row tells if there are more)"""
+        if self.cursor_position is not None:
+            queryset = queryset.filter(self.keyset_filter(self.cursor_position, self.reverse))
+        return queryset.order_by(*self.order_by(self.reverse))[:self.page_size + 1]
+
+    def finish(self, rows):
+        reverse, position = self.reverse, self.cursor_position
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        # Walking backwards, rows beyond the page are "previous" ones; forwards they are "next"
+        self.has_next = position is not None if reverse else has_more
+        self.has_previous = has_more if reverse else position is not None
+        self.page = rows
+        return rows
+
+    def get_ordering(self, view):
+        ordering = getattr(view, 'keyset_ordering', None) or self.ordering
+        return [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+
+    def get_page_size(self, request):
+        try:
+            size = int(query_params(request)[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def wants_count(self, request):
+        return query_params(request).get(self.count_query_param) in ('exact', 'estimate')
+
+    def get_count(self, queryset, request):
+        mode = query_params(request).get(self.count_query_param)
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'estimate':
+            return estimate_count(queryset)
+        return None
+
+    def order_by(self, reverse):
+        return [('-' if descending != reverse else '') + name for name, descending in self.fields]
+
+    def keyset_filter(self, position, reverse):
+        """Rows strictly after position in the (possibly reversed) ordering"""
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self.fields, position):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def position(self, row):
+        values = []
+        for name, _ in self.fields:
+            value = getattr(row, name)
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            elif isinstance(value, Decimal):
+                value = str(value)
+            values.append(value)
+        return values
+
+    def decode_cursor(self, request):
+        encoded = query_params(request).get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+        try:
+            data = json.loads(urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            reverse, position = bool(data['r']), list(data['p'])
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if len(position) != len(self.fields):
+            raise NotFound(self.invalid_cursor_message)
+        return reverse, position
+
+    def encode_cursor(self, reverse, position):
+        encoded = urlsafe_b64encode(json.dumps({'r': int(reverse), 'p': position}).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(False, self.position(self.page[-1]))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(True, self.position(self.page[0]))
+
+    def get_paginated_data(self, data):
+        fields = [('next', self.get_next_link()), ('previous', self.get_previous_link()), ('results', data)]
+        if self.count is not None:
+            fields.insert(0, ('count', self.count))
+        return OrderedDict(fields)
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'count': {'type': 'integer', 'example': 123},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class KeysetOrderingMixin:
+    """
+    Viewset mixin letting ``?ordering=`` choose one of ``keyset_orderings`` (name ->
+    KeysetPagination ordering, each backed by an index). The first one is the default.
+    """
+    keyset_orderings = {}
+    ordering_query_param = 'ordering'
+
+    @property
+    def keyset_ordering(self):
+        requested = query_params(self.request).get(self.ordering_query_param)
+        return self.keyset_orderings.get(requested) or next(iter(self.keyset_orderings.values()))
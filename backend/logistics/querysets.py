@@ -0,0 +1,94 @@
+from django.db.models import Prefetch
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+
+def _relation_path(model, source_attrs):
+    """Return the longest prefix of source_attrs that follows single-valued relations"""
+    path = []
+    for attr in source_attrs:
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            break
+        if not field.is_relation or field.many_to_many or field.one_to_many:
+            break
+        path.append(attr)
+        model = field.related_model
+    return path
+
+
+def serializer_query_shape(serializer_class):
+    """
+    Work out the select_related paths and Prefetch objects a ModelSerializer
+    needs so that serializing a page of rows never queries per row.
+
+    Dotted sources like ``customer.company_name`` become ``select_related('customer')``
+    and nested ``many=True`` serializers become a ``Prefetch`` whose queryset is
+    shaped from the child serializer in the same way.
+    """
+    cached = serializer_class.__dict__.get('_query_shape')
+    if cached is not None:
+        return cached
+
+    model = serializer_class.Meta.model
+    select_related = set()
+    prefetch_related = []
+
+    for field in serializer_class().fields.values():
+        if isinstance(field, serializers.ListSerializer):
+            child = field.child
+            child_model = child.Meta.model
+            child_queryset = shape_queryset(child_model._default_manager.all(), child.__class__)
+            prefetch_related.append(Prefetch(field.source, queryset=child_queryset))
+            continue
+
+        if isinstance(field, serializers.RelatedField) and field.use_pk_only_optimization():
+            # PK-only related fields read the "<name>_id" column, no join needed
+            source_attrs = field.source_attrs[:-1]
+        else:
+            source_attrs = field.source_attrs
+
+        path = _relation_path(model, source_attrs)
+        if not path:
+            continue
+        prefix = '__'.join(path)
+        select_related.add(prefix)
+
+        if isinstance(field, serializers.ModelSerializer) and len(path) == len(source_attrs):
+            # Nested single object: pull its own relations through the same join
+            nested_select, _ = serializer_query_shape(field.__class__)
+            select_related.update(f'{prefix}__{nested}' for nested in nested_select)
+
+    shape = (sorted(select_related), prefetch_related)
+    serializer_class._query_shape = shape
+    return shape
+
+
+def shape_queryset(queryset, serializer_class):
+    """Apply the serializer's select_related/prefetch_related shape to a queryset"""
+    select_related, prefetch_related = serializer_query_shape(serializer_class)
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*prefetch_related)
+    return queryset
+
+
+class QueryShapeMixin:
+    """
+    ViewSet mixin that shapes ``get_queryset()`` from the serializer's field sources.
+
+    Viewsets may add to the derived shape with ``select_related_fields`` and
+    ``prefetch_related_fields`` for relations the serializer doesn't reveal.
+    """
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    def get_queryset(self):
+        queryset = shape_queryset(super().get_queryset(), self.get_serializer_class())
+        if self.select_related_fields:
+            queryset = queryset.select_related(*self.select_related_fields)
+        if self.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*self.prefetch_related_fields)
+        return queryset
@@ -0,0 +1,543 @@
+"""
+Server-side PDF rendering of receipts.
+
+Receipts are drawn with fpdf2. Text is set in DejaVu Sans (Latin, Greek and Cyrillic)
+and Noto Sans CJK SC (the GB2312 Chinese characters), both subsets kept in
+``logistics/fonts`` under their open licenses and embedded in each PDF with only the
+glyphs it uses, so the Chinese delivery address and customer names print in any
+viewer. Each character is drawn in the first font that has it, and characters neither
+has come out as "?"; RECEIPT_PDF_FONT can point at a fuller CJK font. Headings and
+labels are static ASCII and use the standard Helvetica-Bold. The layout mirrors the invoice the frontend prints. Everything static on
+a page (branding, labels, table headings and the wrapped remarks) is laid out and
+measured once per process by ``compiled_template()``; rendering a receipt replays
+those drawing operations and only lays out its own values.
+
+Rendering works on plain dicts from ``receipt_data()``, so it never touches the database
+and can run in worker processes. PDFs are cached on disk under
+``RECEIPT_PDF_CACHE_DIR``, named by a hash of the receipt's content and the layout
+version: a receipt is only re-rendered when something printed on it changed. The cache
+keeps the RECEIPT_PDF_CACHE_MAX_FILES most recently used PDFs (see ``prune_cache()``).
+"""
+import functools
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime, time, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from fontTools.ttLib import TTFont
+from fpdf import FPDF
+
+from . import categories
+
+# Bump when the layout changes so cached PDFs are rendered again
+LAYOUT_VERSION = '2'
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+LEFT, RIGHT = 40, 555
+ROW_HEIGHT = 16
+PAGE_BOTTOM = 800
+
+DARK = (0.173, 0.243, 0.314)
+GREY = (0.333, 0.333, 0.333)
+RED = (0.906, 0.298, 0.235)
+GREEN = (0.153, 0.682, 0.376)
+AMBER = (0.522, 0.392, 0.016)
+
+FONT_DIR = Path(__file__).resolve().parent / 'fonts'
+# Latin, Greek and Cyrillic text; Chinese from the CJK font; static bold labels in Helvetica
+LATIN_FONT, LATIN_FONT_PATH = 'dejavu', FONT_DIR / 'DejaVuSans-Latin.ttf'
+CJK_FONT, CJK_FONT_PATH = 'noto', FONT_DIR / 'NotoSansSC-Regular.ttf'
+BOLD_FONT = 'helvetica'
+# Drawn for characters neither font has
+MISSING = '?'
+
+ADDRESSES = [
+    'China (Delivery address)',
+    '广东省佛山市南海区里水镇草场海南州工业区32号L8仓',
+    'Ghana: 10 Dantu Avenue, North Kaneshie, Accra',
+    'Turkey: Katip kasim Mah. Mermerciler Cad. No 5, Kat: 1 Yenikapi/Fatih-Istanbul',
+]
+REMARKS = [
+    ('Fragile Goods:', 'Rockman Logistics is not responsible for damage to fragile items during transit. '
+                       'All fragile goods must be properly packaged and clearly labeled.'),
+    ('Insurance:', 'Basic insurance coverage is included. Additional insurance coverage for high-value items '
+                   'must be requested and paid for separately before shipment.'),
+    ('Fake Goods:', 'Illegal items, counterfeit products, or any goods prohibited by customs regulations are '
+                    'strictly forbidden. Violators will face legal consequences.'),
+    ('Storage Limit:', 'All items must be collected within one week (7 days) of arrival. Storage fees of $5 '
+                       'per CBM per day will apply after this period.'),
+]
+# (heading, left x, right x, alignment)
+COLUMNS = [
+    ('Item #', 40, 80, 'center'),
+    ('Product', 80, 270, 'left'),
+    ('Category', 270, 360, 'left'),
+    ('CBM/Qty', 360, 420, 'center'),
+    ('Unit Price', 420, 485, 'right'),
+    ('Amount', 485, 555, 'right'),
+]
+
+
+def _cjk_font_path():
+    return str(getattr(settings, 'RECEIPT_PDF_FONT', None) or CJK_FONT_PATH)
+
+
+def new_document():
+    """An empty A4 document in points, measured from the top-left, with the receipt fonts"""
+    pdf = FPDF(unit='pt', format=(PAGE_WIDTH, PAGE_HEIGHT))
+    pdf.set_auto_page_break(False)
+    pdf.set_margin(0)
+    pdf.add_font(LATIN_FONT, fname=str(LATIN_FONT_PATH))
+    pdf.add_font(CJK_FONT, fname=_cjk_font_path())
+    return pdf
+
+
+_metrics_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def _metrics():
+    # A document only used for measuring text, so the fonts are parsed once per process
+    return new_document()
+
+
+@functools.lru_cache(maxsize=None)
+def _coverage():
+    """The code points each text font has a glyph for"""
+    return {name: set(TTFont(path, lazy=True).getBestCmap())
+            for name, path in ((LATIN_FONT, str(LATIN_FONT_PATH)), (CJK_FONT, _cjk_font_path()))}
+
+
+def _clean(text):
+    return ''.join(char for char in str(text) if char >= ' ')
+
+
+def _width(font, text, size):
+    with _metrics_lock:
+        pdf = _metrics()
+        pdf.set_font(font, 'B' if font == BOLD_FONT else '', size)
+        return pdf.get_string_width(text)
+
+
+def runs(text, size, bold=False):
+    """[(font, text, width)] pieces of text, each in the first font that has all its characters"""
+    text = _clean(text)
+    if bold:
+        return [(BOLD_FONT, text, _width(BOLD_FONT, text, size))] if text else []
+    coverage = _coverage()
+    pieces = []
+    for char in text:
+        if ord(char) in coverage[LATIN_FONT]:
+            font = LATIN_FONT
+        elif ord(char) in coverage[CJK_FONT]:
+            font = CJK_FONT
+        else:
+            font, char = LATIN_FONT, MISSING
+        if pieces and pieces[-1][0] == font:
+            pieces[-1][1] += char
+        else:
+            pieces.append([font, char])
+    return [(font, piece, _width(font, piece, size)) for font, piece in pieces]
+
+
+def text_width(text, size, bold=False):
+    return sum(width for _, _, width in runs(text, size, bold))
+
+
+def fit(text, width, size, bold=False):
+    """text, cut down with an ellipsis if it is wider than width"""
+    if text_width(text, size, bold) <= width:
+        return text
+    while text and text_width(text + '...', size, bold) > width:
+        text = text[:-1]
+    return text + '...'
+
+
+def wrap(text, width, size, bold=False, first_indent=0):
+    """Greedy word wrap; the first line is first_indent points narrower"""
+    lines, line = [], ''
+    for word in text.split():
+        candidate = f'{line} {word}' if line else word
+        available = width - (first_indent if not lines else 0)
+        if line and text_width(candidate, size, bold) > available:
+            lines.append(line)
+            line = word
+        else:
+            line = candidate
+    if line:
+        lines.append(line)
+    return lines
+
+
+def _rgb(rgb):
+    return tuple(round(value * 255) for value in rgb)
+
+
+class Canvas:
+    """
+    Drawing operations positioned from the top-left like the HTML layout, measured when
+    they are added and replayed onto an fpdf2 document by ``draw()``.
+    """
+
+    def __init__(self):
+        self.ops = []
+
+    def text(self, x, y, text, size=9, bold=False, align='left', rgb=(0, 0, 0)):
+        pieces = runs(text, size, bold)
+        width = sum(piece_width for _, _, piece_width in pieces)
+        if align == 'right':
+            x -= width
+        elif align == 'center':
+            x -= width / 2
+        self.ops.append(('text', x, y, pieces, size, _rgb(rgb)))
+
+    def line(self, x1, y1, x2, y2, width=0.5, rgb=(0.867, 0.867, 0.867)):
+        self.ops.append(('line', x1, y1, x2, y2, width, _rgb(rgb)))
+
+    def rect(self, x, y, width, height, fill=None, stroke=None, line_width=0.5):
+        self.ops.append(('rect', x, y, width, height, fill and _rgb(fill), stroke and _rgb(stroke), line_width))
+
+    def place(self, fragment, dy=0):
+        """Add a compiled fragment (another Canvas) moved down by dy points"""
+        for op in fragment.ops:
+            if op[0] == 'line':
+                name, x1, y1, x2, y2, *rest = op
+                self.ops.append((name, x1, y1 + dy, x2, y2 + dy, *rest))
+            else:
+                name, x, y, *rest = op
+                self.ops.append((name, x, y + dy, *rest))
+
+    def draw(self, pdf):
+        for op, *args in self.ops:
+            if op == 'text':
+                x, y, pieces, size, rgb = args
+                pdf.set_text_color(*rgb)
+                for font, text, width in pieces:
+                    pdf.set_font(font, 'B' if font == BOLD_FONT else '', size)
+                    pdf.text(x, y, text)
+                    x += width
+            elif op == 'line':
+                x1, y1, x2, y2, width, rgb = args
+                pdf.set_line_width(width)
+                pdf.set_draw_color(*rgb)
+                pdf.line(x1, y1, x2, y2)
+            else:
+                x, y, width, height, fill, stroke, line_width = args
+                if fill:
+                    pdf.set_fill_color(*fill)
+                if stroke:
+                    pdf.set_draw_color(*stroke)
+                    pdf.set_line_width(line_width)
+                pdf.rect(x, y, width, height, style='DF' if fill and stroke else ('F' if fill else 'D'))
+
+
+def write_pdf(pages):
+    """A complete PDF file from a list of page Canvases"""
+    pdf = new_document()
+    for page in pages:
+        pdf.add_page()
+        page.draw(pdf)
+    return bytes(pdf.output())
+
+
+class ReceiptTemplate:
+    """The static parts of the receipt layout, laid out once"""
+
+    first_rows_top = 316
+    next_rows_top = 100
+
+    def __init__(self):
+        self.value_x = {}
+        self.first_page = self._first_page()
+        self.next_page = self._next_page(table=True)
+        self.plain_page = self._next_page(table=False)
+        self.summary, self.summary_height = self._summary()
+
+    def _label(self, canvas, key, x, y, label, size=9):
+        canvas.text(x, y, label, size, bold=True, rgb=GREY)
+        self.value_x[key] = x + text_width(label, size, bold=True) + 4
+
+    def _table_header(self, canvas, top):
+        canvas.rect(LEFT, top - 20, RIGHT - LEFT, 20, fill=DARK)
+        for heading, left, right, align in COLUMNS:
+            x = {'left': left + 6, 'center': (left + right) / 2, 'right': right - 6}[align]
+            canvas.text(x, top - 6, heading, 9, bold=True, align=align, rgb=(1, 1, 1))
+
+    def _first_page(self):
+        canvas = Canvas()
+        canvas.text(LEFT, 58, 'ROCKMAN LOGISTICS', 18, bold=True, rgb=DARK)
+        for offset, address in enumerate(ADDRESSES):
+            canvas.text(LEFT, 73 + offset * 11, address, 8, rgb=GREY)
+        canvas.text(RIGHT, 58, 'INVOICE', 16, bold=True, align='right', rgb=RED)
+        canvas.line(LEFT, 112, RIGHT, 112, width=2.5, rgb=DARK)
+
+        canvas.rect(LEFT, 124, RIGHT - LEFT, 48, fill=(0.973, 0.976, 0.98), stroke=(0.871, 0.886, 0.902))
+        canvas.text(LEFT + 10, 142, 'Shipment Details', 11, bold=True, rgb=DARK)
+        self._label(canvas, 'container_number', LEFT + 10, 162, 'Container No:')
+        self._label(canvas, 'loading_date', 222, 162, 'Loading Date:')
+        self._label(canvas, 'eta', 394, 162, 'ETA:')
+
+        canvas.text(LEFT, 194, 'Party Information', 11, bold=True, rgb=DARK)
+        canvas.line(LEFT, 199, RIGHT, 199)
+        canvas.text(LEFT, 216, 'Customer Information', 10, bold=True, rgb=GREY)
+        canvas.text(310, 216, 'Staff Information', 10, bold=True, rgb=GREY)
+        self._label(canvas, 'customer_name', LEFT, 232, 'Company:')
+        self._label(canvas, 'contact_person', LEFT, 246, 'Contact Person:')
+        self._label(canvas, 'customer_code', LEFT, 260, 'Code:')
+        self._label(canvas, 'created_by', 310, 232, 'Created By:')
+        self._label(canvas, 'issue_date', 310, 246, 'Date:')
+
+        canvas.text(LEFT, 284, 'Item Details', 11, bold=True, rgb=DARK)
+        canvas.line(LEFT, 289, RIGHT, 289)
+        self._table_header(canvas, self.first_rows_top)
+        return canvas
+
+    def _next_page(self, table):
+        canvas = Canvas()
+        canvas.text(LEFT, 50, 'ROCKMAN LOGISTICS', 12, bold=True, rgb=DARK)
+        canvas.line(LEFT, 62, RIGHT, 62, width=1.5, rgb=DARK)
+        if table:
+            self._table_header(canvas, self.next_rows_top)
+        return canvas
+
+    def _summary(self):
+        """Payment summary box and remarks, drawn from y=0 and moved into place per receipt"""
+        canvas = Canvas()
+        canvas.rect(300, 12, RIGHT - 300, 64, fill=(0.973, 0.976, 0.98), stroke=DARK, line_width=1.5)
+        canvas.text(RIGHT - 10, 30, 'Payment Summary', 11, bold=True, align='right', rgb=DARK)
+
+        size, width = 8, RIGHT - LEFT - 36
+        lines = []
+        for number, (title, body) in enumerate(REMARKS, start=1):
+            prefix = f'{number}. {title} '
+            wrapped = wrap(body, width, size, first_indent=text_width(prefix, size, bold=True))
+            lines.append((prefix, wrapped[0]))
+            lines.extend((None, line) for line in wrapped[1:])
+        top = 92
+        height = 30 + len(lines) * 11
+        canvas.rect(LEFT, top, RIGHT - LEFT, height, fill=(1, 0.953, 0.804), stroke=(1, 0.918, 0.655))
+        canvas.text(LEFT + 12, top + 18, 'IMPORTANT REMARKS', 10, bold=True, rgb=AMBER)
+        y = top + 34
+        for prefix, line in lines:
+            x = LEFT + 18
+            if prefix:
+                canvas.text(x, y, prefix, size, bold=True, rgb=AMBER)
+                x += text_width(prefix, size, bold=True)
+            elif line:
+                x += text_width('1. ', size, bold=True)
+            canvas.text(x, y, line, size, rgb=AMBER)
+            y += 11
+        return canvas, top + height
+
+
+@functools.lru_cache(maxsize=None)
+def compiled_template(version=LAYOUT_VERSION):
+    return ReceiptTemplate()
+
+
+def _format_date(value):
+    if not value:
+        return 'N/A'
+    if isinstance(value, datetime):
+        value = timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return value.isoformat()
+
+
+def _money(value):
+    return f'${float(value):,.2f}'
+
+
+def receipt_data(receipt):
+    """Everything printed on a receipt, as plain JSON-able values"""
+    items = []
+    for item in sorted(receipt.items.all(), key=lambda item: item.pk):
+        category = categories.get_category(item.category_id) if item.category_id else None
+        items.append({
+            'description': item.description,
+            'category': category.name if category else '',
+            'cbm': str(item.cbm),
+            'unit_price': str(item.unit_price or 0),
+            'total_price': str(item.total_price),
+        })
+    return {
+        'receipt_number': receipt.receipt_number,
+        'issue_date': _format_date(receipt.issue_date),
+        'container_number': receipt.container_number or 'N/A',
+        'loading_date': _format_date(receipt.loading_date),
+        'eta': _format_date(receipt.eta),
+        'customer_name': receipt.customer.company_name or 'N/A',
+        'contact_person': receipt.customer.contact_person or 'N/A',
+        'customer_code': receipt.customer.customer_code or 'N/A',
+        'created_by': receipt.created_by.username if receipt.created_by_id else 'System',
+        'total_amount': str(receipt.total_amount),
+        'payment_status': receipt.payment_status,
+        'notes': receipt.notes,
+        'items': items,
+    }
+
+
+def content_hash(data):
+    payload = json.dumps(data, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(f'{LAYOUT_VERSION}:{payload}'.encode('utf-8')).hexdigest()
+
+
+def _draw_row(canvas, y, number, item):
+    if number % 2:
+        canvas.rect(LEFT, y, RIGHT - LEFT, ROW_HEIGHT, fill=(0.976, 0.976, 0.976))
+    canvas.line(LEFT, y + ROW_HEIGHT, RIGHT, y + ROW_HEIGHT)
+    values = [str(number), item['description'], item['category'], item['cbm'],
+              _money(item['unit_price']), _money(item['total_price'])]
+    for value, (_, left, right, align) in zip(values, COLUMNS):
+        value = fit(value, right - left - 12, 9)
+        x = {'left': left + 6, 'center': (left + right) / 2, 'right': right - 6}[align]
+        canvas.text(x, y + 11.5, value, 9, align=align)
+
+
+def _draw_summary(canvas, template, top, data):
+    canvas.place(template.summary, top)
+    canvas.text(RIGHT - 10, top + 48, f"Total: {_money(data['total_amount'])} USD", 12, bold=True, align='right')
+    status = data['payment_status'] or ''
+    canvas.text(RIGHT - 10, top + 66, status.upper(), 9, bold=True, align='right',
+                rgb=GREEN if status == 'paid' else RED)
+    canvas.text(RIGHT - 14 - text_width(status.upper(), 9, bold=True), top + 66, 'Payment Status:', 9,
+                align='right', rgb=GREY)
+    if data['notes']:
+        canvas.text(LEFT, top + 26, 'Notes', 10, bold=True, rgb=GREY)
+        for offset, line in enumerate(wrap(data['notes'], 245, 8.5)[:4]):
+            canvas.text(LEFT, top + 40 + offset * 11, line, 8.5, rgb=GREY)
+
+
+def render(data):
+    """PDF bytes for a receipt_data() dict"""
+    template = compiled_template()
+    pages = []
+    canvas = Canvas()
+    canvas.place(template.first_page)
+    canvas.text(RIGHT, 78, f"Invoice #: {data['receipt_number']}", 10, align='right', rgb=GREY)
+    canvas.text(RIGHT, 92, f"Date: {data['issue_date']}", 10, align='right', rgb=GREY)
+    for key in ('container_number', 'loading_date', 'eta'):
+        canvas.text(template.value_x[key], 162, fit(data[key], 110, 9), 9)
+    for key, y in (('customer_name', 232), ('contact_person', 246), ('customer_code', 260)):
+        canvas.text(template.value_x[key], y, fit(data[key], 300 - template.value_x[key], 9), 9)
+    for key, y in (('created_by', 232), ('issue_date', 246)):
+        canvas.text(template.value_x[key], y, fit(data[key], RIGHT - template.value_x[key], 9), 9)
+
+    y = template.first_rows_top
+    for number, item in enumerate(data['items'], start=1):
+        if y + ROW_HEIGHT > PAGE_BOTTOM:
+            pages.append(canvas)
+            canvas = Canvas()
+            canvas.place(template.next_page)
+            y = template.next_rows_top
+        _draw_row(canvas, y, number, item)
+        y += ROW_HEIGHT
+
+    if y + template.summary_height > PAGE_BOTTOM:
+        pages.append(canvas)
+        canvas = Canvas()
+        canvas.place(template.plain_page)
+        y = 70
+    _draw_summary(canvas, template, y, data)
+    pages.append(canvas)
+
+    for number, page in enumerate(pages, start=1):
+        page.text(LEFT, 822, data['receipt_number'], 8, rgb=GREY)
+        page.text(RIGHT, 822, f'Page {number} of {len(pages)}', 8, align='right', rgb=GREY)
+    return write_pdf(pages)
+
+
+def cache_dir():
+    return Path(getattr(settings, 'RECEIPT_PDF_CACHE_DIR', None) or Path(tempfile.gettempdir()) / 'receipt_pdfs')
+
+
+def cache_path(digest):
+    return cache_dir() / digest[:2] / f'{digest}.pdf'
+
+
+# Renders in this process since the cache was last pruned
+_renders_since_prune = 0
+PRUNE_EVERY = 50
+
+
+def cached_pdf(data):
+    """Path of the receipt's PDF in the disk cache, rendering it first if needed; returns (path, rendered)"""
+    global _renders_since_prune
+    path = cache_path(content_hash(data))
+    try:
+        # Mark it recently used, so pruning removes the least recently served PDFs first
+        os.utime(path)
+        return path, False
+    except FileNotFoundError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write to a temporary file and rename, so readers never see a partial PDF
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(render(data))
+    os.replace(temp_path, path)
+    _renders_since_prune += 1
+    if _renders_since_prune >= PRUNE_EVERY:
+        prune_cache()
+    return path, True
+
+
+def prune_cache(max_files=None):
+    """Delete the least recently used PDFs beyond max_files (RECEIPT_PDF_CACHE_MAX_FILES); returns how many"""
+    global _renders_since_prune
+    _renders_since_prune = 0
+    if max_files is None:
+        max_files = settings.RECEIPT_PDF_CACHE_MAX_FILES
+    files = []
+    for path in cache_dir().glob('*/*.pdf'):
+        try:
+            files.append((path.stat().st_mtime, path))
+        except FileNotFoundError:
+            pass
+    excess = len(files) - max_files
+    if excess <= 0:
+        return 0
+    files.sort()
+    for _, path in files[:excess]:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+    return excess
+
+
+def receipts_for_day(day):
+    """Receipts issued on day, loaded with everything receipt_data() reads"""
+    from .models import Receipt
+
+    start = datetime.combine(day, time.min)
+    if settings.USE_TZ:
+        start = timezone.make_aware(start)
+    return (Receipt.objects.filter(issue_date__gte=start, issue_date__lt=start + timedelta(days=1))
+            .select_related('customer', 'created_by').prefetch_related('items').order_by('issue_date', 'id'))
+
+
+def render_many(receipts_data, workers=None):
+    """
+    Ensure cached PDFs for many receipt_data() dicts, rendering across a process pool.
+    Returns [(path, rendered)] in input order.
+    """
+    # Imported here: multiprocessing is only needed by the batch command and job, not by web requests
+    from concurrent.futures import ProcessPoolExecutor
+
+    receipts_data = list(receipts_data)
+    if workers == 1 or len(receipts_data) < 2:
+        results = [cached_pdf(data) for data in receipts_data]
+        prune_cache()
+        return results
+    # Forked workers must not share the parent's database connections
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=compiled_template) as pool:
+        results = list(pool.map(cached_pdf, receipts_data, chunksize=8))
+    prune_cache()
+    return results
@@ -0,0 +1,186 @@
+"""
+Full-text search over customers, shipments and receipts.
+
+Every searchable row has a ``SearchDocument`` (title + body text) kept up to date by the
+signal handlers in signals.py. On PostgreSQL documents carry a ``tsvector`` with a GIN
+index and are matched with ``to_tsquery`` prefix terms and ranked with ``ts_rank``; on
+SQLite an FTS5 table mirrors the documents through triggers and is ranked with bm25.
+Both use simple (non-stemming) tokenizing since most queries are codes and names.
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, Func, TextField, Value
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from rest_framework.filters import BaseFilterBackend
+
+SEARCH_CONFIG = 'simple'
+FTS_TABLE = 'logistics_searchdocument_fts'
+INDEX_BATCH_SIZE = 500
+
+
+def _join(*parts):
+    return ' '.join(str(part) for part in parts if part)
+
+
+def customer_document(customer):
+    return (customer.company_name, customer.customer_code or '',
+            _join(customer.customer_code, customer.contact_person, customer.email, customer.phone,
+                  customer.company_registration))
+
+
+def shipment_document(shipment):
+    return (shipment.tracking_number, f'{shipment.origin} → {shipment.destination}',
+            _join(shipment.customer.company_name, shipment.origin, shipment.destination, shipment.description))
+
+
+def receipt_document(receipt):
+    return (receipt.receipt_number, _join(receipt.customer.company_name, receipt.container_number),
+            _join(receipt.customer.company_name, receipt.customer.customer_code, receipt.container_number, receipt.notes))
+
+
+def _builders():
+    from .models import Customer, Receipt, Shipment
+
+    return {
+        Customer: ('customer', customer_document, ()),
+        Shipment: ('shipment', shipment_document, ('customer',)),
+        Receipt: ('receipt', receipt_document, ('customer',)),
+    }
+
+
+def _words(field):
+    # Postgres' parser reads "RCP-20261017-001" as a word plus negative numbers, so
+    # split on punctuation first to get the same tokens query_terms() produces
+    return Func(F(field), Value(r'[^[:alnum:]_]+'), Value(' '), Value('g'),
+                function='regexp_replace', output_field=TextField())
+
+
+def index_objects(objects):
+    """Create or refresh the search documents for a list of objects of one model"""
+    from .models import SearchDocument
+
+    objects = list(objects)
+    if not objects:
+        return
+    kind, build, _ = _builders()[type(objects[0])]
+    now = timezone.now()
+    documents = []
+    for obj in objects:
+        title, subtitle, body = build(obj)
+        documents.append(SearchDocument(kind=kind, object_id=obj.pk, title=title[:200],
+                                        subtitle=subtitle[:200], body=body, updated_at=now))
+    SearchDocument.objects.bulk_create(
+        documents, update_conflicts=True, unique_fields=['kind', 'object_id'],
+        update_fields=['title', 'subtitle', 'body', 'updated_at'],
+    )
+    if connection.vendor == 'postgresql':
+        SearchDocument.objects.filter(kind=kind, object_id__in=[obj.pk for obj in objects]).update(
+            search_vector=(SearchVector(_words('title'), weight='A', config=SEARCH_CONFIG)
+                           + SearchVector(_words('body'), weight='B', config=SEARCH_CONFIG)),
+        )
+
+
+def index_queryset(queryset, batch_size=INDEX_BATCH_SIZE):
+    """Index a queryset in primary key batches; returns the number of objects indexed"""
+    _, _, related = _builders()[queryset.model]
+    queryset = queryset.select_related(*related).order_by('pk')
+    indexed = 0
+    last_pk = None
+    while True:
+        batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        batch = list(batch[:batch_size])
+        if not batch:
+            return indexed
+        index_objects(batch)
+        indexed += len(batch)
+        last_pk = batch[-1].pk
+
+
+def remove_object(obj):
+    from .models import SearchDocument
+
+    kind = _builders()[type(obj)][0]
+    SearchDocument.objects.filter(kind=kind, object_id=obj.pk).delete()
+
+
+def indexed_title(kind, object_id):
+    from .models import SearchDocument
+
+    return SearchDocument.objects.filter(kind=kind, object_id=object_id).values_list('title', flat=True).first()
+
+
+def query_terms(text):
+    """Lower-cased word tokens of a query, matching how documents are tokenized"""
+    return re.findall(r'\w+', text.lower())[:10]
+
+
+def _postgres_query(terms):
+    # Every term must match, the last one (or all of them) as a prefix for typeahead
+    return SearchQuery(' & '.join(f'{term}:*' for term in terms), search_type='raw', config=SEARCH_CONFIG)
+
+
+def _sqlite_query(terms):
+    return ' AND '.join(f'"{term}"*' for term in terms)
+
+
+def search(text, kinds=None, limit=20):
+    """Ranked search documents matching every term of text (as prefixes), best first"""
+    from .models import SearchDocument
+
+    terms = query_terms(text)
+    if not terms:
+        return []
+
+    if connection.vendor == 'postgresql':
+        query = _postgres_query(terms)
+        documents = SearchDocument.objects.filter(search_vector=query)
+        if kinds:
+            documents = documents.filter(kind__in=kinds)
+        return list(documents.annotate(rank=SearchRank(F('search_vector'), query))
+                    .order_by('-rank', 'title')[:limit])
+
+    sql = (f'SELECT d.*, -bm25({FTS_TABLE}, 10.0, 1.0) AS rank FROM {FTS_TABLE} '
+           f'JOIN {SearchDocument._meta.db_table} d ON d.id = {FTS_TABLE}.rowid '
+           f'WHERE {FTS_TABLE} MATCH %s')
+    params = [_sqlite_query(terms)]
+    if kinds:
+        sql += f" AND d.kind IN ({', '.join(['%s'] * len(kinds))})"
+        params.extend(kinds)
+    sql += ' ORDER BY rank DESC, d.title LIMIT %s'
+    params.append(limit)
+    return list(SearchDocument.objects.raw(sql, params))
+
+
+def matching_ids(kind, text):
+    """Object ids of the given kind matching text, as a subquery for ``pk__in``"""
+    from .models import SearchDocument
+
+    terms = query_terms(text)
+    if not terms:
+        return SearchDocument.objects.none().values('object_id')
+    if connection.vendor == 'postgresql':
+        return SearchDocument.objects.filter(kind=kind, search_vector=_postgres_query(terms)).values('object_id')
+
+    # Kept in SQL rather than read into a list, which SQLite caps at 999 parameters
+    return RawSQL(
+        f'SELECT d.object_id FROM {FTS_TABLE} JOIN {SearchDocument._meta.db_table} d '
+        f'ON d.id = {FTS_TABLE}.rowid WHERE {FTS_TABLE} MATCH %s AND d.kind = %s',
+        [_sqlite_query(terms), kind],
+    )
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    """
+    ``?search=`` filter backed by the search documents instead of ILIKE scans.
+    The view names its document kind with ``search_document_type``.
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '').strip()
+        if not text:
+            return queryset
+        return queryset.filter(pk__in=matching_ids(view.search_document_type, text))
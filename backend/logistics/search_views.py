@@ -0,0 +1,42 @@
+from rest_framework import status
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from . import search
+from .models import SearchDocument
+
+SEARCH_KINDS = [kind for kind, _ in SearchDocument.KIND_CHOICES]
+
+
+@api_view(['GET'])
+def global_search(request):
+    """Ranked prefix search across customers, tracking numbers, container numbers and receipt numbers"""
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({'error': 'Search query (q) is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+    kinds = [kind for kind in request.query_params.get('type', '').split(',') if kind]
+    unknown = set(kinds) - set(SEARCH_KINDS)
+    if unknown:
+        return Response({'error': f"Unknown type: {', '.join(sorted(unknown))}. Choose from {', '.join(SEARCH_KINDS)}"},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        limit = min(max(int(request.query_params.get('limit', 20)), 1), 50)
+    except ValueError:
+        limit = 20
+
+    results = search.search(query, kinds=kinds or None, limit=limit)
+    return Response({
+        'query': query,
+        'results': [
+            {
+                'type': document.kind,
+                'id': document.object_id,
+                'title': document.title,
+                'subtitle': document.subtitle,
+                'rank': round(float(document.rank), 4),
+            }
+            for document in results
+        ],
+    })
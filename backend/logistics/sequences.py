@@ -0,0 +1,116 @@
+"""
+Counters behind generated document numbers (RCP-YYYYMMDD-NNN, CUSTNNN, EMPNNN).
+
+Each counter is a row in ``DocumentSequence``. Values are handed out by a single
+atomic ``UPDATE ... RETURNING`` on PostgreSQL, so concurrent workers never see the
+same number and no insert has to scan existing codes. On SQLite the update takes
+the database write lock, which gives the same guarantee.
+
+With ``DOCUMENT_SEQUENCE_BLOCK_SIZE`` above 1 each worker process reserves a block
+of values at a time and hands them out from memory, so bulk imports don't queue on
+the counter row. Numbers stay unique but may be issued out of order between workers.
+"""
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+_lock = threading.Lock()
+_blocks = {}  # counter name -> [next value, last value] reserved by this process
+
+
+def max_code_number(model, field, prefix):
+    """Highest numeric suffix among existing ``<prefix><digits>`` codes, used to seed a new counter"""
+    codes = model.objects.filter(**{f'{field}__startswith': prefix}).values_list(field, flat=True)
+    max_num = 0
+    for code in codes.iterator():
+        num_part = code[len(prefix):]
+        if num_part.isdigit():
+            max_num = max(max_num, int(num_part))
+    return max_num
+
+
+def _advance(name, count):
+    """Add count to the counter and return its new value, or None if the counter doesn't exist"""
+    from .models import DocumentSequence
+
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {DocumentSequence._meta.db_table} '
+                'SET value = value + %s, updated_at = NOW() WHERE name = %s RETURNING value',
+                [count, name],
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    # SQLite fallback: the UPDATE holds the write lock until the transaction ends,
+    # so reading the value back inside the same transaction is race free.
+    updated = DocumentSequence.objects.filter(name=name).update(value=F('value') + count)
+    if not updated:
+        return None
+    return DocumentSequence.objects.filter(name=name).values_list('value', flat=True).get()
+
+
+def reserve(name, count=1, seed=None):
+    """
+    Reserve count consecutive values from the named counter and return them as a range.
+
+    ``seed`` is an optional callable returning the last value already in use; it is only
+    called when the counter row is first created.
+    """
+    from .models import DocumentSequence
+
+    with transaction.atomic():
+        last = _advance(name, count)
+        if last is None:
+            DocumentSequence.objects.get_or_create(name=name, defaults={'value': seed() if seed else 0})
+            last = _advance(name, count)
+    return range(last - count + 1, last + 1)
+
+
+def next_value(name, seed=None):
+    """Return the next value of the named counter, drawing from this process's reserved block if any"""
+    block_size = max(1, getattr(settings, 'DOCUMENT_SEQUENCE_BLOCK_SIZE', 1))
+    if block_size == 1:
+        return reserve(name, 1, seed)[0]
+
+    with _lock:
+        block = _blocks.get(name)
+        if block and block[0] <= block[1]:
+            value = block[0]
+            block[0] += 1
+            return value
+
+    values = reserve(name, block_size, seed)
+
+    def publish():
+        # Only share the rest of the block once the reservation can no longer roll back
+        with _lock:
+            _blocks[name] = [values[1], values[-1]]
+
+    transaction.on_commit(publish)
+    return values[0]
+
+
+def advance_past(name, value):
+    """
+    Move the counter up to at least value, for codes issued outside it (e.g. imported).
+    A counter that doesn't exist yet is left alone: its seed reads the existing codes.
+    Blocks already reserved by other processes can still include value.
+    """
+    from .models import DocumentSequence
+
+    DocumentSequence.objects.filter(name=name, value__lt=value).update(value=value, updated_at=timezone.now())
+    with _lock:
+        block = _blocks.get(name)
+        if block and block[0] <= value:
+            del _blocks[name]
+
+
+def clear_reserved_blocks():
+    """Forget any values reserved by this process (unused values are skipped, never reused)"""
+    with _lock:
+        _blocks.clear()
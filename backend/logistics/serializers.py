@@ -1,10 +1,76 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import GoodsCategory, Customer, Staff, Shipment, Receipt, ReceiptItem
+from .models import (GoodsCategory, Customer, Staff, Shipment, ShipmentEvent, Receipt, ReceiptItem, Job,
+                     ContainerStats, CustomerStats)
 from django.db import models, transaction
+from django.db.models import prefetch_related_objects
+from django.utils import timezone
+from .querysets import serializer_query_shape
+from . import categories, changes, dashboard, search
+from .metrics import TimedRepresentationMixin
 
 
-class StaffSerializer(serializers.ModelSerializer):
+class TimedModelSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
+    """ModelSerializer whose output time shows up in request profiles (see metrics.py)"""
+
+
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField that first looks the pk up in a dict preloaded into the
+    serializer context (see ``preload_related``), so validating many nested rows
+    doesn't run one SELECT per row.
+    """
+
+    def __init__(self, preload_key, **kwargs):
+        self.preload_key = preload_key
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        preloaded = self.context.get(self.preload_key)
+        if preloaded is not None:
+            try:
+                return preloaded[int(data)]
+            except (KeyError, TypeError, ValueError):
+                pass
+        return super().to_internal_value(data)
+
+
+class CategoryField(serializers.PrimaryKeyRelatedField):
+    """Category by id, resolved from the category registry without a query"""
+
+    def to_internal_value(self, data):
+        category = categories.get_category(data)
+        if category is not None:
+            return category
+        return super().to_internal_value(data)
+
+
+def preload_related(context, key, model, rows, field):
+    """Load every ``model`` referenced by ``row[field]`` in one query into ``context[key]``"""
+    pks = set()
+    for row in rows:
+        if isinstance(row, dict) and row.get(field) not in (None, ''):
+            try:
+                pks.add(int(row[field]))
+            except (TypeError, ValueError):
+                pass
+    preloaded = context.setdefault(key, {})
+    missing = pks - preloaded.keys()
+    if missing:
+        preloaded.update(model.objects.in_bulk(missing))
+
+
+def build_receipt_items(items_data, receipt=None):
+    """Build unsaved ReceiptItems with prices computed in Python, ready for bulk_create"""
+    items = []
+    for item_data in items_data:
+        item = ReceiptItem(receipt=receipt, **item_data)
+        item.calculate_total()
+        items.append(item)
+    return items
+
+
+class StaffSerializer(TimedModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
     email = serializers.CharField(source='user.email', read_only=True)
     first_name = serializers.CharField(source='user.first_name', read_only=True)
@@ -17,7 +83,7 @@ class StaffSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
-class CustomerSerializer(serializers.ModelSerializer):
+class CustomerSerializer(TimedModelSerializer):
     user_name = serializers.CharField(source='user.username', read_only=True)
     user_email = serializers.CharField(source='user.email', read_only=True)
     
@@ -29,14 +95,14 @@ class CustomerSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'customer_code', 'created_at', 'updated_at']
 
 
-class GoodsCategorySerializer(serializers.ModelSerializer):
+class GoodsCategorySerializer(TimedModelSerializer):
     class Meta:
         model = GoodsCategory
         fields = ['id', 'name', 'unit_price', 'description', 'is_active']
         read_only_fields = ['id']
 
 
-class ShipmentSerializer(serializers.ModelSerializer):
+class ShipmentSerializer(TimedModelSerializer):
     customer_name = serializers.CharField(source='customer.company_name', read_only=True)
     created_by_name = serializers.CharField(source='created_by.username', read_only=True)
     
@@ -47,8 +113,34 @@ class ShipmentSerializer(serializers.ModelSerializer):
                   'estimated_delivery', 'actual_delivery', 'created_at', 'updated_at', 'created_by', 'created_by_name']
         read_only_fields = ['id', 'created_at', 'updated_at', 'created_by', 'created_by_name']
 
+    def validate_status(self, value):
+        """Updates follow Shipment.STATUS_TRANSITIONS, like batch transitions"""
+        current = self.instance.status if self.instance else None
+        if current and value != current and value not in Shipment.STATUS_TRANSITIONS.get(current, ()):
+            raise serializers.ValidationError(f"A {current} shipment cannot change to {value}.")
+        return value
+
+    def validate(self, data):
+        """Stamp shipped_date on entering in_transit and actual_delivery on delivery, unless already set"""
+        status = data.get('status')
+        if self.instance and status and status != self.instance.status:
+            stamp = {'in_transit': 'shipped_date', 'delivered': 'actual_delivery'}.get(status)
+            if stamp and not data.get(stamp, getattr(self.instance, stamp)):
+                data[stamp] = timezone.now()
+        return data
+
+
+class ShipmentEventSerializer(TimedModelSerializer):
+    created_by_name = serializers.CharField(source='created_by.username', read_only=True, default=None)
 
-class ReceiptItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ShipmentEvent
+        fields = ['id', 'shipment', 'from_status', 'to_status', 'note', 'created_by', 'created_by_name', 'created_at']
+        read_only_fields = fields
+
+
+class ReceiptItemSerializer(TimedModelSerializer):
+    category = CategoryField(queryset=GoodsCategory.objects.all(), required=False, allow_null=True)
     category_name = serializers.CharField(source='category.name', read_only=True)
     category_unit_price = serializers.DecimalField(source='category.unit_price', read_only=True, max_digits=10, decimal_places=2)
     
@@ -60,14 +152,56 @@ class ReceiptItemSerializer(serializers.ModelSerializer):
     
     def validate(self, data):
         """Validate that unit_price is provided if no category is selected"""
-        if not data.get('category') and not data.get('unit_price'):
+        # Partial updates fall back to the values the item already has
+        category = data.get('category', self.instance.category_id if self.instance else None)
+        unit_price = data.get('unit_price', self.instance.unit_price if self.instance else None)
+        if not category and not unit_price:
             raise serializers.ValidationError(
                 "Either a category must be selected or a unit_price must be provided."
             )
         return data
 
 
-class ReceiptSerializer(serializers.ModelSerializer):
+class ReceiptListSerializer(serializers.ListSerializer):
+    """Creates many receipts with one insert for the receipts and one for all their items"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            preload_related(self.context, 'customers', Customer, data, 'customer')
+        return super().to_internal_value(data)
+
+    @transaction.atomic
+    def create(self, validated_data):
+        user = self.context['request'].user
+        numbers = Receipt.generate_receipt_numbers(len(validated_data))
+
+        receipts = []
+        receipt_items = []
+        for receipt_number, receipt_data in zip(numbers, validated_data):
+            items = build_receipt_items(receipt_data.pop('items', []))
+            receipt_data['created_by'] = user
+            receipt_data['total_amount'] = sum(item.total_price for item in items)
+            receipts.append(Receipt(receipt_number=receipt_number, **receipt_data))
+            receipt_items.append(items)
+
+        Receipt.objects.bulk_create(receipts)
+        all_items = []
+        for receipt, items in zip(receipts, receipt_items):
+            for item in items:
+                item.receipt = receipt
+            all_items.extend(items)
+        ReceiptItem.objects.bulk_create(all_items)
+        # bulk_create skips post_save, so index, count and log the new receipts here
+        search.index_objects(receipts)
+        dashboard.receipts_changed(receipts)
+        changes.record('receipt', receipts, 'created')
+
+        prefetch_related_objects(receipts, *serializer_query_shape(ReceiptSerializer)[1])
+        return receipts
+
+
+class ReceiptSerializer(TimedModelSerializer):
+    customer = PreloadedPrimaryKeyRelatedField('customers', queryset=Customer.objects.all())
     customer_name = serializers.CharField(source='customer.company_name', read_only=True)
     customer_code = serializers.CharField(source='customer.customer_code', read_only=True)
     customer_contact_person = serializers.CharField(source='customer.contact_person', read_only=True)
@@ -80,6 +214,7 @@ class ReceiptSerializer(serializers.ModelSerializer):
                   'created_by', 'created_by_name', 'total_amount', 'payment_status', 
                   'loading_date', 'eta', 'container_number', 'created_at', 'updated_at', 'items']
         read_only_fields = ['id', 'created_at', 'updated_at', 'receipt_number']
+        list_serializer_class = ReceiptListSerializer
     
     @transaction.atomic
     def create(self, validated_data):
@@ -87,21 +222,42 @@ class ReceiptSerializer(serializers.ModelSerializer):
         # Add created_by from request user
         validated_data['created_by'] = self.context['request'].user
         
-        print(f"DEBUG: Creating receipt with data: {validated_data}")
-        print(f"DEBUG: Items data: {items_data}")
-        
+        # Price the items in Python so the receipt is written once with its total
+        items = build_receipt_items(items_data)
+        validated_data['total_amount'] = sum(item.total_price for item in items)
         receipt = Receipt.objects.create(**validated_data)
         
-        # Create items
-        for item_data in items_data:
-            print(f"DEBUG: Creating item with data: {item_data}")
-            ReceiptItem.objects.create(receipt=receipt, **item_data)
-        
-        # Update total
-        total_amount = receipt.items.aggregate(
-            total=models.Sum('total_price')
-        )['total'] or 0
-        receipt.total_amount = total_amount
-        receipt.save()
+        for item in items:
+            item.receipt = receipt
+        ReceiptItem.objects.bulk_create(items)
         
+        prefetch_related_objects([receipt], *serializer_query_shape(ReceiptSerializer)[1])
         return receipt
+
+
+class JobSerializer(TimedModelSerializer):
+    created_by_name = serializers.CharField(source='created_by.username', read_only=True)
+
+    class Meta:
+        model = Job
+        fields = ['id', 'kind', 'params', 'status', 'attempts', 'max_attempts', 'run_after', 'result', 'error',
+                  'created_by', 'created_by_name', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
+
+
+class ContainerStatsSerializer(TimedModelSerializer):
+    class Meta:
+        model = ContainerStats
+        fields = ['container_number', 'items', 'receipts', 'customers', 'cbm', 'revenue', 'updated_at']
+        read_only_fields = fields
+
+
+class CustomerStatsSerializer(TimedModelSerializer):
+    customer_name = serializers.CharField(source='customer.company_name', read_only=True)
+    customer_code = serializers.CharField(source='customer.customer_code', read_only=True)
+
+    class Meta:
+        model = CustomerStats
+        fields = ['customer', 'customer_name', 'customer_code', 'receipts', 'total_amount', 'paid_amount',
+                  'outstanding_amount', 'by_payment_status', 'last_receipt_at', 'updated_at']
+        read_only_fields = fields
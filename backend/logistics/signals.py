@@ -0,0 +1,122 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import authentication, categories, changes, dashboard, search, totals, tracking
+from .models import Customer, DailyCategoryStats, GoodsCategory, Receipt, ReceiptItem, Shipment, ShipmentEvent, Staff
+
+
+def _deleted_with_receipt(origin):
+    return isinstance(origin, Receipt) or getattr(origin, 'model', None) is Receipt
+
+
+@receiver(post_delete, sender=ReceiptItem)
+def receipt_item_deleted(sender, instance, origin=None, **kwargs):
+    """Take a deleted item's total off its receipt, unless the receipt itself is being deleted"""
+    if _deleted_with_receipt(origin):
+        return
+    totals.item_deleted(instance)
+    dashboard.receipt_ids_changed([instance.receipt_id])
+    changes.record_ids('receipt', [instance.receipt_id])
+
+
+@receiver(post_save, sender=ReceiptItem)
+def receipt_item_saved(sender, instance, **kwargs):
+    dashboard.receipt_ids_changed([instance.receipt_id])
+    changes.record_ids('receipt', [instance.receipt_id])
+
+
+@receiver(post_save, sender=Receipt)
+def receipt_saved(sender, instance, created, **kwargs):
+    search.index_objects([instance])
+    changes.record('receipt', [instance], 'created' if created else 'updated')
+    dashboard.receipts_changed([instance], [getattr(instance, '_loaded_metric_keys', (None, '', None))])
+    instance._loaded_metric_keys = (instance.issue_date, instance.container_number, instance.customer_id)
+
+
+@receiver(post_delete, sender=Receipt)
+def receipt_deleted(sender, instance, **kwargs):
+    search.remove_object(instance)
+    dashboard.receipts_changed([instance])
+    changes.record('receipt', [instance], 'deleted')
+
+
+@receiver(post_save, sender=Customer)
+def customer_saved(sender, instance, created, **kwargs):
+    """Reindex the customer, and its receipts and shipments if the company name changed"""
+    renamed = not created and search.indexed_title('customer', instance.pk) not in (None, instance.company_name)
+    search.index_objects([instance])
+    if renamed:
+        search.index_queryset(instance.receipts.all())
+        search.index_queryset(instance.shipments.all())
+        tracking.invalidate(instance.shipments.values_list('tracking_number', flat=True))
+    dashboard.invalidate()
+
+
+@receiver(post_delete, sender=Customer)
+def customer_deleted(sender, instance, **kwargs):
+    search.remove_object(instance)
+    dashboard.invalidate()
+
+
+@receiver(post_save, sender=Shipment)
+def shipment_saved(sender, instance, created, **kwargs):
+    search.index_objects([instance])
+    previous_status = getattr(instance, '_loaded_status', None)
+    if created:
+        dashboard.bump_shipment_status(instance.status, 1)
+        ShipmentEvent.objects.create(shipment=instance, to_status=instance.status, created_by_id=instance.created_by_id)
+    elif previous_status and previous_status != instance.status:
+        dashboard.bump_shipment_status(previous_status, -1)
+        dashboard.bump_shipment_status(instance.status, 1)
+        changed_by = getattr(instance, '_changed_by', None)
+        ShipmentEvent.objects.create(shipment=instance, from_status=previous_status, to_status=instance.status,
+                                     created_by=changed_by if changed_by and changed_by.is_authenticated else None)
+    instance._loaded_status = instance.status
+    changes.record('shipment', [instance], 'created' if created else 'updated')
+    tracking.invalidate({getattr(instance, '_loaded_tracking_number', None), instance.tracking_number})
+    instance._loaded_tracking_number = instance.tracking_number
+
+
+@receiver(post_delete, sender=Shipment)
+def shipment_deleted(sender, instance, **kwargs):
+    search.remove_object(instance)
+    dashboard.bump_shipment_status(instance.status, -1)
+    tracking.invalidate([instance.tracking_number])
+    changes.record('shipment', [instance], 'deleted')
+
+
+@receiver(post_save, sender=Staff)
+@receiver(post_delete, sender=Staff)
+def staff_changed(sender, instance, **kwargs):
+    dashboard.invalidate()
+    authentication.invalidate_user(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    """Drop cached token snapshots so is_active and profile changes apply immediately"""
+    # A login only stamps last_login, which nothing reads from a snapshot
+    if not created and update_fields != frozenset({'last_login'}):
+        authentication.invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    # Covers logout, which deletes the token
+    authentication.invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=GoodsCategory)
+@receiver(post_delete, sender=GoodsCategory)
+def category_changed(sender, **kwargs):
+    categories.bump_version()
+
+
+@receiver(pre_delete, sender=GoodsCategory)
+def category_deleting(sender, instance, **kwargs):
+    """The category's items become uncategorized (a bulk update, no item signals): refresh their days"""
+    days = list(DailyCategoryStats.objects.filter(category=instance).values_list('day', flat=True))
+    transaction.on_commit(lambda: dashboard.refresh_days(days))
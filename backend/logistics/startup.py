@@ -0,0 +1,128 @@
+"""
+Process warm-up and readiness.
+
+``warm_up()`` runs once per web process before it takes traffic (wsgi.py / asgi.py call
+``warm_up_before_serving()`` unless ``STARTUP_WARM_UP`` is off). It loads the URLconf
+and the view modules behind it, checks the database answers, and primes the category
+registry and the token cache, so the first requests after a cold start do not pay for
+any of that. Each step is timed into ``state()``. The connections warm-up opened are
+closed again: the server may fork or serve requests from other threads.
+
+``/health/`` stays a liveness check (the process answers). ``/health/ready/`` reports
+readiness: warm-up finished and the database answers right now. Failures are logged;
+the response only names the step that failed.
+"""
+import asyncio
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, connections
+
+logger = logging.getLogger(__name__)
+
+_state = {'ready': False, 'started_at': None, 'ready_at': None, 'steps': {}, 'error': None}
+_lock = threading.Lock()
+
+
+def _load_urls():
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns
+
+
+def _connect_database():
+    connection.ensure_connection()
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+
+
+def _prime_categories():
+    from . import categories
+    from .views import ACTIVE_CATEGORIES_KEY, active_categories_data
+
+    categories.serialized(ACTIVE_CATEGORIES_KEY, active_categories_data)
+
+
+def _prime_tokens():
+    from . import authentication
+
+    return authentication.prime(getattr(settings, 'STARTUP_PRIME_TOKENS', 100))
+
+
+STEPS = [
+    ('urls', _load_urls),
+    ('database', _connect_database),
+    ('categories', _prime_categories),
+    ('tokens', _prime_tokens),
+]
+
+
+def warm_up():
+    """Run the warm-up steps once per process; failures are logged and leave the process unready"""
+    with _lock:
+        if _state['ready']:
+            return state()
+        _state['started_at'] = time.time()
+        _state['error'] = None
+        for name, step in STEPS:
+            started = time.perf_counter()
+            try:
+                step()
+            except Exception:
+                logger.exception('Startup warm-up step %s failed', name)
+                _state['error'] = name
+                break
+            finally:
+                _state['steps'][name] = round((time.perf_counter() - started) * 1000, 1)
+        else:
+            _state['ready'] = True
+            _state['ready_at'] = time.time()
+            logger.info('Warm-up finished in %.0f ms: %s', sum(_state['steps'].values()), _state['steps'])
+    return state()
+
+
+def _warm_up_and_close():
+    try:
+        return warm_up()
+    finally:
+        # Requests may run in other threads or forked processes, which must not share these
+        connections.close_all()
+
+
+def warm_up_before_serving():
+    """warm_up() from a server entry point; in a thread if an event loop is already running"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return _warm_up_and_close()
+    thread = threading.Thread(target=_warm_up_and_close, name='warm-up')
+    thread.start()
+    thread.join()
+    return state()
+
+
+def state():
+    """Copy of the warm-up state: ready flag, timestamps, per-step milliseconds and any error"""
+    return {**_state, 'steps': dict(_state['steps'])}
+
+
+def readiness():
+    """(ready, details): warm-up has finished and the database answers now"""
+    if not _state['ready'] and not _lock.locked():
+        # Warm-up was skipped or failed (e.g. the database was down at boot): try again
+        warm_up()
+    details = state()
+    if not details['ready']:
+        return False, details
+    started = time.perf_counter()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except Exception:
+        logger.exception('Readiness check could not reach the database')
+        details['error'] = 'database'
+        return False, details
+    details['database_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return True, details
@@ -0,0 +1,36 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryCountAssertionsMixin:
+    """
+    TestCase mixin for checking that an endpoint's query count doesn't grow with its data.
+
+    Usage::
+
+        class ReceiptQueryTests(QueryCountAssertionsMixin, APITestCase):
+            def test_list(self):
+                self.assertConstantQueries('/receipts/', lambda n: make_receipts(n))
+    """
+
+    def count_queries(self, url, method='get', **kwargs):
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, **kwargs)
+        self.assertLess(response.status_code, 400, getattr(response, 'data', response.content))
+        return len(context.captured_queries), context.captured_queries
+
+    def assertConstantQueries(self, url, grow, sizes=(1, 5, 20), method='get', **kwargs):
+        """
+        Call ``grow(n)`` to add rows, hit ``url`` and assert the query count is the same
+        for every size. ``url`` may be a callable returning the URL, for detail endpoints
+        whose object only exists after the first ``grow`` call.
+        """
+        counts = {}
+        for size in sizes:
+            grow(size)
+            target = url() if callable(url) else url
+            counts[size], queries = self.count_queries(target, method=method, **kwargs)
+            if len(set(counts.values())) > 1:
+                sql = '\n'.join(query['sql'] for query in queries)
+                self.fail(f"Query count for {target} changed with data size {counts}:\n{sql}")
+        return counts
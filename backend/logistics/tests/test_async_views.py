@@ -0,0 +1,63 @@
+import asyncio
+
+from django.test import SimpleTestCase
+
+from logistics.async_views import cancel_on_disconnect
+
+
+class CancelOnDisconnectTests(SimpleTestCase):
+    def serve(self, application, messages):
+        """Run application wrapped for one request whose client sends messages, then waits"""
+        async def run():
+            incoming = asyncio.Queue()
+            for message in messages:
+                incoming.put_nowait(message)
+            sent = []
+
+            async def send(message):
+                sent.append(message)
+                if message['type'] == 'http.response.body' and message['more_body']:
+                    await asyncio.sleep(0)
+
+            async def receive():
+                return await incoming.get()
+
+            task = asyncio.create_task(cancel_on_disconnect(application)({'type': 'http'}, receive, send))
+            await asyncio.sleep(0.05)
+            incoming.put_nowait({'type': 'http.disconnect'})
+            await asyncio.wait_for(task, 1)
+            return sent
+        return asyncio.run(run())
+
+    def test_endless_response_is_cancelled_when_the_client_leaves(self):
+        closed = []
+
+        async def stream(scope, receive, send):
+            self.assertEqual(await receive(), {'type': 'http.request', 'body': b'', 'more_body': False})
+            await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+            try:
+                while True:
+                    await send({'type': 'http.response.body', 'body': b': keep-alive\n\n', 'more_body': True})
+                    await asyncio.sleep(0.01)
+            finally:
+                closed.append(True)
+
+        sent = self.serve(stream, [{'type': 'http.request', 'body': b'', 'more_body': False}])
+        self.assertEqual(closed, [True])
+        self.assertGreater(len(sent), 1)
+
+    def test_finished_response_and_errors_pass_through(self):
+        async def view(scope, receive, send):
+            message = await receive()
+            await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+            await send({'type': 'http.response.body', 'body': message['body'], 'more_body': False})
+
+        sent = self.serve(view, [{'type': 'http.request', 'body': b'a', 'more_body': True},
+                                 {'type': 'http.request', 'body': b'b', 'more_body': False}])
+        self.assertEqual(sent[-1]['body'], b'a')
+
+        async def broken(scope, receive, send):
+            raise RuntimeError('boom')
+
+        with self.assertRaisesMessage(RuntimeError, 'boom'):
+            self.serve(broken, [])
@@ -0,0 +1,87 @@
+import os
+import subprocess
+import sys
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User, update_last_login
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from logistics import authentication
+from logistics.models import Staff
+
+
+class TokenCacheTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('clerk', password='p')
+        Staff.objects.create(user=self.user, role='admin')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.key = authentication.cache_key(self.token.key)
+
+    def tearDown(self):
+        authentication.local_cache.clear()
+        cache.clear()
+
+    def cached(self):
+        return cache.get(self.key) is not None
+
+    def test_token_is_cached_after_first_request(self):
+        self.assertEqual(self.client.get('/auth/profile/').status_code, 200)
+        self.assertTrue(self.cached())
+
+    def test_login_timestamp_keeps_the_snapshot(self):
+        self.client.get('/auth/profile/')
+        with self.captureOnCommitCallbacks(execute=True):
+            update_last_login(None, self.user)
+        self.assertTrue(self.cached())
+
+    def test_deactivation_applies_immediately(self):
+        self.client.get('/auth/profile/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertFalse(self.cached())
+        self.assertEqual(self.client.get('/auth/profile/').status_code, 401)
+
+    def test_logout_forgets_the_token(self):
+        self.client.get('/auth/profile/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post('/auth/logout/').status_code, 200)
+        self.assertFalse(self.cached())
+        self.assertEqual(self.client.get('/auth/profile/').status_code, 401)
+
+    def test_token_deleted_elsewhere_expires_with_the_local_ttl(self):
+        self.assertEqual(self.client.get('/auth/profile/').status_code, 200)
+        # As if deleted by another process: its invalidation doesn't reach this one's caches
+        Token.objects.filter(pk=self.token.pk)._raw_delete(Token.objects.db)
+        self.assertEqual(self.client.get('/auth/profile/').status_code, 200)
+
+        later = max(settings.TOKEN_CACHE_TTL, settings.TOKEN_CACHE_LOCAL_TTL) + 1
+        now, monotonic = time.time(), time.monotonic()
+        with mock.patch('time.time', return_value=now + later), \
+                mock.patch('time.monotonic', return_value=monotonic + later):
+            self.assertEqual(self.client.get('/auth/profile/').status_code, 401)
+
+    def test_tokens_are_primed_only_into_a_shared_cache(self):
+        self.assertEqual(authentication.prime(10), 0)
+        self.assertFalse(self.cached())
+        with override_settings(CACHE_SHARED=True):
+            self.assertEqual(authentication.prime(10), 1)
+        self.assertTrue(self.cached())
+
+    def test_ttl_is_short_without_a_shared_cache(self):
+        script = 'from rockman_logistics import settings; print(settings.TOKEN_CACHE_TTL)'
+        environ = {key: value for key, value in os.environ.items()
+                   if key not in ('REDIS_URL', 'TOKEN_CACHE_TTL')}
+
+        def load(**env):
+            return subprocess.run([sys.executable, '-c', script], env={**environ, **env}, cwd=settings.BASE_DIR,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+
+        self.assertEqual(load(), '5')
+        self.assertEqual(load(REDIS_URL='redis://localhost:6379/0'), '300')
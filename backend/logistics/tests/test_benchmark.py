@@ -0,0 +1,72 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.management import CommandError, call_command
+from django.db.models import Sum
+from django.test import TestCase
+
+from logistics import benchmark
+from logistics.models import Customer, DailyCategoryStats, GoodsCategory, Receipt, ReceiptItem, Shipment
+from logistics.urls import router
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.created = benchmark.generate(customers=20, receipts=60, items_per_receipt=3, shipments=40, categories=4,
+                                         days=30, batch_size=7, build_search_index=True)
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir, ignore_errors=True)
+
+    def test_dataset(self):
+        self.assertEqual(self.created['customers'], Customer.objects.count())
+        self.assertEqual(self.created['receipts'], Receipt.objects.count())
+        self.assertEqual(self.created['receipt_items'], ReceiptItem.objects.count())
+        self.assertEqual(GoodsCategory.objects.count(), 4)
+        self.assertEqual(Shipment.objects.count(), 40)
+        self.assertGreater(Shipment.objects.values('status').distinct().count(), 1)
+        # Totals are written with the bulk inserts, and the rollups rebuilt after them
+        for receipt in Receipt.objects.annotate(items_total=Sum('items__total_price')):
+            self.assertEqual(receipt.total_amount, receipt.items_total or 0)
+        self.assertTrue(DailyCategoryStats.objects.exists())
+
+    def test_every_router_endpoint_is_measured_and_answers(self):
+        cases = dict(benchmark.endpoints())
+        for prefix, _, _ in router.registry:
+            self.assertIn(f'{prefix} list', cases)
+        report = benchmark.run(requests=1, warmup=0)
+        failed = [(result['name'], result['status']) for result in report['results'] if result['status'] >= 400]
+        self.assertEqual(failed, [])
+        self.assertEqual(report['meta']['dataset']['logistics_receipt'], 60)
+
+    def test_command_saves_json_and_compares(self):
+        output = os.path.join(self.output_dir, 'run.json')
+        call_command('benchmark', '--only', 'receipts detail', '--requests', '2', '--warmup', '0', '--output', output,
+                     stdout=open(os.devnull, 'w'))
+        report = benchmark.load(output)
+        self.assertEqual([result['name'] for result in report['results']], ['receipts detail'])
+        result = report['results'][0]
+        self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+
+        # Against a baseline that made no queries, this run is a regression
+        result['queries'] = 0
+        baseline = os.path.join(self.output_dir, 'baseline.json')
+        with open(baseline, 'w') as f:
+            json.dump(report, f)
+        with self.assertRaisesMessage(CommandError, '1 endpoint(s) regressed'):
+            call_command('benchmark', '--only', 'receipts detail', '--requests', '2', '--warmup', '0',
+                         '--output', output, '--compare', baseline, '--fail-on-regression',
+                         stdout=open(os.devnull, 'w'))
+
+    def test_compare(self):
+        def report(p95, queries):
+            return {'meta': {}, 'results': [{'name': 'receipts list', 'p95_ms': p95, 'queries': queries}]}
+
+        self.assertFalse(benchmark.compare(report(10, 3), report(11, 3))[0][3])
+        self.assertFalse(benchmark.compare(report(1, 3), report(2, 3))[0][3])  # within min_ms
+        self.assertTrue(benchmark.compare(report(10, 3), report(20, 3))[0][3])
+        self.assertTrue(benchmark.compare(report(10, 3), report(10, 4))[0][3])
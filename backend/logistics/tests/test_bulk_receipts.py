@@ -0,0 +1,65 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from logistics.models import Customer, GoodsCategory, Receipt, ReceiptItem, Staff
+
+
+class BulkReceiptTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('admin', password='p')
+        Staff.objects.create(user=self.user, role='admin')
+        self.client.force_authenticate(self.user)
+        # The category registry picks the new category up once its version bump commits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category = GoodsCategory.objects.create(name='Furniture', unit_price=Decimal('10'))
+        self.customer = Customer.objects.create(company_name='Acme')
+
+    def receipt(self, lines):
+        return {'customer': self.customer.pk, 'payment_status': 'pending',
+                'items': [{'category': self.category.pk, 'description': f'box {n}', 'cbm': '1.255'}
+                          for n in range(lines)]}
+
+    def test_create_prices_items_and_total(self):
+        response = self.client.post('/receipts/', {
+            'customer': self.customer.pk,
+            'items': [{'category': self.category.pk, 'description': 'sofa', 'cbm': '1.255'},
+                      {'description': 'crate', 'cbm': '2', 'unit_price': '7.50'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual([item['total_price'] for item in response.data['items']], ['12.55', '15.00'])
+        receipt = Receipt.objects.get(pk=response.data['id'])
+        self.assertEqual(receipt.total_amount, Decimal('27.55'))
+        self.assertEqual(receipt.items.get(description='sofa').unit_price, Decimal('10'))
+
+    def test_bulk_creates_receipts_with_items(self):
+        response = self.client.post('/receipts/bulk/', [self.receipt(2), self.receipt(3)], format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual([len(receipt['items']) for receipt in response.data], [2, 3])
+        self.assertEqual(len({receipt['receipt_number'] for receipt in response.data}), 2)
+        totals = dict(Receipt.objects.values_list('pk', 'total_amount'))
+        self.assertEqual([totals[receipt['id']] for receipt in response.data], [Decimal('25.10'), Decimal('37.65')])
+        self.assertEqual(ReceiptItem.objects.count(), 5)
+
+    def test_bulk_queries_do_not_grow_with_receipts_or_lines(self):
+        def inserts(receipts, lines):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post('/receipts/bulk/', [self.receipt(lines) for _ in range(receipts)],
+                                            format='json')
+            self.assertEqual(response.status_code, 201, response.data)
+            return len(queries), len([q for q in queries if 'INSERT INTO "logistics_receiptitem"' in q['sql']])
+
+        inserts(1, 1)  # loads the category registry and creates today's receipt counter
+        self.assertEqual(inserts(1, 1), inserts(10, 30))
+
+    def test_bulk_rejects_bad_payloads(self):
+        self.assertEqual(self.client.post('/receipts/bulk/', [], format='json').status_code, 400)
+        self.assertEqual(self.client.post('/receipts/bulk/', self.receipt(1), format='json').status_code, 400)
+        too_many = [self.receipt(0)] * 501
+        self.assertEqual(self.client.post('/receipts/bulk/', too_many, format='json').status_code, 400)
+        invalid = [self.receipt(1), {'customer': 0}]
+        self.assertEqual(self.client.post('/receipts/bulk/', invalid, format='json').status_code, 400)
+        self.assertFalse(Receipt.objects.exists())
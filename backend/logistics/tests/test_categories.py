@@ -0,0 +1,64 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from logistics import categories
+from logistics.models import GoodsCategory, Staff
+
+
+class CategoryRegistryTests(APITestCase):
+    def setUp(self):
+        cache.delete(categories.VERSION_KEY)
+        user = User.objects.create_user('admin', password='p')
+        Staff.objects.create(user=user, role='admin')
+        self.client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category = GoodsCategory.objects.create(name='Furniture', unit_price=Decimal('10'))
+
+    def test_reads_need_no_queries_once_loaded(self):
+        categories.get_categories()
+        with self.assertNumQueries(0):
+            self.assertEqual(categories.get_category(self.category.pk).unit_price, Decimal('10'))
+
+    def test_write_in_this_process_shows_immediately(self):
+        categories.get_categories()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/categories/{self.category.pk}/', {'unit_price': '12.50'})
+        self.assertEqual(categories.get_category(self.category.pk).unit_price, Decimal('12.50'))
+
+    def test_write_in_another_process_shows_once_the_version_expires(self):
+        categories.get_categories()
+        # As another process or the job worker would write it: no signal reaches this process
+        GoodsCategory.objects.filter(pk=self.category.pk).update(unit_price=Decimal('15'), updated_at=timezone.now())
+        self.assertEqual(categories.get_category(self.category.pk).unit_price, Decimal('10'))
+        cache.delete(categories.VERSION_KEY)  # CATEGORY_VERSION_TTL passing
+        self.assertEqual(categories.get_category(self.category.pk).unit_price, Decimal('15'))
+
+    @override_settings(CATEGORY_VERSION_TTL=0)
+    def test_version_follows_the_table(self):
+        version = categories.current_version()
+        self.assertEqual(categories.current_version(), version)
+        GoodsCategory.objects.create(name='Tiles', unit_price=Decimal('3'))
+        self.assertNotEqual(categories.current_version(), version)
+
+    @override_settings(CACHE_SHARED=True)
+    def test_shared_cache_keeps_a_token_until_bumped(self):
+        version = categories.current_version()
+        GoodsCategory.objects.filter(pk=self.category.pk).update(unit_price=Decimal('15'), updated_at=timezone.now())
+        self.assertEqual(categories.current_version(), version)
+        with self.captureOnCommitCallbacks(execute=True):
+            categories.bump_version()
+        self.assertNotEqual(categories.current_version(), version)
+
+    def test_list_etag(self):
+        response = self.client.get('/categories/')
+        self.assertEqual([category['name'] for category in response.data], ['Furniture'])
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/categories/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/categories/{self.category.pk}/', {'unit_price': '11'})
+        self.assertEqual(self.client.get('/categories/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
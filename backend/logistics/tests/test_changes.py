@@ -0,0 +1,137 @@
+import asyncio
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import InterfaceError, transaction
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from logistics import changes
+from logistics.models import Change, Customer, Shipment
+
+# Far past the ids the sequence hands out, so the entries made here control the gaps
+BASE = 10 ** 9
+
+
+class ChangeLogTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('clerk'))
+        Change.objects.all().delete()
+
+    def add(self, offset, age=0, kind='shipment'):
+        return Change.objects.create(pk=BASE + offset, kind=kind, object_id=offset, action='updated',
+                                     created_at=timezone.now() - timedelta(seconds=age))
+
+    def settled(self):
+        return settings.CHANGES_GAP_SECONDS + 1
+
+    def ids(self, entries):
+        return [change.pk - BASE for change in entries]
+
+    def test_read_holds_back_at_a_recent_gap(self):
+        for offset in (1, 2):
+            self.add(offset, age=self.settled())
+        gap_after = self.add(4)
+        entries, cursor, more = changes.read(BASE)
+        self.assertEqual((self.ids(entries), cursor, more), ([1, 2], BASE + 2, False))
+
+        Change.objects.filter(pk=gap_after.pk).update(created_at=timezone.now() - timedelta(seconds=self.settled()))
+        entries, cursor, more = changes.read(BASE)
+        self.assertEqual((self.ids(entries), cursor, more), ([1, 2, 4], BASE + 4, False))
+
+        entries, cursor, more = changes.read(BASE, limit=2)
+        self.assertEqual((self.ids(entries), cursor, more), ([1, 2], BASE + 2, True))
+
+    def test_latest_cursor(self):
+        self.assertEqual(changes.latest_cursor(), 0)
+        for offset in (1, 2):
+            self.add(offset, age=self.settled())
+        self.add(4)
+        self.assertEqual(changes.latest_cursor(), BASE + 2)
+        self.add(3)
+        self.assertEqual(changes.latest_cursor(), BASE + 4)
+
+    def test_expired_and_prune(self):
+        for offset in (1, 2, 3):
+            self.add(offset, age=3600)
+        self.assertEqual(changes.prune(timezone.now()), 2)
+        self.assertEqual(self.ids(Change.objects.all()), [3])
+        self.assertEqual(changes.prune(timezone.now()), 0)
+
+        self.assertTrue(changes.expired(BASE + 1))
+        self.assertFalse(changes.expired(BASE + 2))
+        self.assertFalse(changes.expired(0))
+
+    def test_entries_are_written_after_commit_only(self):
+        customer = Customer.objects.create(company_name='Acme')
+        with self.captureOnCommitCallbacks() as callbacks:
+            shipment = Shipment.objects.create(tracking_number='T1', customer=customer, origin='A',
+                                               destination='B', weight=1)
+            changes.record_ids('shipment', [shipment.pk])
+        self.assertFalse(Change.objects.exists())
+        for callback in callbacks:
+            callback()
+        self.assertEqual(list(Change.objects.values_list('object_id', 'action', 'data')),
+                         [(shipment.pk, 'created', {'tracking_number': 'T1', 'status': 'pending',
+                                                    'customer': customer.pk}),
+                          (shipment.pk, 'updated', {'tracking_number': 'T1', 'status': 'pending',
+                                                    'customer': customer.pk})])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                Shipment.objects.create(tracking_number='T2', customer=customer, origin='A', destination='B',
+                                        weight=1)
+                transaction.set_rollback(True)
+        self.assertEqual(Change.objects.count(), 2)
+
+    def test_list_endpoint(self):
+        self.add(1, age=self.settled())
+        self.add(2, age=self.settled(), kind='receipt')
+        response = self.client.get('/changes/')
+        self.assertEqual((response.status_code, response.data['cursor'], response.data['results']),
+                         (200, BASE + 2, []))
+
+        response = self.client.get(f'/changes/?since={BASE}&kinds=receipt')
+        self.assertEqual([row['id'] for row in response.data['results']], [BASE + 2])
+        self.assertEqual((response.data['cursor'], response.data['has_more']), (BASE + 2, False))
+        response = self.client.get(f'/changes/?since={BASE}&limit=1')
+        self.assertEqual((response.data['cursor'], response.data['has_more']), (BASE + 1, True))
+
+        Change.objects.filter(pk=BASE + 1).delete()
+        self.add(3, age=self.settled())
+        changes.prune(timezone.now())
+        self.assertEqual(self.client.get(f'/changes/?since={BASE}').status_code, 410)
+        for query in ('since=x', 'since=1&kinds=nope', 'since=1&limit=0'):
+            self.assertEqual(self.client.get(f'/changes/?{query}').status_code, 400, query)
+
+
+@override_settings(CHANGES_LISTEN=False, CHANGES_POLL_INTERVAL=0.01)
+class NotifierTests(SimpleTestCase):
+    def test_recovers_after_the_connection_is_lost(self):
+        notifier = changes.Notifier()
+        reads = []
+
+        def read(since):
+            reads.append(since)
+            if len(reads) == 1:
+                raise InterfaceError('connection already closed')
+            notifier.subscribers.clear()
+            return [], since, False
+
+        async def run():
+            queue = asyncio.Queue()
+            notifier.subscribers.add(queue)
+            notifier.wakeup = asyncio.Event()
+            await asyncio.wait_for(notifier.run(), 5)
+
+        with mock.patch.object(changes, 'latest_cursor', return_value=7), \
+                mock.patch.object(changes, 'read', side_effect=read), \
+                mock.patch.object(changes, 'close_old_connections') as close_old_connections, \
+                self.assertLogs('logistics.changes', 'ERROR'):
+            asyncio.run(run())
+        self.assertEqual(reads, [7, 7])
+        # Before each read, and again after the failed one
+        self.assertEqual(close_old_connections.call_count, 3)
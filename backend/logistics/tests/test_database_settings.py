@@ -0,0 +1,33 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+SCRIPT = '''
+import json
+from rockman_logistics import settings
+database = settings.DATABASES['default']
+print(json.dumps([settings.DB_PGBOUNCER, database['CONN_MAX_AGE'], database.get('DISABLE_SERVER_SIDE_CURSORS', False),
+                  settings.CHANGES_LISTEN]))
+'''
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+    def load(self, url, **env):
+        environ = {key: value for key, value in os.environ.items() if not key.startswith(('DB_', 'CHANGES_'))}
+        environ.update(SUPABASE_DATABASE_URL=url, **env)
+        output = subprocess.run([sys.executable, '-c', SCRIPT], env=environ, cwd=settings.BASE_DIR,
+                                capture_output=True, text=True, check=True).stdout
+        return json.loads(output)
+
+    def test_connections_are_reused(self):
+        self.assertEqual(self.load('postgresql://u:p@db.example.supabase.co:5432/postgres'), [False, 60, False, True])
+
+    def test_transaction_pooler_is_detected(self):
+        self.assertEqual(self.load('postgresql://u:p@aws-0-eu-west-2.pooler.supabase.com:6543/postgres'),
+                         [True, 60, True, False])
+        self.assertEqual(self.load('postgresql://u:p@aws-0-eu-west-2.pooler.supabase.com:6543/postgres',
+                                   DB_PGBOUNCER='False'), [False, 60, False, True])
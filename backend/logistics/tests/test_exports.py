@@ -0,0 +1,57 @@
+import csv
+import io
+import zipfile
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import AsyncClient
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from logistics.models import Customer, GoodsCategory, Receipt, ReceiptItem, Staff
+
+
+class ReceiptExportTests(APITestCase):
+    def setUp(self):
+        user = User.objects.create_user('admin', password='p')
+        Staff.objects.create(user=user, role='admin')
+        self.token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        category = GoodsCategory.objects.create(name='Furniture', unit_price=Decimal('10'))
+        customer = Customer.objects.create(company_name='Acme 贸易')
+        self.receipt = Receipt.objects.create(customer=customer, created_by=user, container_number='MSKU1234567')
+        ReceiptItem.objects.create(receipt=self.receipt, category=category, description='sofa', cbm=Decimal('1.5'))
+        ReceiptItem.objects.create(receipt=self.receipt, description='crate', cbm=2, unit_price=Decimal('4'))
+        Receipt.objects.create(customer=customer, created_by=user)
+
+    def csv_rows(self, content):
+        return list(csv.reader(io.StringIO(content.decode('utf-8-sig'))))
+
+    def test_csv_has_a_row_per_item(self):
+        response = self.client.get('/receipts/export/csv/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('attachment; filename="receipts-', response['Content-Disposition'])
+        rows = self.csv_rows(b''.join(response.streaming_content))
+        self.assertEqual(rows[0][0], 'Receipt number')
+        self.assertEqual([(row[3], row[8], row[12]) for row in rows[1:3]],
+                         [('Acme 贸易', 'sofa', '15.00'), ('Acme 贸易', 'crate', '8.00')])
+        self.assertEqual(len(rows), 4)  # the receipt without items still gets a row
+
+    def test_xlsx_is_a_workbook(self):
+        response = self.client.get('/receipts/export/xlsx/')
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(archive.testzip())
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertIn('MSKU1234567', sheet)
+        self.assertEqual(sheet.count('<row>'), 4)
+
+    def test_invalid_dates_are_rejected(self):
+        self.assertEqual(self.client.get('/receipts/export/csv/', {'date_from': 'yesterday'}).status_code, 400)
+
+    async def test_asgi_export_streams_asynchronously(self):
+        response = await AsyncClient().get('/receipts/export/csv/', headers={'Authorization': f'Token {self.token.key}'})
+        self.assertEqual(response.status_code, 200)
+        # A sync iterator would be read to the end before the first byte is sent
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(self.csv_rows(content)), 4)
@@ -0,0 +1,114 @@
+import io
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from logistics import imports, tracking
+from logistics.models import Customer, GoodsCategory, Receipt, ReceiptItem, Shipment, ShipmentEvent, Staff
+
+HEADER = ('customer_code,company_name,tracking_number,origin,destination,weight,'
+          'receipt_number,container_number,category,item_description,cbm,unit_price\n')
+
+
+class ManifestImportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('admin', password='p')
+        Staff.objects.create(user=self.user, role='admin')
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            GoodsCategory.objects.create(name='Furniture', unit_price=Decimal('10'))
+        self.today = timezone.now().strftime('%Y%m%d')
+
+    def manifest(self, *rows):
+        return HEADER + ''.join(row + '\n' for row in rows)
+
+    def run_import(self, text, **kwargs):
+        return imports.import_manifest(io.StringIO(text), created_by=self.user, **kwargs)
+
+    def sample(self):
+        return self.manifest(
+            f'CUST200,Acme,TRK1,Guangzhou,Accra,5,RCP-{self.today}-050,MSKU1,Furniture,sofa,1.5,',
+            f'CUST200,Acme,TRK1,,,,RCP-{self.today}-050,MSKU1,,crate,2,4',
+            ',Beta Ltd,,,,,R-OTHER,,,box,1,3',
+        )
+
+    def test_imports_customers_shipments_and_items(self):
+        summary = self.run_import(self.sample()).as_dict()
+        self.assertEqual((summary['imported'], summary['error_count']), (3, 0))
+        self.assertEqual(Customer.objects.count(), 2)
+        self.assertEqual(Shipment.objects.get().tracking_number, 'TRK1')
+        receipt = Receipt.objects.get(receipt_number=f'RCP-{self.today}-050')
+        self.assertEqual(receipt.total_amount, Decimal('23.00'))
+        self.assertEqual(receipt.items.count(), 2)
+
+    def test_reimport_replaces_items(self):
+        self.run_import(self.sample())
+        self.run_import(self.sample())
+        self.assertEqual(ReceiptItem.objects.count(), 3)
+        self.assertEqual(Receipt.objects.get(receipt_number=f'RCP-{self.today}-050').total_amount, Decimal('23.00'))
+
+    def test_generated_numbers_skip_imported_ones(self):
+        Customer.objects.create(company_name='Existing')
+        Receipt.objects.create(customer=Customer.objects.get())
+        self.run_import(self.sample())
+        self.assertEqual(Customer.objects.create(company_name='New').customer_code, 'CUST201')
+        customer = Customer.objects.get(customer_code='CUST200')
+        self.assertEqual(Receipt.objects.create(customer=customer).receipt_number, f'RCP-{self.today}-051')
+
+    def test_dry_run_changes_nothing(self):
+        summary = self.run_import(self.sample(), dry_run=True).as_dict()
+        self.assertEqual(summary['imported'], 3)
+        self.assertFalse(Customer.objects.exists())
+        self.assertFalse(Receipt.objects.exists())
+
+    def test_bad_rows_are_reported_and_skipped(self):
+        summary = self.run_import(self.manifest(
+            'CUST1,Acme,TRK9,,,,,,,,,',
+            'CUST1,Acme,,,,,R1,,Nope,box,1,',
+            'CUST1,Acme,,,,,R2,,,box,x,',
+            'CUST1,Acme,,,,,R3,,,box,1,2',
+        )).as_dict()
+        self.assertEqual(sorted(error['line'] for error in summary['errors']), [2, 3, 4])
+        self.assertEqual(list(Receipt.objects.values_list('receipt_number', flat=True)), ['R3'])
+
+    def test_import_refreshes_cached_tracking_lookups(self):
+        cache.clear()
+        tracking.local_cache.clear()
+        self.assertIsNone(tracking.lookup('TRK1'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.run_import(self.sample())
+        self.assertEqual(tracking.lookup('TRK1')['customer_name'], 'Acme')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.run_import(self.manifest('CUST200,Acme Trading,,,,,,,,,,'))
+        self.assertEqual(tracking.lookup('TRK1')['customer_name'], 'Acme Trading')
+
+    def test_status_changes_follow_the_state_machine_and_are_logged(self):
+        header = 'customer_code,company_name,tracking_number,origin,destination,weight,status\n'
+        summary = self.run_import(header + 'C1,Acme,T1,A,B,1,\nC1,Acme,T2,A,B,1,delivered\n'
+                                  'C1,Acme,T1,,,,in_transit\n').as_dict()
+        self.assertEqual(summary['error_count'], 0, summary['errors'])
+        self.assertIsNotNone(Shipment.objects.get(tracking_number='T1').shipped_date)
+        self.assertEqual(list(ShipmentEvent.objects.order_by('pk').values_list(
+            'shipment__tracking_number', 'from_status', 'to_status', 'created_by')),
+            [('T1', '', 'pending', self.user.pk), ('T2', '', 'delivered', self.user.pk),
+             ('T1', 'pending', 'in_transit', self.user.pk)])
+
+        summary = self.run_import(header + 'C1,Acme,T2,,,,pending\nC1,Acme,T1,,,,delivered\n').as_dict()
+        self.assertEqual([error['line'] for error in summary['errors']], [2])
+        self.assertIn('cannot change from delivered to pending', summary['errors'][0]['error'])
+        self.assertEqual(dict(Shipment.objects.values_list('tracking_number', 'status')),
+                         {'T1': 'delivered', 'T2': 'delivered'})
+        self.assertEqual(ShipmentEvent.objects.filter(to_status='delivered').count(), 2)
+        self.assertFalse(ShipmentEvent.objects.filter(to_status='pending', from_status='delivered').exists())
+
+    def test_upload_endpoint(self):
+        upload = SimpleUploadedFile('manifest.csv', self.sample().encode('utf-8-sig'), content_type='text/csv')
+        response = self.client.post('/import/manifest/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['items_created'], 3)
+        self.assertEqual(self.client.post('/import/manifest/', {}, format='multipart').status_code, 400)
@@ -0,0 +1,31 @@
+from django.db import connection
+from django.test import TestCase
+
+from logistics.models import Receipt, ReceiptItem, Shipment
+
+
+class IndexTests(TestCase):
+    def indexes(self, model):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+        return {name: info['columns'] for name, info in constraints.items()
+                if info['index'] and not info['unique'] and not info['primary_key']}
+
+    def test_hot_path_indexes_exist(self):
+        self.assertEqual(self.indexes(Receipt)['receipt_cust_pay_issued'], ['customer_id', 'payment_status', 'issue_date'])
+        self.assertEqual(self.indexes(Shipment)['shipment_cust_status_created'], ['customer_id', 'status', 'created_at'])
+
+    def test_receipt_items_have_one_index_by_receipt(self):
+        by_receipt = {name: columns for name, columns in self.indexes(ReceiptItem).items()
+                      if columns[0] == 'receipt_id'}
+        self.assertEqual(by_receipt, {'receiptitem_receipt_id': ['receipt_id', 'id']})
+
+    def test_receipt_items_by_receipt_use_the_composite_index(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('EXPLAIN output is PostgreSQL specific')
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('EXPLAIN SELECT * FROM logistics_receiptitem WHERE receipt_id = 1 ORDER BY id')
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        self.assertIn('receiptitem_receipt_id', plan)
+        self.assertNotIn('Sort', plan)
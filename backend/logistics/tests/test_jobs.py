@@ -0,0 +1,108 @@
+import io
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from logistics import jobs
+from logistics.models import Customer, GoodsCategory, Job, JobFile, Receipt, ReceiptItem, Shipment, Staff
+
+
+def run_next():
+    """Claim and run the next due job, as a worker does (work() closes the test's connection)"""
+    job = jobs.claim('test')
+    return job and jobs.run_job(job, 'test')
+
+
+class JobTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('admin', password='p')
+        Staff.objects.create(user=self.user, role='admin')
+        self.client.force_authenticate(self.user)
+        category = GoodsCategory.objects.create(name='Furniture', unit_price=Decimal('10'))
+        customer = Customer.objects.create(company_name='Acme')
+        receipt = Receipt.objects.create(customer=customer, created_by=self.user)
+        ReceiptItem.objects.create(receipt=receipt, category=category, description='sofa', cbm=1)
+
+    def test_job_types_must_implement_run(self):
+        class Incomplete(jobs.JobType):
+            name = 'incomplete'
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+    def test_export_output_is_served_from_the_database(self):
+        response = self.client.post('/jobs/', {'kind': 'export_receipts', 'params': {'file_format': 'csv'}},
+                                    format='json')
+        self.assertEqual(response.status_code, 202)
+        job = run_next()
+        self.assertEqual(job.pk, response.data['id'])
+        self.assertEqual(job.status, 'succeeded')
+        self.assertEqual(job.files.get().name, 'receipts.csv')
+
+        download = self.client.get(f'/jobs/{job.pk}/download/')
+        self.assertEqual(download.status_code, 200)
+        self.assertEqual(download['Content-Disposition'], 'attachment; filename="receipts.csv"')
+        self.assertIn('sofa', b''.join(download.streaming_content).decode('utf-8-sig'))
+
+    def test_large_outputs_are_stored_in_parts(self):
+        job = jobs.enqueue('export_receipts', {'file_format': 'csv'})
+        with mock.patch.object(jobs, 'FILE_PART_SIZE', 16):
+            job = run_next()
+        self.assertEqual(job.status, 'succeeded')
+        parts = list(job.files.order_by('part').values_list('part', 'size'))
+        self.assertEqual([part for part, _ in parts], list(range(len(parts))))
+        self.assertTrue(all(size == 16 for _, size in parts[:-1]))
+        self.assertEqual(sum(size for _, size in parts), job.result['bytes'])
+        content = jobs.read_file(job, 'receipts.csv')
+        self.assertEqual(len(content), job.result['bytes'])
+        self.assertIn('sofa', content.decode('utf-8-sig'))
+
+        self.assertEqual(jobs.save_file(job, 'receipts.csv', b'short'), 5)
+        self.assertEqual(list(job.files.values_list('part', flat=True)), [0])
+        self.assertEqual(jobs.read_file(job, 'receipts.csv'), b'short')
+
+    def test_malformed_requests_are_refused(self):
+        for body in ([{'kind': 'export_receipts'}], {'kind': []}, {'kind': 'import_manifest'},
+                     {'kind': 'export_receipts', 'params': ['csv']}):
+            response = self.client.post('/jobs/', body, format='json')
+            self.assertEqual(response.status_code, 400, body)
+        self.assertFalse(Job.objects.exists())
+
+    def test_download_without_a_file(self):
+        job = jobs.enqueue('reconcile_totals', {}, created_by=self.user)
+        self.assertEqual(self.client.get(f'/jobs/{job.pk}/download/').status_code, 404)
+
+    def test_background_import_reads_the_stored_upload_and_drops_it(self):
+        upload = io.BytesIO(b'company_name,tracking_number,origin,destination,weight\nUp Co,TUP1,A,B,3\n')
+        upload.name = 'manifest.csv'
+        response = self.client.post('/import/manifest/?background=1', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 202)
+        job = Job.objects.get(pk=response.data['id'])
+        self.assertTrue(job.files.get(name=jobs.MANIFEST_FILE).is_input)
+
+        job = run_next()
+        self.assertEqual(job.status, 'succeeded')
+        self.assertTrue(Shipment.objects.filter(tracking_number='TUP1').exists())
+        self.assertFalse(job.files.exists())
+
+    def test_inputs_are_kept_for_a_retry(self):
+        job = jobs.enqueue('reconcile_totals', {}, files={'input.txt': b'data'})
+        with mock.patch.object(jobs.ReconcileTotalsJob, 'run', side_effect=RuntimeError('boom')):
+            job = run_next()
+        self.assertEqual(job.status, 'queued')
+        self.assertEqual(jobs.read_file(job, 'input.txt'), b'data')
+
+    def test_files_of_old_jobs_are_pruned(self):
+        old = jobs.enqueue('reconcile_totals', {})
+        recent = jobs.enqueue('reconcile_totals', {})
+        for job in (old, recent):
+            jobs.save_file(job, 'out.csv', b'x')
+        Job.objects.filter(pk=old.pk).update(status='succeeded', finished_at=timezone.now() - timedelta(days=8))
+        Job.objects.filter(pk=recent.pk).update(status='succeeded', finished_at=timezone.now())
+
+        self.assertEqual(jobs.prune_files(timezone.now() - timedelta(days=7)), 1)
+        self.assertEqual(list(JobFile.objects.values_list('job', flat=True)), [recent.pk])
@@ -0,0 +1,70 @@
+import random
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase
+from rest_framework.test import APITestCase
+
+from logistics import loadplan
+from logistics.models import Customer, GoodsCategory, Receipt, ReceiptItem, Staff
+
+
+class FirstFitDecreasingTests(SimpleTestCase):
+    def test_matches_naive_first_fit_decreasing(self):
+        rng = random.Random(1)
+        sizes = [rng.randint(1, 50) for _ in range(300)]
+        naive = []
+        for index in sorted(range(len(sizes)), key=lambda index: -sizes[index]):
+            for load in naive:
+                if load[0] + sizes[index] <= 100:
+                    load[0] += sizes[index]
+                    load[1].append(index)
+                    break
+            else:
+                naive.append([sizes[index], [index]])
+        self.assertEqual(loadplan.first_fit_decreasing(sizes, 100), ([load[1] for load in naive], []))
+
+    def test_oversized_and_empty(self):
+        self.assertEqual(loadplan.first_fit_decreasing([5, 120], 100), ([[0]], [1]))
+        self.assertEqual(loadplan.first_fit_decreasing([], 10), ([], []))
+
+
+class ContainerViewTests(APITestCase):
+    def setUp(self):
+        user = User.objects.create_user('admin', password='p')
+        Staff.objects.create(user=user, role='admin')
+        self.client.force_authenticate(user)
+        self.customer = Customer.objects.create(company_name='Acme')
+        category = GoodsCategory.objects.create(name='Furniture', unit_price=Decimal('10'))
+        with self.captureOnCommitCallbacks(execute=True):
+            for cbm, container in [(20, ''), (30, ''), (10, ''), (80, ''), (5, 'C1'), (7, 'C1'), (40, 'C2'), (1, 'C3')]:
+                receipt = Receipt.objects.create(customer=self.customer, container_number=container)
+                ReceiptItem.objects.create(receipt=receipt, category=category, description='crate', cbm=cbm)
+
+    def test_fill_is_paged_and_relative_to_the_chosen_type(self):
+        response = self.client.get('/containers/fill/?page_size=2')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['container_type'], data['capacity_cbm']), ('40hc', 68))
+        self.assertIn('40hc', data['fill_ratio_basis'])
+        self.assertEqual([(row['container_number'], row['receipts'], row['fill_ratio']) for row in data['results']],
+                         [('C1', 2, round(12 / 68, 4)), ('C2', 1, round(40 / 68, 4))])
+
+        with self.assertNumQueries(2):
+            data = self.client.get(data['next']).json()
+        self.assertEqual([row['container_number'] for row in data['results']], ['C3'])
+        self.assertIsNone(data['next'])
+
+        data = self.client.get('/containers/fill/?type=20ft&page_size=1').json()
+        self.assertEqual(data['results'][0]['fill_ratio'], round(12 / 28, 4))
+        self.assertEqual(self.client.get('/containers/fill/?type=53ft').status_code, 400)
+
+    def test_plan(self):
+        data = self.client.get('/containers/plan/').json()
+        self.assertEqual(data['summary']['containers'], 1)
+        self.assertEqual(data['containers'][0]['container_type'], '40hc')
+        self.assertEqual(len(data['oversized']), 1)
+        data = self.client.get('/containers/plan/?types=20ft,40ft').json()
+        self.assertEqual([container['container_type'] for container in data['containers']], ['40ft', '20ft'])
+        self.assertEqual(self.client.get('/containers/plan/?types=53ft').status_code, 400)
+        self.assertEqual(self.client.get(f'/containers/plan/?customer={self.customer.pk + 1}').json()['summary']['containers'], 0)
@@ -0,0 +1,62 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.test import APITestCase
+
+from logistics import metrics
+from logistics.models import Customer, GoodsCategory, Receipt, ReceiptItem, Staff
+
+
+class FingerprintTests(TestCase):
+    def test_literals_and_in_lists_are_normalised(self):
+        self.assertEqual(metrics.fingerprint("SELECT * FROM t WHERE a = 'x''y' AND b = 12 AND c IN (%s, %s, %s)"),
+                         'SELECT * FROM t WHERE a = ? AND b = ? AND c IN (%s, ...)')
+        self.assertEqual(metrics.fingerprint('SELECT 1\n  FROM t WHERE id IN (%s, %s)'),
+                         metrics.fingerprint('SELECT 2 FROM t WHERE id IN (%s, %s, %s, %s)'))
+
+    def test_exact_repeats_are_counted_as_duplicates(self):
+        with metrics.profiling() as profile:
+            for pk in (1, 1, 2):
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT %s', [pk])
+        self.assertEqual(profile.query_count, 3)
+        self.assertEqual(profile.duplicate_queries, 1)
+        self.assertEqual([entry[0] for _, entry in profile.repeated_fingerprints(3)], [3])
+
+
+class RequestInstrumentationTests(APITestCase):
+    def setUp(self):
+        user = User.objects.create_user('admin', password='p')
+        Staff.objects.create(user=user, role='admin')
+        self.client.force_authenticate(user)
+        category = GoodsCategory.objects.create(name='Furniture', unit_price=Decimal('10'))
+        receipt = Receipt.objects.create(customer=Customer.objects.create(company_name='Acme'), created_by=user)
+        ReceiptItem.objects.create(receipt=receipt, category=category, description='sofa', cbm=1)
+
+    def test_server_timing(self):
+        timing = self.client.get('/receipts/')['Server-Timing']
+        self.assertRegex(timing, r'app;dur=[\d.]+')
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries, \d+ duplicate"')
+        self.assertIn('serialize;dur=', timing)
+
+    @override_settings(PERF_SLOW_REQUEST_MS=0, PERF_REPEATED_QUERY_THRESHOLD=1)
+    def test_slow_requests_are_logged_with_their_sql(self):
+        with self.assertLogs('logistics.middleware', 'WARNING') as logs:
+            self.client.get('/receipts/')
+        output = '\n'.join(logs.output)
+        self.assertIn('Slow request: GET /receipts/ -> 200', output)
+        self.assertIn('SELECT ... FROM "logistics_receipt"', output)
+        self.assertIn('Repeated queries (N+1?) in GET /receipts/', output)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_need_the_token(self):
+        self.client.get('/receipts/')
+        self.assertEqual(self.client.get('/metrics/').status_code, 401)
+        response = self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('# TYPE http_requests_total counter', body)
+        self.assertRegex(body, r'http_requests_total\{method="GET",view="receipt-list",status="200"\} \d+')
+        self.assertIn('http_request_db_queries_bucket{view="receipt-list",le="+Inf"}', body)
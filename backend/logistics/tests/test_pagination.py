@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from logistics.models import Customer, Shipment, Staff
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        user = User.objects.create_user('admin', password='p')
+        Staff.objects.create(user=user, role='admin')
+        self.client.force_authenticate(user)
+        customer = Customer.objects.create(company_name='Acme')
+        now = timezone.now()
+        for number in range(7):
+            shipment = Shipment.objects.create(tracking_number=f'TRK{number}', customer=customer, origin='Guangzhou',
+                                               destination='Accra', weight=1, created_by=user)
+            # Two shipments share each timestamp, so the id has to break ties
+            Shipment.objects.filter(pk=shipment.pk).update(created_at=now - timedelta(hours=number // 2))
+        self.expected = list(Shipment.objects.order_by('-created_at', '-id').values_list('tracking_number', flat=True))
+
+    def walk(self, url, key='next'):
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.data)
+            seen.append([row['tracking_number'] for row in response.data['results']])
+            url = response.data[key]
+        return seen
+
+    def test_pages_cover_every_row_once_in_order(self):
+        pages = self.walk('/shipments/?page_size=3')
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), self.expected)
+
+    def test_previous_links_walk_back(self):
+        first = self.client.get('/shipments/?page_size=3').data
+        self.assertIsNone(first['previous'])
+        self.assertNotIn('count', first)
+        last = self.client.get(self.client.get(first['next']).data['next']).data
+        self.assertIsNone(last['next'])
+        back = self.walk(last['previous'], 'previous')
+        self.assertEqual(sum(reversed(back), []), self.expected[:6])
+
+    def test_counts_are_opt_in(self):
+        self.assertEqual(self.client.get('/shipments/?count=exact').data['count'], 7)
+        self.assertGreaterEqual(self.client.get('/shipments/?count=estimate').data['count'], 0)
+
+    def test_invalid_cursor_is_404(self):
+        self.assertEqual(self.client.get('/shipments/?cursor=nonsense').status_code, 404)
@@ -0,0 +1,67 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from rest_framework.test import APITestCase
+
+from logistics.models import Customer, GoodsCategory, Receipt, ReceiptItem, Shipment, Staff
+from logistics.querysets import serializer_query_shape
+from logistics.serializers import ReceiptSerializer
+from logistics.testing import QueryCountAssertionsMixin
+
+
+class QueryShapeTests(QueryCountAssertionsMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('admin', password='p')
+        Staff.objects.create(user=self.user, role='admin')
+        self.client.force_authenticate(self.user)
+        self.category = GoodsCategory.objects.create(name='Furniture', unit_price=Decimal('10'))
+        self.customer = Customer.objects.create(company_name='Acme')
+
+    def make_receipts(self, count):
+        for _ in range(count):
+            receipt = Receipt.objects.create(customer=self.customer, created_by=self.user)
+            for _ in range(3):
+                ReceiptItem.objects.create(receipt=receipt, category=self.category, description='box', cbm=Decimal('1.5'))
+
+    def make_shipments(self, count):
+        start = Shipment.objects.count()
+        for number in range(start, start + count):
+            Shipment.objects.create(tracking_number=f'TRK{number}', customer=self.customer, origin='Guangzhou',
+                                    destination='Accra', weight=1, created_by=self.user)
+
+    def make_staff_and_customers(self, count):
+        start = User.objects.count()
+        for number in range(start, start + count):
+            user = User.objects.create_user(f'user{number}')
+            Staff.objects.create(user=user)
+            Customer.objects.create(company_name=f'Company {number}', user=user)
+
+    def test_receipt_shape_follows_serializer_sources(self):
+        select_related, prefetches = serializer_query_shape(ReceiptSerializer)
+        self.assertIn('customer', select_related)
+        self.assertIn('created_by', select_related)
+        self.assertEqual([prefetch.prefetch_through for prefetch in prefetches], ['items'])
+
+    def test_receipt_list(self):
+        self.assertConstantQueries('/receipts/', self.make_receipts)
+
+    def test_receipt_detail(self):
+        receipt = Receipt.objects.create(customer=self.customer, created_by=self.user)
+
+        def add_items(count):
+            for _ in range(count):
+                ReceiptItem.objects.create(receipt=receipt, category=self.category, description='crate', cbm=Decimal('2'))
+
+        self.assertConstantQueries(f'/receipts/{receipt.pk}/', add_items)
+
+    def test_receipt_item_list(self):
+        self.assertConstantQueries('/receipt-items/', self.make_receipts)
+
+    def test_shipment_list(self):
+        self.assertConstantQueries('/shipments/', self.make_shipments)
+
+    def test_staff_list(self):
+        self.assertConstantQueries('/staff/', self.make_staff_and_customers)
+
+    def test_customer_list(self):
+        self.assertConstantQueries('/customers/', self.make_staff_and_customers)
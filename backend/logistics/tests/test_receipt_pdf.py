@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from logistics import receipt_pdf
+from logistics.models import Customer, GoodsCategory, Receipt, ReceiptItem, Staff
+
+
+class ReceiptPdfTests(APITestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        settings_override = override_settings(RECEIPT_PDF_CACHE_DIR=self.cache_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        user = User.objects.create_user('admin', password='p')
+        Staff.objects.create(user=user, role='admin')
+        self.client.force_authenticate(user)
+        category = GoodsCategory.objects.create(name='Furniture', unit_price=Decimal('10'))
+        customer = Customer.objects.create(company_name='佛山贸易有限公司 Şişli')
+        self.receipt = Receipt.objects.create(customer=customer, created_by=user, notes='小心轻放')
+        for number in range(40):
+            ReceiptItem.objects.create(receipt=self.receipt, category=category, description=f'sofa {number}', cbm=1)
+
+    def test_pdf_embeds_both_fonts(self):
+        response = self.client.get(f'/receipts/{self.receipt.pk}/pdf/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        body = b''.join(response.streaming_content)
+        self.assertTrue(body.startswith(b'%PDF'))
+        self.assertIn(b'NotoSansCJKSC', body)
+        self.assertIn(b'DejaVuSans', body)
+        self.assertIn(b'/Count 2', body)  # 40 items run onto a second page
+
+    def test_characters_use_the_font_that_has_them(self):
+        fonts = [font for font, _, _ in receipt_pdf.runs('Acme 广东省 Şişli', 9)]
+        self.assertEqual(fonts, [receipt_pdf.LATIN_FONT, receipt_pdf.CJK_FONT, receipt_pdf.LATIN_FONT])
+        self.assertEqual([text for _, text, _ in receipt_pdf.runs('a\U0001F600b', 9)], ['a?b'])
+        self.assertGreater(receipt_pdf.text_width('广东省', 9), receipt_pdf.text_width('abc', 9))
+
+    def test_not_modified_for_a_matching_etag(self):
+        etag = self.client.get(f'/receipts/{self.receipt.pk}/pdf/')['ETag']
+        for header in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+            response = self.client.get(f'/receipts/{self.receipt.pk}/pdf/', HTTP_IF_NONE_MATCH=header)
+            self.assertEqual(response.status_code, 304, header)
+        self.receipt.payment_status = 'paid'
+        self.receipt.save()
+        response = self.client.get(f'/receipts/{self.receipt.pk}/pdf/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_cached_until_the_content_changes(self):
+        data = receipt_pdf.receipt_data(self.receipt)
+        path, rendered = receipt_pdf.cached_pdf(data)
+        self.assertTrue(rendered)
+        self.assertEqual(receipt_pdf.cached_pdf(data), (path, False))
+
+    def test_prune_keeps_the_most_recently_used(self):
+        paths = []
+        for number in range(5):
+            path = receipt_pdf.cache_path(f'{number:02d}' + 'a' * 62)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b'%PDF')
+            os.utime(path, (number, number))
+            paths.append(path)
+        self.assertEqual(receipt_pdf.prune_cache(max_files=2), 3)
+        self.assertEqual([path.exists() for path in paths], [False, False, False, True, True])
+        self.assertEqual(receipt_pdf.prune_cache(max_files=2), 0)
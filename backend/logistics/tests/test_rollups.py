@@ -0,0 +1,104 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import transaction
+from rest_framework.test import APITestCase
+
+from logistics.models import ContainerStats, Customer, CustomerStats, GoodsCategory, Receipt, ReceiptItem, Staff
+
+
+class RollupTests(APITestCase):
+    def setUp(self):
+        user = User.objects.create_user('admin', password='p')
+        Staff.objects.create(user=user, role='admin')
+        self.client.force_authenticate(user)
+        self.category = GoodsCategory.objects.create(name='Furniture', unit_price=Decimal('10'))
+        self.acme = Customer.objects.create(company_name='Acme')
+        self.globex = Customer.objects.create(company_name='Globex')
+
+    def add_receipt(self, customer, container='C1', cbm=1, payment_status='pending'):
+        with self.captureOnCommitCallbacks(execute=True):
+            receipt = Receipt.objects.create(customer=customer, container_number=container,
+                                             payment_status=payment_status)
+            ReceiptItem.objects.create(receipt=receipt, category=self.category, description='crate', cbm=cbm)
+        return receipt
+
+    def container(self, number):
+        return ContainerStats.objects.values('items', 'receipts', 'customers', 'cbm', 'revenue').get(
+            container_number=number)
+
+    def test_container_rollup_follows_writes(self):
+        first = self.add_receipt(self.acme, cbm=2)
+        self.add_receipt(self.globex, cbm=3)
+        self.assertEqual(self.container('C1'), {'items': 2, 'receipts': 2, 'customers': 2, 'cbm': Decimal('5'),
+                                                'revenue': Decimal('50')})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.container_number = 'C2'
+            first.save()
+        self.assertEqual(self.container('C1')['cbm'], Decimal('3'))
+        self.assertEqual(self.container('C2')['cbm'], Decimal('2'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.items.get().delete()
+        self.assertEqual(self.container('C2')['items'], 0)
+        response = self.client.get('/rollups/containers/')
+        self.assertEqual([row['container_number'] for row in response.json()['results']], ['C1'])
+
+    def test_rolled_back_writes_refresh_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                receipt = Receipt.objects.create(customer=self.acme, container_number='C9')
+                ReceiptItem.objects.create(receipt=receipt, category=self.category, description='crate', cbm=1)
+                transaction.set_rollback(True)
+        self.assertFalse(ContainerStats.objects.exists())
+        self.assertFalse(CustomerStats.objects.exists())
+
+    def test_customer_rollup_splits_by_payment_status(self):
+        self.add_receipt(self.acme, cbm=1, payment_status='paid')
+        unpaid = self.add_receipt(self.acme, cbm=4)
+        stats = CustomerStats.objects.get(customer=self.acme)
+        self.assertEqual((stats.receipts, stats.total_amount, stats.paid_amount, stats.outstanding_amount),
+                         (2, Decimal('50.00'), Decimal('10.00'), Decimal('40.00')))
+        self.assertEqual(stats.by_payment_status, {'paid': {'receipts': 1, 'amount': '10.00'},
+                                                   'pending': {'receipts': 1, 'amount': '40.00'}})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/receipts/{unpaid.pk}/', {'payment_status': 'paid'})
+        self.assertEqual(response.status_code, 200, response.data)
+        stats.refresh_from_db()
+        self.assertEqual((stats.paid_amount, stats.outstanding_amount), (Decimal('50.00'), Decimal('0.00')))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Receipt.objects.filter(customer=self.acme).delete()
+        self.assertFalse(CustomerStats.objects.exists())
+
+    def test_rebuild_repairs_drift(self):
+        self.add_receipt(self.acme, cbm=2)
+        ContainerStats.objects.update(cbm=99)
+        ContainerStats.objects.create(container_number='GONE', items=1, receipts=1, customers=1, cbm=1, revenue=1)
+        CustomerStats.objects.all().delete()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rebuild_dashboard_stats', stdout=StringIO())
+        self.assertEqual(list(ContainerStats.objects.values_list('container_number', 'cbm')), [('C1', Decimal('2'))])
+        self.assertEqual(CustomerStats.objects.get().total_amount, Decimal('20.00'))
+
+    def test_endpoints(self):
+        self.add_receipt(self.acme, container='C1', cbm=1)
+        self.add_receipt(self.globex, container='C2', cbm=5)
+        self.add_receipt(self.globex, container='C/3', cbm=3)
+
+        rows = self.client.get('/rollups/containers/?ordering=cbm').json()['results']
+        self.assertEqual([row['container_number'] for row in rows], ['C2', 'C/3', 'C1'])
+        response = self.client.get('/rollups/containers/C1/')
+        self.assertEqual((response.status_code, response.json()['cbm']), (200, '1.000'))
+        self.assertEqual(self.client.get('/rollups/containers/C9/').status_code, 404)
+
+        rows = self.client.get('/rollups/customers/?ordering=outstanding').json()['results']
+        self.assertEqual([(row['customer_name'], row['outstanding_amount']) for row in rows],
+                         [('Globex', '80.00'), ('Acme', '10.00')])
+        self.assertEqual(self.client.get(f'/rollups/customers/{self.acme.pk}/').json()['receipts'], 1)
+        self.assertEqual(self.client.post('/rollups/customers/', {}).status_code, 405)
@@ -0,0 +1,65 @@
+import importlib
+
+from django.contrib.auth.models import User
+from django.db import connection
+from rest_framework.test import APITestCase
+
+from logistics import search
+from logistics.models import Customer, Receipt, Shipment, Staff
+
+
+class SearchTests(APITestCase):
+    def setUp(self):
+        if connection.vendor == 'sqlite' and search.FTS_TABLE not in connection.introspection.table_names():
+            # Test settings without migrations: create the FTS5 table and its triggers
+            migration = importlib.import_module('logistics.migrations.0016_searchdocument')
+            with connection.cursor() as cursor:
+                for sql in migration.SQLITE_FTS:
+                    cursor.execute(sql)
+        user = User.objects.create_user('admin', password='p')
+        Staff.objects.create(user=user, role='admin')
+        self.client.force_authenticate(user)
+        self.acme = Customer.objects.create(company_name='Acme Trading Ltd', contact_person='Kwame',
+                                            company_registration='CS123456789')
+        self.other = Customer.objects.create(company_name='Accra Imports')
+        Shipment.objects.create(tracking_number='TRK-0042', customer=self.acme, origin='Guangzhou',
+                                destination='Tema', weight=1)
+        self.receipt = Receipt.objects.create(customer=self.acme, container_number='MSKU1234567')
+        Receipt.objects.create(customer=self.other, container_number='TGHU7654321')
+
+    def titles(self, q, **params):
+        response = self.client.get('/search/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200, response.data)
+        return [(result['type'], result['title']) for result in response.data['results']]
+
+    def test_prefix_search_across_kinds(self):
+        self.assertEqual(self.titles('acm', type='customer'), [('customer', 'Acme Trading Ltd')])
+        self.assertIn(('shipment', 'TRK-0042'), self.titles('trk-00'))
+        self.assertEqual(self.titles('msku'), [('receipt', self.receipt.receipt_number)])
+        self.assertEqual(self.titles(self.receipt.receipt_number), [('receipt', self.receipt.receipt_number)])
+
+    def test_company_registration_is_searchable(self):
+        self.assertEqual(self.titles('CS1234', type='customer'), [('customer', 'Acme Trading Ltd')])
+
+    def test_documents_follow_updates_and_deletes(self):
+        self.acme.company_name = 'Zeta Freight'
+        self.acme.save()
+        self.assertEqual(self.titles('zeta', type='customer'), [('customer', 'Zeta Freight')])
+        self.other.delete()
+        self.assertEqual(self.titles('accra', type='customer'), [])
+
+    def test_search_filter_on_list_endpoints(self):
+        customers = self.client.get('/customers/', {'search': 'acc'}).data['results']
+        self.assertEqual([customer['company_name'] for customer in customers], ['Accra Imports'])
+        receipts = self.client.get('/receipts/', {'search': 'acme'}).data['results']
+        self.assertEqual([receipt['receipt_number'] for receipt in receipts], [self.receipt.receipt_number])
+
+    def test_matching_ids_is_a_subquery(self):
+        ids = search.matching_ids('customer', 'ac')
+        self.assertNotIsInstance(ids, list)
+        self.assertEqual(set(Customer.objects.filter(pk__in=ids).values_list('pk', flat=True)),
+                         {self.acme.pk, self.other.pk})
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.get('/search/').status_code, 400)
+        self.assertEqual(self.client.get('/search/', {'q': 'ac', 'type': 'bogus'}).status_code, 400)
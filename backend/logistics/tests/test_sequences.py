@@ -0,0 +1,71 @@
+import threading
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from logistics import sequences
+from logistics.models import Customer, DocumentSequence, Receipt, Staff
+
+
+class SequenceTests(TestCase):
+    def test_codes_count_up(self):
+        first = Customer.objects.create(company_name='A')
+        second = Customer.objects.create(company_name='B')
+        self.assertEqual((first.customer_code, second.customer_code), ('CUST001', 'CUST002'))
+        staff = Staff.objects.create(user=User.objects.create_user('clerk'))
+        self.assertEqual(staff.employee_id, 'EMP001')
+
+    def test_receipt_numbers_are_per_day(self):
+        customer = Customer.objects.create(company_name='A')
+        numbers = [Receipt.objects.create(customer=customer).receipt_number for _ in range(2)]
+        prefix = Receipt._number_sequence()[1]
+        self.assertEqual(numbers, [f'{prefix}001', f'{prefix}002'])
+        self.assertEqual(Receipt.generate_receipt_numbers(2), [f'{prefix}003', f'{prefix}004'])
+
+    def test_new_counter_is_seeded(self):
+        Customer.objects.create(company_name='Old', customer_code='CUST041')
+        seed = lambda: sequences.max_code_number(Customer, 'customer_code', 'CUST')
+        self.assertEqual(list(sequences.reserve('seeded', 2, seed)), [42, 43])
+        self.assertEqual(list(sequences.reserve('seeded', 1, seed)), [44])
+
+    def test_reserve_returns_consecutive_values(self):
+        self.assertEqual(list(sequences.reserve('test', 3)), [1, 2, 3])
+        self.assertEqual(list(sequences.reserve('test', 2)), [4, 5])
+        self.assertEqual(DocumentSequence.objects.get(name='test').value, 5)
+
+    @override_settings(DOCUMENT_SEQUENCE_BLOCK_SIZE=10)
+    def test_blocks_are_handed_out_from_memory(self):
+        sequences.clear_reserved_blocks()
+        self.addCleanup(sequences.clear_reserved_blocks)
+        with self.captureOnCommitCallbacks(execute=True):
+            first = Customer.objects.create(company_name='A')
+        with CaptureQueriesContext(connection) as queries:
+            second = Customer.objects.create(company_name='B')
+        self.assertFalse([q for q in queries if 'documentsequence' in q['sql']])
+        self.assertEqual((first.customer_code, second.customer_code), ('CUST001', 'CUST002'))
+        self.assertEqual(DocumentSequence.objects.get(name='customer').value, 10)
+
+
+class ConcurrentSequenceTests(TransactionTestCase):
+    def test_concurrent_creates_get_unique_codes(self):
+        Customer.objects.create(company_name='seed')
+        errors = []
+
+        def create_customers():
+            try:
+                for _ in range(20):
+                    Customer.objects.create(company_name='x')
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=create_customers) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(Customer.objects.values('customer_code').distinct().count(), 161)
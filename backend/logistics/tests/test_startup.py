@@ -0,0 +1,54 @@
+import asyncio
+from unittest import mock
+
+from django.test import TestCase
+
+from logistics import startup
+
+
+def fail():
+    raise RuntimeError('could not connect: password=secret')
+
+
+class StartupTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(startup._state, {'ready': False, 'started_at': None, 'ready_at': None,
+                                                   'steps': {}, 'error': None})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_failed_step_is_named_but_not_described(self):
+        with mock.patch.object(startup, 'STEPS', [('urls', lambda: None), ('database', fail)]), \
+                self.assertLogs('logistics.startup', 'ERROR') as logs:
+            response = self.client.get('/health/ready/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['error'], 'database')
+        self.assertNotIn('secret', response.content.decode())
+        self.assertIn('password=secret', '\n'.join(logs.output))
+
+    def test_database_check_failure_is_named_but_not_described(self):
+        startup._state['ready'] = True
+        connection = mock.Mock()
+        connection.cursor.side_effect = fail
+        with mock.patch.object(startup, 'connection', connection), self.assertLogs('logistics.startup', 'ERROR'):
+            response = self.client.get('/health/ready/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['error'], 'database')
+
+    def test_ready(self):
+        response = self.client.get('/health/ready/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()['steps']), {name for name, _ in startup.STEPS})
+
+    def test_warm_up_closes_its_connections(self):
+        with mock.patch.object(startup, 'STEPS', []), mock.patch.object(startup.connections, 'close_all') as close_all:
+            self.assertTrue(startup.warm_up_before_serving()['ready'])
+        close_all.assert_called_once()
+
+    def test_warm_up_under_an_event_loop_runs_in_a_thread(self):
+        async def serve():
+            return startup.warm_up_before_serving()
+
+        with mock.patch.object(startup, 'STEPS', []), mock.patch.object(startup.connections, 'close_all') as close_all:
+            self.assertTrue(asyncio.run(serve())['ready'])
+        close_all.assert_called_once()
@@ -0,0 +1,63 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from rest_framework.test import APITestCase
+
+from logistics.models import Customer, GoodsCategory, Receipt, ReceiptItem, Staff
+
+
+class ReceiptTotalTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('admin', password='p')
+        Staff.objects.create(user=self.user, role='admin')
+        self.client.force_authenticate(self.user)
+        self.category = GoodsCategory.objects.create(name='Furniture', unit_price=Decimal('10'))
+        self.receipt = Receipt.objects.create(customer=Customer.objects.create(company_name='Acme'), created_by=self.user)
+
+    def total(self, receipt=None):
+        return Receipt.objects.values_list('total_amount', flat=True).get(pk=(receipt or self.receipt).pk)
+
+    def test_add_item_adds_its_total(self):
+        for cbm in ('1.5', '2'):
+            response = self.client.post(f'/receipts/{self.receipt.pk}/add_item/',
+                                        {'category': self.category.pk, 'description': 'box', 'cbm': cbm})
+            self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(self.total(), Decimal('35.00'))
+
+    def test_item_update_and_delete_adjust_total(self):
+        item = ReceiptItem.objects.create(receipt=self.receipt, description='box', cbm=2, unit_price=5)
+        self.assertEqual(self.total(), Decimal('10.00'))
+
+        response = self.client.patch(f'/receipt-items/{item.pk}/', {'cbm': '3'})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.total(), Decimal('15.00'))
+
+        self.assertEqual(self.client.delete(f'/receipt-items/{item.pk}/').status_code, 204)
+        self.assertEqual(self.total(), Decimal('0.00'))
+
+    def test_moving_item_moves_its_total(self):
+        other = Receipt.objects.create(customer=self.receipt.customer, created_by=self.user)
+        item = ReceiptItem.objects.create(receipt=self.receipt, description='box', cbm=1, unit_price=4)
+        item = ReceiptItem.objects.get(pk=item.pk)
+        item.receipt = other
+        item.save()
+        self.assertEqual((self.total(), self.total(other)), (Decimal('0.00'), Decimal('4.00')))
+
+    def test_deleting_receipt_cascades_without_errors(self):
+        ReceiptItem.objects.create(receipt=self.receipt, description='box', cbm=1, unit_price=4)
+        self.receipt.delete()
+        self.assertFalse(ReceiptItem.objects.exists())
+
+    def test_recompute_command_fixes_drift(self):
+        ReceiptItem.objects.create(receipt=self.receipt, description='box', cbm=1, unit_price=4)
+        Receipt.objects.filter(pk=self.receipt.pk).update(total_amount=99)
+
+        out = StringIO()
+        call_command('recompute_receipt_totals', '--dry-run', stdout=out)
+        self.assertIn('found 1', out.getvalue())
+        self.assertEqual(self.total(), Decimal('99.00'))
+
+        call_command('recompute_receipt_totals', '--batch-size', '1', stdout=out)
+        self.assertEqual(self.total(), Decimal('4.00'))
@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from logistics import tracking
+from logistics.models import Customer, Shipment
+
+
+class TrackingCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        tracking.local_cache.clear()
+        self.client.force_authenticate(User.objects.create_user('clerk'))
+        customer = Customer.objects.create(company_name='Acme')
+        self.shipment = Shipment.objects.create(tracking_number='TRK1', customer=customer, origin='Guangzhou',
+                                                destination='Accra', weight=1)
+
+    def test_lookups_are_cached_until_the_shipment_changes(self):
+        self.assertEqual(tracking.lookup('TRK1')['status'], 'pending')
+        with self.assertNumQueries(0):
+            self.assertEqual(tracking.lookup('TRK1')['customer_name'], 'Acme')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shipment.status = 'in_transit'
+            self.shipment.save()
+        self.assertEqual(tracking.lookup('TRK1')['status'], 'in_transit')
+
+    def test_unknown_numbers_are_remembered(self):
+        self.assertIsNone(tracking.lookup('NOPE'))
+        with self.assertNumQueries(0):
+            self.assertIsNone(tracking.lookup('NOPE'))
+        self.assertEqual(self.client.get('/track/NOPE/').status_code, 404)
+
+    @override_settings(TRACKING_CACHE_TTL=5, TRACKING_CACHE_MISS_TTL=4)
+    def test_entries_expire_after_the_configured_ttl(self):
+        with mock.patch.object(tracking.cache, 'set_many') as set_many:
+            tracking.lookup_many(['TRK1', 'NOPE'])
+        self.assertEqual(sorted(call.args[1] for call in set_many.call_args_list), [4, 5])
+
+    def test_ttls_are_short_without_a_shared_cache(self):
+        script = ('from rockman_logistics import settings; '
+                  'print(settings.CACHE_SHARED, settings.TRACKING_CACHE_TTL, settings.TRACKING_CACHE_MISS_TTL)')
+        environ = {key: value for key, value in os.environ.items()
+                   if key != 'REDIS_URL' and not key.startswith('TRACKING_')}
+
+        def load(**env):
+            return subprocess.run([sys.executable, '-c', script], env={**environ, **env}, cwd=settings.BASE_DIR,
+                                  capture_output=True, text=True, check=True).stdout.split()
+
+        self.assertEqual(load(), ['False', '5', '5'])
+        self.assertEqual(load(REDIS_URL='redis://localhost:6379/0'), ['True', '300', '30'])
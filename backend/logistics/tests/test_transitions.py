@@ -0,0 +1,57 @@
+from django.contrib.auth.models import User
+from rest_framework.test import APITestCase
+
+from logistics.models import Customer, Shipment, ShipmentEvent, Staff
+
+
+class ShipmentStatusTests(APITestCase):
+    def setUp(self):
+        user = User.objects.create_user('admin', password='p')
+        Staff.objects.create(user=user, role='admin')
+        self.client.force_authenticate(user)
+        customer = Customer.objects.create(company_name='Acme')
+        self.shipments = [Shipment.objects.create(tracking_number=f'T{number}', customer=customer, origin='A',
+                                                  destination='B', weight=1)
+                          for number in range(3)]
+
+    def patch(self, shipment, data):
+        return self.client.patch(f'/shipments/{shipment.pk}/', data, format='json')
+
+    def test_update_follows_the_state_machine_and_stamps_dates(self):
+        shipment = self.shipments[0]
+        response = self.patch(shipment, {'status': 'delivered'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('status', response.data)
+
+        response = self.patch(shipment, {'status': 'in_transit'})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertIsNotNone(response.data['shipped_date'])
+        self.assertIsNone(response.data['actual_delivery'])
+
+        response = self.patch(shipment, {'status': 'delivered', 'actual_delivery': '2026-01-02T03:04:05Z'})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertTrue(response.data['actual_delivery'].startswith('2026-01-02T03:04:05'))
+        self.assertEqual(list(ShipmentEvent.objects.filter(shipment=shipment).order_by('pk')
+                              .values_list('to_status', flat=True)), ['pending', 'in_transit', 'delivered'])
+
+        self.assertEqual(self.patch(shipment, {'status': 'pending'}).status_code, 400)
+        self.assertEqual(self.patch(shipment, {'status': 'delivered', 'description': 'ok'}).status_code, 200)
+
+    def test_batch_transition(self):
+        self.patch(self.shipments[2], {'status': 'cancelled'})
+        ids = [shipment.pk for shipment in self.shipments]
+        response = self.client.post('/shipments/transition/', {'status': 'in_transit', 'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([row['id'] for row in response.data['rejected']], [ids[2]])
+
+        response = self.client.post('/shipments/transition/',
+                                    {'status': 'in_transit', 'ids': ids + [0], 'skip_invalid': True}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual([row['id'] for row in response.data['updated']], ids[:2])
+        self.assertEqual(response.data['not_found'], [0])
+        self.assertFalse(Shipment.objects.filter(pk__in=ids[:2], shipped_date__isnull=True).exists())
+
+    def test_ids_must_be_integers(self):
+        for ids in ([True], ['1'], 1):
+            response = self.client.post('/shipments/transition/', {'status': 'cancelled', 'ids': ids}, format='json')
+            self.assertEqual(response.status_code, 400, ids)
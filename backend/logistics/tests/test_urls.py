@@ -0,0 +1,15 @@
+from django.test import SimpleTestCase
+from django.urls import Resolver404, resolve
+
+
+class AsgiUrlTests(SimpleTestCase):
+    def test_asgi_app_only_serves_the_async_routes(self):
+        for path in ('/changes/stream/', '/async/receipts/', '/async/categories/', '/health/ready/'):
+            resolve(path, urlconf='rockman_logistics.asgi_urls')
+        for path in ('/receipts/', '/changes/', '/auth/login/'):
+            with self.assertRaises(Resolver404):
+                resolve(path, urlconf='rockman_logistics.asgi_urls')
+
+    def test_wsgi_app_serves_everything(self):
+        for path in ('/receipts/', '/changes/', '/changes/stream/', '/async/receipts/'):
+            resolve(path)
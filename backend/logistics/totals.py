@@ -0,0 +1,99 @@
+"""
+Maintenance of the denormalized ``Receipt.total_amount``.
+
+Item writes adjust the stored total by the change in ``total_price`` with a single
+``UPDATE ... SET total_amount = total_amount + delta`` rather than re-summing the
+receipt's items, so adding an item costs the same on a 5 line receipt as on a
+500 line manifest. ``reconcile_receipt_totals`` repairs any drift in batches.
+"""
+from decimal import Decimal
+
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def apply_total_delta(receipt_id, delta):
+    """Add delta to a receipt's total_amount in the database"""
+    from .models import Receipt
+
+    if receipt_id is None or not delta:
+        return
+    Receipt.objects.filter(pk=receipt_id).update(
+        total_amount=F('total_amount') + delta,
+        updated_at=timezone.now(),
+    )
+
+
+def _items_total_subquery():
+    from .models import ReceiptItem
+
+    item_totals = (ReceiptItem.objects.filter(receipt=OuterRef('pk'))
+                   .order_by().values('receipt').annotate(total=Sum('total_price')).values('total'))
+    return Coalesce(Subquery(item_totals), Value(Decimal('0')), output_field=DecimalField(max_digits=15, decimal_places=2))
+
+
+def recompute_totals(receipt_ids):
+    """Reset total_amount to the sum of the items for the given receipts, in one UPDATE"""
+    from .models import Receipt
+
+    return Receipt.objects.filter(pk__in=list(receipt_ids)).update(
+        total_amount=_items_total_subquery(),
+        updated_at=timezone.now(),
+    )
+
+
+def item_saved(item, previous, created):
+    """
+    Apply the total change for a saved ReceiptItem.
+
+    ``previous`` is the ``(receipt_id, total_price)`` the row had when loaded, or None
+    if it wasn't loaded from the database. An existing row saved without being loaded
+    has no known previous total, so its receipt is recomputed instead.
+    """
+    if previous is None:
+        if created:
+            apply_total_delta(item.receipt_id, item.total_price)
+        else:
+            recompute_totals([item.receipt_id])
+        return
+
+    previous_receipt_id, previous_total = previous
+    if previous_receipt_id == item.receipt_id:
+        apply_total_delta(item.receipt_id, item.total_price - previous_total)
+    else:
+        apply_total_delta(previous_receipt_id, -previous_total)
+        apply_total_delta(item.receipt_id, item.total_price)
+
+
+def item_deleted(item):
+    """Remove a deleted ReceiptItem's total from its receipt"""
+    apply_total_delta(item.receipt_id, -item.total_price)
+
+
+def reconcile_receipt_totals(batch_size=1000, dry_run=False):
+    """
+    Walk all receipts in primary key order, batch_size at a time, and fix any whose
+    total_amount differs from the sum of their items.
+
+    Yields ``(checked, drifted_ids)`` per batch so callers can report progress.
+    """
+    from .models import Receipt, ReceiptItem
+
+    last_pk = 0
+    while True:
+        batch = list(Receipt.objects.filter(pk__gt=last_pk).order_by('pk')
+                     .values_list('pk', 'total_amount')[:batch_size])
+        if not batch:
+            return
+        last_pk = batch[-1][0]
+
+        item_totals = dict(ReceiptItem.objects.filter(receipt_id__in=[pk for pk, _ in batch])
+                           .order_by().values('receipt_id').annotate(total=Sum('total_price'))
+                           .values_list('receipt_id', 'total'))
+        drifted = [pk for pk, total in batch if total != (item_totals.get(pk) or 0)]
+        if drifted and not dry_run:
+            # Recompute in SQL rather than writing the sums read above, so item
+            # writes that land between the two statements aren't overwritten
+            recompute_totals(drifted)
+        yield len(batch), drifted
@@ -0,0 +1,138 @@
+"""
+Shipment tracking lookups by tracking number.
+
+A tracking lookup only needs a compact status projection of the shipment (status, dates,
+route and customer name), which is cached per tracking number: a small per-process LRU
+(``TRACKING_CACHE_LOCAL_TTL`` seconds) absorbs hot numbers being polled, in front of the
+shared cache (``TRACKING_CACHE_TTL`` seconds). Unknown numbers are cached too, for
+``TRACKING_CACHE_MISS_TTL`` seconds, so polling a wrong number does not reach the database.
+
+Entries are dropped on shipment save/delete and customer renames. Writes that bypass
+signals (``QuerySet.update()``) must call ``invalidate()`` themselves.
+
+Invalidation reaches the shared cache and this process's LRU only, so the "shared"
+cache has to be Redis (REDIS_URL, see CACHE_SHARED) for other web processes and the
+job worker to see a change at once. With the per-process memory cache the TTLs
+default to 5 seconds instead, which bounds how stale another process's answer can be.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .authentication import LocalLRU
+
+MAX_BATCH = 500
+PROJECTION_FIELDS = ['tracking_number', 'status', 'origin', 'destination', 'shipped_date',
+                     'estimated_delivery', 'actual_delivery', 'updated_at']
+# Cached for numbers with no shipment (None would read as a cache miss)
+NOT_FOUND = {}
+
+local_cache = LocalLRU()
+_stats_lock = threading.Lock()
+_stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def cache_key(tracking_number):
+    return f'track:{tracking_number}'
+
+
+def _count(name, amount=1):
+    if amount:
+        with _stats_lock:
+            _stats[name] += amount
+
+
+def stats():
+    """Hit/miss counters for this process since start"""
+    with _stats_lock:
+        counts = dict(_stats)
+    lookups = sum(counts.values())
+    counts['lookups'] = lookups
+    counts['hit_rate'] = round((counts['local_hits'] + counts['shared_hits']) / lookups, 4) if lookups else None
+    return counts
+
+
+def _load(tracking_numbers):
+    """{tracking_number: projection} for the numbers that exist, in one query"""
+    from .models import Shipment
+
+    labels = dict(Shipment.STATUS_CHOICES)
+    rows = (Shipment.objects.filter(tracking_number__in=tracking_numbers)
+            .values(*PROJECTION_FIELDS, 'customer__company_name'))
+    return {
+        row['tracking_number']: {
+            **{name: row[name] for name in PROJECTION_FIELDS},
+            'status_display': labels.get(row['status'], row['status']),
+            'customer_name': row['customer__company_name'],
+        }
+        for row in rows
+    }
+
+
+def _remember(key, value):
+    local_cache.set(key, value, _setting('TRACKING_CACHE_LOCAL_TTL', 5), _setting('TRACKING_CACHE_LOCAL_SIZE', 2048))
+
+
+def lookup_many(tracking_numbers):
+    """{tracking_number: projection or None} for up to MAX_BATCH numbers, loading cache misses in one query"""
+    found = {}
+    missing = []
+    for number in tracking_numbers:
+        value = local_cache.get(cache_key(number))
+        if value is None:
+            missing.append(number)
+        else:
+            found[number] = value
+    _count('local_hits', len(found))
+
+    if missing:
+        shared = cache.get_many([cache_key(number) for number in missing])
+        for number in missing:
+            value = shared.get(cache_key(number))
+            if value is not None:
+                found[number] = value
+                _remember(cache_key(number), value)
+        _count('shared_hits', len(shared))
+
+    unknown = [number for number in missing if number not in found]
+    if unknown:
+        _count('misses', len(unknown))
+        loaded = _load(unknown)
+        projections = {cache_key(number): loaded[number] for number in unknown if number in loaded}
+        absent = {cache_key(number): NOT_FOUND for number in unknown if number not in loaded}
+        if projections:
+            cache.set_many(projections, _setting('TRACKING_CACHE_TTL', 300))
+        if absent:
+            cache.set_many(absent, _setting('TRACKING_CACHE_MISS_TTL', 30))
+        for key, value in {**projections, **absent}.items():
+            _remember(key, value)
+        for number in unknown:
+            found[number] = loaded.get(number, NOT_FOUND)
+
+    return {number: found[number] or None for number in tracking_numbers}
+
+
+def lookup(tracking_number):
+    return lookup_many([tracking_number])[tracking_number]
+
+
+def invalidate(tracking_numbers):
+    """Forget tracking numbers in this process and the shared cache once the transaction commits"""
+    keys = [cache_key(number) for number in tracking_numbers if number]
+    if not keys:
+        return
+
+    def forget():
+        for key in keys:
+            local_cache.delete(key)
+        cache.delete_many(keys)
+
+    for key in keys:
+        local_cache.delete(key)
+    transaction.on_commit(forget)
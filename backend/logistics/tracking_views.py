@@ -0,0 +1,34 @@
+from rest_framework import status
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from . import tracking
+
+
+@api_view(['GET'])
+def track_shipment(request, tracking_number):
+    """Status of one shipment by tracking number, served from the tracking cache"""
+    shipment = tracking.lookup(tracking_number.strip())
+    if shipment is None:
+        return Response({'error': 'Shipment not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(shipment)
+
+
+@api_view(['POST'])
+def track_shipments(request):
+    """Statuses of up to 500 shipments: {"tracking_numbers": [...]}"""
+    numbers = request.data.get('tracking_numbers') if isinstance(request.data, dict) else None
+    if not isinstance(numbers, list) or not numbers or not all(isinstance(number, str) for number in numbers):
+        return Response({'error': 'tracking_numbers must be a non-empty list of strings'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    # Keep the caller's order, without duplicates
+    numbers = list(dict.fromkeys(number.strip() for number in numbers if number.strip()))
+    if len(numbers) > tracking.MAX_BATCH:
+        return Response({'error': f'At most {tracking.MAX_BATCH} tracking numbers can be looked up per request'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    shipments = tracking.lookup_many(numbers)
+    return Response({
+        'results': [shipment for shipment in shipments.values() if shipment is not None],
+        'not_found': [number for number, shipment in shipments.items() if shipment is None],
+    })
@@ -0,0 +1,96 @@
+"""
+Batch shipment status transitions.
+
+``transition()`` moves many shipments to one status in a single transaction: the rows
+are locked and checked against ``Shipment.STATUS_TRANSITIONS``, changed with one
+``UPDATE ... WHERE id IN (...)`` that also stamps ``shipped_date`` (entering in_transit)
+or ``actual_delivery`` (delivered) where not set yet, and logged with one
+``ShipmentEvent`` per shipment written by ``bulk_create``.
+
+``QuerySet.update()`` sends no signals, so the shipment status rollup, the tracking
+cache and the change feed are updated here.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import DateTimeField, F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import changes, dashboard, tracking
+
+MAX_SHIPMENTS = 1000
+
+
+class TransitionError(Exception):
+    """The transition was refused; ``rejected`` lists the shipments that cannot make it"""
+
+    def __init__(self, message, rejected=()):
+        super().__init__(message)
+        self.rejected = list(rejected)
+
+
+def select(ids=None, tracking_numbers=None, container_number=None):
+    """Shipments by id, by tracking number, or carrying items of receipts loaded in a container"""
+    from .models import ReceiptItem, Shipment
+
+    queryset = Shipment.objects.all()
+    if ids is not None:
+        queryset = queryset.filter(pk__in=ids)
+    if tracking_numbers is not None:
+        queryset = queryset.filter(tracking_number__in=tracking_numbers)
+    if container_number is not None:
+        queryset = queryset.filter(pk__in=ReceiptItem.objects.filter(
+            receipt__container_number=container_number, shipment__isnull=False).values('shipment_id'))
+    return queryset
+
+
+def _row(row):
+    pk, status, tracking_number = row
+    return {'id': pk, 'tracking_number': tracking_number, 'status': status}
+
+
+def transition(queryset, status, user=None, note='', at=None, skip_invalid=False):
+    """
+    Move the shipments in queryset to status. Shipments already there are left alone.
+    Any shipment whose status can't change to status refuses the whole batch with a
+    TransitionError, unless skip_invalid, which leaves those out instead.
+    Returns {'updated': [...], 'unchanged': [...], 'rejected': [...]} as {id, tracking_number, status} rows.
+    """
+    from .models import Shipment, ShipmentEvent
+
+    at = at or timezone.now()
+    with transaction.atomic():
+        rows = list(queryset.select_for_update().order_by('pk').values_list('pk', 'status', 'tracking_number'))
+        if len(rows) > MAX_SHIPMENTS:
+            raise TransitionError(f'At most {MAX_SHIPMENTS} shipments can change status per request')
+        unchanged = [row for row in rows if row[1] == status]
+        rejected = [row for row in rows if row[1] != status and status not in Shipment.STATUS_TRANSITIONS.get(row[1], ())]
+        if rejected and not skip_invalid:
+            raise TransitionError(f'{len(rejected)} shipment(s) cannot change to {status}', map(_row, rejected))
+        moving = [row for row in rows if row[1] != status and row not in rejected]
+
+        if moving:
+            values = {'status': status, 'updated_at': timezone.now()}
+            if status == 'in_transit':
+                values['shipped_date'] = Coalesce(F('shipped_date'), Value(at, output_field=DateTimeField()))
+            elif status == 'delivered':
+                values['actual_delivery'] = Coalesce(F('actual_delivery'), Value(at, output_field=DateTimeField()))
+            Shipment.objects.filter(pk__in=[pk for pk, _, _ in moving]).update(**values)
+            ShipmentEvent.objects.bulk_create([
+                ShipmentEvent(shipment_id=pk, from_status=previous, to_status=status, note=note,
+                              created_by=user, created_at=at)
+                for pk, previous, _ in moving
+            ])
+
+            for previous, count in Counter(previous for _, previous, _ in moving).items():
+                dashboard.bump_shipment_status(previous, -count)
+            dashboard.bump_shipment_status(status, len(moving))
+            tracking.invalidate([tracking_number for _, _, tracking_number in moving])
+            changes.record_ids('shipment', [pk for pk, _, _ in moving])
+
+    return {
+        'updated': [{**_row(row), 'status': status, 'previous_status': row[1]} for row in moving],
+        'unchanged': [_row(row) for row in unchanged],
+        'rejected': [_row(row) for row in rejected],
+    }
@@ -1,8 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (GoodsCategoryViewSet, CustomerViewSet, StaffViewSet,
-                   ShipmentViewSet, ReceiptViewSet, ReceiptItemViewSet)
-from . import auth_views
+                   ShipmentViewSet, ReceiptViewSet, ReceiptItemViewSet, JobViewSet,
+                   ContainerStatsViewSet, CustomerStatsViewSet)
+from . import (analytics_views, async_views, auth_views, change_views, container_views, import_views, search_views,
+               tracking_views)
 
 router = DefaultRouter()
 router.register(r'categories', GoodsCategoryViewSet)
@@ -11,10 +13,32 @@ router.register(r'staff', StaffViewSet)
 router.register(r'shipments', ShipmentViewSet)
 router.register(r'receipts', ReceiptViewSet)
 router.register(r'receipt-items', ReceiptItemViewSet)
+router.register(r'jobs', JobViewSet)
+router.register(r'rollups/containers', ContainerStatsViewSet)
+router.register(r'rollups/customers', CustomerStatsViewSet)
 
-urlpatterns = [
+# Routes that need the ASGI app; rockman_logistics.asgi_urls serves only these
+async_urlpatterns = [
+    path('changes/stream/', change_views.change_stream, name='change_stream'),
+    path('async/receipts/', async_views.receipt_list, name='async_receipt_list'),
+    path('async/receipts/<int:pk>/', async_views.receipt_detail, name='async_receipt_detail'),
+    path('async/shipments/track/<str:tracking_number>/', async_views.shipment_track, name='async_shipment_track'),
+    path('async/dashboard/stats/', async_views.dashboard_stats, name='async_dashboard_stats'),
+    path('async/categories/', async_views.category_list, name='async_categories'),
+]
+
+urlpatterns = async_urlpatterns + [
     path('auth/login/', auth_views.staff_login, name='staff_login'),
     path('auth/logout/', auth_views.staff_logout, name='staff_logout'),
     path('auth/profile/', auth_views.staff_profile, name='staff_profile'),
+    path('auth/token-cache/', auth_views.token_cache_stats, name='token_cache_stats'),
+    path('import/manifest/', import_views.import_manifest, name='import_manifest'),
+    path('search/', search_views.global_search, name='global_search'),
+    path('analytics/', analytics_views.analytics_series, name='analytics'),
+    path('containers/fill/', container_views.container_fill, name='container_fill'),
+    path('containers/plan/', container_views.container_plan, name='container_plan'),
+    path('changes/', change_views.change_list, name='change_list'),
+    path('track/', tracking_views.track_shipments, name='track_shipments'),
+    path('track/<str:tracking_number>/', tracking_views.track_shipment, name='track_shipment'),
     path('', include(router.urls)),
 ]
@@ -1,13 +1,36 @@
-from rest_framework import viewsets, status, permissions
+from rest_framework import mixins, viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter
-from django.db import models
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.http import content_disposition_header
 from django.contrib.auth.models import User
-from .models import GoodsCategory, Customer, Staff, Shipment, Receipt, ReceiptItem
+from .models import (GoodsCategory, Customer, Staff, Shipment, ShipmentEvent, Receipt, ReceiptItem, Job,
+                     JobFile, ContainerStats, CustomerStats)
 from .serializers import (GoodsCategorySerializer, CustomerSerializer, 
-                         StaffSerializer, ShipmentSerializer, ReceiptSerializer, ReceiptItemSerializer)
+                         StaffSerializer, ShipmentSerializer, ReceiptSerializer, ReceiptItemSerializer,
+                         JobSerializer, ContainerStatsSerializer, CustomerStatsSerializer, ShipmentEventSerializer)
+from .querysets import QueryShapeMixin
+from .pagination import KeysetOrderingMixin, KeysetPagination
+from .search import FullTextSearchFilter
+from . import categories, dashboard, exports, jobs, receipt_pdf, transitions
+
+
+ACTIVE_CATEGORIES_KEY = 'api:active'
+
+
+def active_categories_data(by_id):
+    return GoodsCategorySerializer([category for category in by_id.values() if category.is_active], many=True).data
+
+
+def etag_matches(request, etag):
+    # If-None-Match compares weakly: W/"x" matches "x"
+    if_none_match = [tag.strip().removeprefix('W/') for tag in request.headers.get('If-None-Match', '').split(',')]
+    return etag.removeprefix('W/') in if_none_match or '*' in if_none_match
 
 
 class GoodsCategoryViewSet(viewsets.ModelViewSet):
@@ -18,16 +41,32 @@ class GoodsCategoryViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'description']
     filterset_fields = ['is_active']
     
+    def list(self, request, *args, **kwargs):
+        # Unfiltered lists come from the category registry with a versioned ETag
+        if set(request.query_params) - {'format'}:
+            return super().list(request, *args, **kwargs)
+        return self.active_categories_response(request)
+    
     @action(detail=False, methods=['get'])
     def active(self, request):
         """Get only active categories"""
-        self.pagination_class = None
-        categories = self.queryset
-        serializer = self.get_serializer(categories, many=True)
-        return Response(serializer.data)
+        return self.active_categories_response(request)
+    
+    def active_categories_response(self, request):
+        """Active categories from the registry; 304 if the client's ETag is still current"""
+        version, data = categories.serialized(ACTIVE_CATEGORIES_KEY, active_categories_data)
+        etag = f'"categories-{version}"'
+        if etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data)
+        response['ETag'] = etag
+        # Let browsers keep the list but revalidate it on every use
+        response['Cache-Control'] = 'private, no-cache'
+        return response
 
 
-class StaffViewSet(viewsets.ModelViewSet):
+class StaffViewSet(QueryShapeMixin, viewsets.ModelViewSet):
     queryset = Staff.objects.filter(is_active_staff=True)
     serializer_class = StaffSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter]
@@ -91,38 +130,18 @@ class StaffViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def dashboard_stats(self, request):
-        """Get dashboard statistics"""
-        from django.db.models import Count, Q
-        
-        # Get counts
-        total_staff = Staff.objects.filter(is_active_staff=True).count()
-        total_customers = Customer.objects.filter(is_active=True).count()
-        total_shipments = Shipment.objects.count()
-        total_receipts = Receipt.objects.count()
-        
-        return Response({
-            'total_staff': total_staff,
-            'total_customers': total_customers,
-            'total_shipments': total_shipments,
-            'total_receipts': total_receipts
-        })
+        """Get dashboard statistics (cached rollups, see dashboard.py)"""
+        return Response(dashboard.dashboard_stats())
 
 
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(QueryShapeMixin, viewsets.ModelViewSet):
     queryset = Customer.objects.filter(is_active=True)
     serializer_class = CustomerSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter]
-    search_fields = ['company_name', 'contact_person', 'email', 'company_registration']
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter]
+    search_document_type = 'customer'
     filterset_fields = ['is_active']
     
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        search = self.request.query_params.get('search', None)
-        if search:
-            queryset = queryset.filter(company_name__icontains=search)
-        return queryset
-    
     @action(detail=False, methods=['post'])
     def create_or_get(self, request):
         """Create customer if not exists, otherwise get existing"""
@@ -146,20 +165,139 @@ class CustomerViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
 
-class ShipmentViewSet(viewsets.ModelViewSet):
+class ShipmentViewSet(QueryShapeMixin, viewsets.ModelViewSet):
     queryset = Shipment.objects.all()
     serializer_class = ShipmentSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter]
-    search_fields = ['tracking_number', 'origin', 'destination', 'description']
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter]
+    search_document_type = 'shipment'
     filterset_fields = ['customer', 'status']
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at', '-id')
+
+    def perform_update(self, serializer):
+        # Recorded on the ShipmentEvent if the status changes
+        serializer.instance._changed_by = self.request.user
+        serializer.save()
+
+    @action(detail=False, methods=['post'])
+    def transition(self, request):
+        """
+        Move many shipments to one status: {"status", and one of "ids", "tracking_numbers" or
+        "container_number"; optional "note", "at" (timestamp for shipped/delivered dates) and
+        "skip_invalid"}. Without skip_invalid, one shipment that can't make the change refuses the batch.
+        """
+        data = request.data if isinstance(request.data, dict) else {}
+        target = data.get('status')
+        if target not in dict(Shipment.STATUS_CHOICES):
+            return Response({'error': f"status must be one of {', '.join(dict(Shipment.STATUS_CHOICES))}"},
+                          status=status.HTTP_400_BAD_REQUEST)
+        selectors = [key for key in ('ids', 'tracking_numbers', 'container_number') if data.get(key)]
+        if len(selectors) != 1:
+            return Response({'error': 'Give exactly one of ids, tracking_numbers or container_number'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        selector = selectors[0]
+        value = data[selector]
+        if selector == 'ids' and not (isinstance(value, list) and all(isinstance(pk, int) and not isinstance(pk, bool) for pk in value)):
+            return Response({'error': 'ids must be a list of shipment ids'}, status=status.HTTP_400_BAD_REQUEST)
+        if selector == 'tracking_numbers' and not (isinstance(value, list) and all(isinstance(number, str) for number in value)):
+            return Response({'error': 'tracking_numbers must be a list of strings'}, status=status.HTTP_400_BAD_REQUEST)
+        if selector == 'container_number' and not isinstance(value, str):
+            return Response({'error': 'container_number must be a string'}, status=status.HTTP_400_BAD_REQUEST)
+        if isinstance(value, list) and len(value) > transitions.MAX_SHIPMENTS:
+            return Response({'error': f'At most {transitions.MAX_SHIPMENTS} shipments can change status per request'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        at = None
+        if data.get('at'):
+            try:
+                at = parse_datetime(str(data['at']))
+            except ValueError:
+                pass
+            if at is None:
+                return Response({'error': 'at must be an ISO 8601 timestamp'}, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(at):
+                at = timezone.make_aware(at)
+
+        queryset = transitions.select(**{selector: value})
+        try:
+            result = transitions.transition(queryset, target, user=request.user, note=str(data.get('note', ''))[:500],
+                                            at=at, skip_invalid=bool(data.get('skip_invalid')))
+        except transitions.TransitionError as e:
+            return Response({'error': str(e), 'rejected': e.rejected}, status=status.HTTP_400_BAD_REQUEST)
+
+        if isinstance(value, list):
+            field = 'id' if selector == 'ids' else 'tracking_number'
+            found = {row[field] for key in ('updated', 'unchanged', 'rejected') for row in result[key]}
+            result['not_found'] = [item for item in value if item not in found]
+        return Response(result)
 
+    @action(detail=True, methods=['get'])
+    def events(self, request, pk=None):
+        """The shipment's status history, newest first"""
+        shipment = self.get_object()
+        events = ShipmentEvent.objects.filter(shipment=shipment).select_related('created_by')
+        return Response(ShipmentEventSerializer(events, many=True).data)
 
-class ReceiptViewSet(viewsets.ModelViewSet):
+
+class ReceiptViewSet(QueryShapeMixin, viewsets.ModelViewSet):
     queryset = Receipt.objects.all()
     serializer_class = ReceiptSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter]
-    search_fields = ['receipt_number', 'customer__name', 'notes']
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter]
+    search_document_type = 'receipt'
     filterset_fields = ['customer', 'payment_status']
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-issue_date', '-id')
+    bulk_max_receipts = 500
+    
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Create many receipts, with their items, in one request"""
+        if not isinstance(request.data, list) or not request.data:
+            return Response({'error': 'Expected a non-empty list of receipts'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > self.bulk_max_receipts:
+            return Response({'error': f'At most {self.bulk_max_receipts} receipts can be created per request'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        serializer = self.get_serializer(data=request.data, many=True)
+        if serializer.is_valid():
+            serializer.save()
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=False, methods=['get'], url_path=r'export/(?P<file_format>csv|xlsx)')
+    def export(self, request, file_format=None):
+        """Stream receipts and their items as CSV or XLSX (?date_from=&date_to=&customer=&payment_status=)"""
+        try:
+            receipts = exports.filter_receipts(
+                self.filter_queryset(Receipt.objects.all()),
+                date_from=request.query_params.get('date_from'),
+                date_to=request.query_params.get('date_to'),
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        chunks = exports.export_chunks(file_format, exports.export_rows(receipts))
+        if isinstance(request._request, ASGIRequest):
+            chunks = exports.aiter_chunks(chunks)
+        response = StreamingHttpResponse(chunks, content_type=exports.CONTENT_TYPES[file_format])
+        filename = f"receipts-{timezone.localdate():%Y%m%d}.{file_format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+    
+    @action(detail=True, methods=['get'])
+    def pdf(self, request, pk=None):
+        """Receipt as a PDF, rendered once per distinct content and served from the disk cache"""
+        data = receipt_pdf.receipt_data(self.get_object())
+        etag = f'"{receipt_pdf.content_hash(data)}"'
+        if etag_matches(request, etag):
+            response = HttpResponseNotModified()
+        else:
+            path, _ = receipt_pdf.cached_pdf(data)
+            response = FileResponse(open(path, 'rb'), content_type='application/pdf',
+                                    filename=f"{data['receipt_number']}.pdf")
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
     
     @action(detail=True, methods=['post'])
     def add_item(self, request, pk=None):
@@ -167,18 +305,100 @@ class ReceiptViewSet(viewsets.ModelViewSet):
         receipt = self.get_object()
         serializer = ReceiptItemSerializer(data=request.data)
         if serializer.is_valid():
+            # ReceiptItem.save() adds the item's total to the receipt
             serializer.save(receipt=receipt)
-            # Update receipt total
-            receipt.total_amount = receipt.items.aggregate(
-                total=models.Sum('total_price')
-            )['total'] or 0
-            receipt.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class ReceiptItemViewSet(viewsets.ModelViewSet):
+class ReceiptItemViewSet(QueryShapeMixin, viewsets.ModelViewSet):
     queryset = ReceiptItem.objects.all()
     serializer_class = ReceiptItemSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['receipt', 'category', 'shipment']
+    pagination_class = KeysetPagination
+    keyset_ordering = ('receipt_id', 'id')
+
+
+class JobViewSet(QueryShapeMixin, mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """Background jobs: POST {kind, params} to queue one, then poll it for status and results"""
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['kind', 'status']
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # Staff users see every job, others only their own
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(created_by=self.request.user)
+        return queryset
+    
+    def create(self, request, *args, **kwargs):
+        if not isinstance(request.data, dict):
+            return Response({'error': 'Expected an object with kind and params'}, status=status.HTTP_400_BAD_REQUEST)
+        kind = request.data.get('kind')
+        job_type = jobs.JOB_TYPES.get(kind) if isinstance(kind, str) else None
+        if job_type is None or not job_type.public:
+            public = sorted(name for name, job_type in jobs.JOB_TYPES.items() if job_type.public)
+            return Response({'error': f"Unknown job kind: {kind}. Choose from {', '.join(public)}"},
+                          status=status.HTTP_400_BAD_REQUEST)
+        params = request.data.get('params') or {}
+        if not isinstance(params, dict):
+            return Response({'error': 'params must be an object'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            job = jobs.enqueue(kind, params, created_by=request.user)
+        except (TypeError, ValueError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Download the file a finished job produced"""
+        job = self.get_object()
+        name = (job.result or {}).get('file') if job.status == 'succeeded' else None
+        try:
+            parts = jobs.file_parts(job, name)
+        except JobFile.DoesNotExist:
+            return Response({'error': 'This job has no file to download'}, status=status.HTTP_404_NOT_FOUND)
+        content_type = exports.CONTENT_TYPES.get(name.rpartition('.')[2], 'application/octet-stream')
+        response = StreamingHttpResponse(parts, content_type=content_type)
+        response['Content-Disposition'] = content_disposition_header(True, name)
+        return response
+    
+    @action(detail=True, methods=['post'])
+    def retry(self, request, pk=None):
+        """Queue a failed job again with a fresh set of attempts"""
+        job = self.get_object()
+        if job.status != 'failed':
+            return Response({'error': 'Only failed jobs can be retried'}, status=status.HTTP_400_BAD_REQUEST)
+        job.status, job.attempts, job.run_after, job.error = 'queued', 0, timezone.now(), ''
+        job.finished_at = None
+        job.save(update_fields=['status', 'attempts', 'run_after', 'error', 'finished_at'])
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+class ContainerStatsViewSet(KeysetOrderingMixin, viewsets.ReadOnlyModelViewSet):
+    """Per-container rollups (see dashboard.py); ?ordering=container_number|cbm|revenue"""
+    queryset = ContainerStats.objects.filter(items__gt=0)
+    serializer_class = ContainerStatsSerializer
+    lookup_field = 'container_number'
+    lookup_value_regex = '[^/]+'
+    pagination_class = KeysetPagination
+    keyset_orderings = {
+        'container_number': ('container_number',),
+        'cbm': ('-cbm', '-id'),
+        'revenue': ('-revenue', '-id'),
+    }
+
+
+class CustomerStatsViewSet(QueryShapeMixin, KeysetOrderingMixin, viewsets.ReadOnlyModelViewSet):
+    """Per-customer receipt totals (see dashboard.py), looked up by customer id; ?ordering=outstanding|total"""
+    queryset = CustomerStats.objects.all()
+    serializer_class = CustomerStatsSerializer
+    lookup_field = 'customer'
+    pagination_class = KeysetPagination
+    keyset_orderings = {
+        'outstanding': ('-outstanding_amount', '-id'),
+        'total': ('-total_amount', '-id'),
+    }
@@ -12,5 +12,23 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rockman_logistics.settings')
+# The DRF API runs under WSGI (rockman_logistics.wsgi); this app only serves the async
+# read endpoints and the change stream, which need ASGI
+os.environ.setdefault('DJANGO_URLCONF', 'rockman_logistics.asgi_urls')
+# Sync code runs in a new thread for every ASGI request, so connections kept open past
+# the request would pile up instead of being reused. Keep them per request here; behind
+# Supabase's transaction pooler (DB_PGBOUNCER) that only opens a connection to the pooler.
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from logistics.async_views import cancel_on_disconnect  # noqa: E402 (needs the app registry)
+
+# Ends /changes/stream/ responses whose client went away (see cancel_on_disconnect)
+application = cancel_on_disconnect(django_application)
+
+if os.getenv('STARTUP_WARM_UP', 'True').lower() == 'true':
+    # Load the app, connect and prime caches before this process takes requests
+    from logistics.startup import warm_up_before_serving
+
+    warm_up_before_serving()
@@ -0,0 +1,17 @@
+"""
+URL configuration for the ASGI process (rockman_logistics.asgi).
+
+The DRF API is served by the WSGI app; the ASGI app only takes the async read
+endpoints and the /changes/stream/ Server-Sent Events, plus the health checks.
+"""
+from django.urls import path
+
+from logistics.urls import async_urlpatterns
+from .urls import health_check, metrics, readiness_check
+
+urlpatterns = [
+    path('health/', health_check, name='health_check'),
+    path('health/live/', health_check, name='liveness_check'),
+    path('health/ready/', readiness_check, name='readiness_check'),
+    path('metrics/', metrics, name='metrics'),
+] + async_urlpatterns
@@ -11,7 +11,10 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
 from pathlib import Path
+import importlib.util
 import os
+import tempfile
+from urllib.parse import urlsplit
 from dotenv import load_dotenv
 import dj_database_url
 
@@ -52,8 +55,10 @@ INSTALLED_APPS = [
 # Custom User Models - Using default Django User
 
 MIDDLEWARE = [
+    'logistics.middleware.PerformanceMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'logistics.middleware.ConnectionTimingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -62,7 +67,8 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'rockman_logistics.urls'
+# asgi.py switches to rockman_logistics.asgi_urls, which only has the async routes
+ROOT_URLCONF = os.getenv('DJANGO_URLCONF', 'rockman_logistics.urls')
 
 TEMPLATES = [
     {
@@ -88,15 +94,47 @@ WSGI_APPLICATION = 'rockman_logistics.wsgi.application'
 # Try Supabase URL first, fallback to local SQLite for development
 supabase_url = os.getenv('SUPABASE_DATABASE_URL') or os.getenv('SUPABASE_URL')
 
+# Connection management for PostgreSQL (Django 4.2 has no connection pool of its own):
+# - DB_CONN_MAX_AGE: seconds a connection is kept open and reused across requests
+#   (0 closes it after each request), with a liveness check before reuse
+#   (DB_CONN_HEALTH_CHECKS). The WSGI web process reuses its connections this way.
+#   Under ASGI on Django < 5.1 each request runs in a new thread, so persistent
+#   connections would leak; asgi.py defaults this to 0 for the async process.
+# - DB_PGBOUNCER: the URL points at PgBouncer/Supavisor in transaction mode, so avoid
+#   server-side cursors and prepared statements, which do not survive the pooler
+#   switching server connections between transactions. On by default for Supabase's
+#   transaction pooler (port 6543), which then keeps the server connections: the
+#   async process's per-request connections only reach the pooler.
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', '60'))
+DB_CONN_HEALTH_CHECKS = os.getenv('DB_CONN_HEALTH_CHECKS', 'True').lower() == 'true'
+DB_CONNECT_TIMEOUT = int(os.getenv('DB_CONNECT_TIMEOUT', '10'))
+TRANSACTION_POOLER_PORT = 6543
+DB_PGBOUNCER = os.getenv(
+    'DB_PGBOUNCER', str(bool(supabase_url) and urlsplit(supabase_url).port == TRANSACTION_POOLER_PORT),
+).lower() == 'true'
+# Requests waiting longer than this for connections are logged (see logistics/middleware.py)
+DB_ACQUIRE_SLOW_MS = int(os.getenv('DB_ACQUIRE_SLOW_MS', '200'))
+
 if supabase_url and supabase_url.startswith('postgresql://'):
     # Production: Use Supabase PostgreSQL
     try:
         DATABASES = {
-            'default': dj_database_url.parse(supabase_url)
+            'default': dj_database_url.parse(
+                supabase_url,
+                engine='logistics.db_backends.postgresql',
+                conn_max_age=DB_CONN_MAX_AGE,
+                conn_health_checks=DB_CONN_HEALTH_CHECKS,
+                disable_server_side_cursors=DB_PGBOUNCER,
+            )
         }
-        print(f"Connected to Supabase database: {supabase_url.split('@')[1] if '@' in supabase_url else 'Unknown'}")
     except Exception as e:
         raise ValueError(f"Error parsing Supabase URL '{supabase_url}': {e}")
+
+    db_options = DATABASES['default'].setdefault('OPTIONS', {})
+    db_options.setdefault('connect_timeout', DB_CONNECT_TIMEOUT)
+    if DB_PGBOUNCER and importlib.util.find_spec('psycopg'):
+        # psycopg 3 prepares statements it sees repeatedly; psycopg2 never does
+        db_options['prepare_threshold'] = None
 else:
     # Development: Use SQLite
     DATABASES = {
@@ -145,7 +183,7 @@ USE_TZ = True
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'logistics.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -165,3 +203,93 @@ CORS_ALLOW_CREDENTIALS = True
 
 # Allow all origins for development (remove in production)
 CORS_ALLOW_ALL_ORIGINS = True
+
+# Document number counters (see logistics/sequences.py). Values above 1 let each
+# worker reserve a block of numbers at a time for bulk imports.
+DOCUMENT_SEQUENCE_BLOCK_SIZE = int(os.getenv('DOCUMENT_SEQUENCE_BLOCK_SIZE', '1'))
+
+# Cache: Redis when REDIS_URL is set (shared between workers), otherwise per-process memory.
+# Without Redis, entries other processes must see change (category versions, tracking
+# results) are only kept briefly, so a write elsewhere shows up after a short delay.
+CACHE_SHARED = bool(os.getenv('REDIS_URL'))
+if CACHE_SHARED:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Seconds each process keeps the goods category version when the cache isn't shared
+CATEGORY_VERSION_TTL = int(os.getenv('CATEGORY_VERSION_TTL', '5'))
+
+# Seconds the dashboard statistics payload is cached (it is also invalidated on writes)
+DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', '60'))
+
+# Token authentication cache (see logistics/authentication.py): seconds a token's user is
+# kept in the shared cache, and in each process's local LRU (kept short, since other
+# processes only see a logout in their LRU once it expires). Without Redis the "shared"
+# cache is per process too, so a logout reaches other processes only by expiry and tokens
+# are kept for seconds.
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', '300' if CACHE_SHARED else '5'))
+TOKEN_CACHE_LOCAL_TTL = int(os.getenv('TOKEN_CACHE_LOCAL_TTL', '10'))
+TOKEN_CACHE_LOCAL_SIZE = int(os.getenv('TOKEN_CACHE_LOCAL_SIZE', '1024'))
+
+# Shipment tracking cache (see logistics/tracking.py): seconds a shipment's status projection
+# is kept in the shared cache, seconds an unknown tracking number is remembered, and each
+# process's LRU of hot tracking numbers. The long defaults need Redis: invalidation only
+# reaches the cache of the process that made the write, so without a shared cache entries
+# are kept for seconds.
+TRACKING_CACHE_TTL = int(os.getenv('TRACKING_CACHE_TTL', '300' if CACHE_SHARED else '5'))
+TRACKING_CACHE_MISS_TTL = int(os.getenv('TRACKING_CACHE_MISS_TTL', '30' if CACHE_SHARED else '5'))
+TRACKING_CACHE_LOCAL_TTL = int(os.getenv('TRACKING_CACHE_LOCAL_TTL', '5'))
+TRACKING_CACHE_LOCAL_SIZE = int(os.getenv('TRACKING_CACHE_LOCAL_SIZE', '2048'))
+
+# Change feed (see logistics/changes.py): whether streams wake on PostgreSQL NOTIFY (LISTEN
+# needs a session, so not through PgBouncer in transaction mode) or poll every
+# CHANGES_POLL_INTERVAL seconds; seconds a missing id holds back the entries after it;
+# seconds a stream stays open, between keep-alives, and the reconnect delay sent to clients;
+# and days of entries `manage.py prune_changes` keeps. /changes/stream/ is only served by
+# the ASGI process (the Procfile's `async`, rockman_logistics.asgi), which also ends a
+# stream as soon as its client disconnects; the WSGI app answers it with 501
+CHANGES_LISTEN = os.getenv('CHANGES_LISTEN', str(not DB_PGBOUNCER)).lower() == 'true'
+CHANGES_POLL_INTERVAL = float(os.getenv('CHANGES_POLL_INTERVAL', '1'))
+CHANGES_GAP_SECONDS = float(os.getenv('CHANGES_GAP_SECONDS', '5'))
+CHANGES_STREAM_SECONDS = int(os.getenv('CHANGES_STREAM_SECONDS', '300'))
+CHANGES_STREAM_HEARTBEAT = int(os.getenv('CHANGES_STREAM_HEARTBEAT', '15'))
+CHANGES_STREAM_RETRY_MS = int(os.getenv('CHANGES_STREAM_RETRY_MS', '3000'))
+CHANGES_RETENTION_DAYS = int(os.getenv('CHANGES_RETENTION_DAYS', '30'))
+
+# Disk cache of rendered receipt PDFs (see logistics/receipt_pdf.py), keyed by content hash
+# and kept to the most recently used RECEIPT_PDF_CACHE_MAX_FILES. Defaults to the system
+# temporary directory; RECEIPT_PDF_FONT can replace the bundled Chinese subset font.
+RECEIPT_PDF_CACHE_DIR = os.getenv('RECEIPT_PDF_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'receipt_pdfs'))
+RECEIPT_PDF_CACHE_MAX_FILES = int(os.getenv('RECEIPT_PDF_CACHE_MAX_FILES', '2000'))
+RECEIPT_PDF_FONT = os.getenv('RECEIPT_PDF_FONT', '')
+
+# Background jobs (see logistics/jobs.py). JOBS_EAGER runs jobs in the web process after
+# the request commits, in place of a `manage.py run_jobs` worker, for local development.
+# Job files live in the database; workers delete them JOB_FILES_RETENTION_DAYS after the job finishes.
+JOBS_EAGER = os.getenv('JOBS_EAGER', 'False').lower() == 'true'
+JOB_RETRY_DELAY = int(os.getenv('JOB_RETRY_DELAY', '30'))
+JOB_TIMEOUT = int(os.getenv('JOB_TIMEOUT', '3600'))
+JOB_FILES_RETENTION_DAYS = int(os.getenv('JOB_FILES_RETENTION_DAYS', '7'))
+
+# Startup warm-up (see logistics/startup.py; STARTUP_WARM_UP is read by wsgi.py/asgi.py):
+# how many recently active users' tokens to load into the token cache
+STARTUP_PRIME_TOKENS = int(os.getenv('STARTUP_PRIME_TOKENS', '100'))
+
+# Request instrumentation (see logistics/metrics.py): Server-Timing headers, the slow
+# request threshold for logging, how often one query shape may repeat in a request before
+# it is logged as a likely N+1, and the bearer token /metrics/ requires (without one it is
+# only served with DEBUG on)
+PERF_SERVER_TIMING = os.getenv('PERF_SERVER_TIMING', 'True').lower() == 'true'
+PERF_SLOW_REQUEST_MS = int(os.getenv('PERF_SLOW_REQUEST_MS', '1000'))
+PERF_REPEATED_QUERY_THRESHOLD = int(os.getenv('PERF_REPEATED_QUERY_THRESHOLD', '20'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
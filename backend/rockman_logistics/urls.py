@@ -16,17 +16,40 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
 
 def health_check(request):
-    """Simple health check endpoint that doesn't hit database"""
+    """Liveness: the process is up. Doesn't hit the database"""
     return JsonResponse({
         'status': 'healthy',
         'message': 'Backend is awake and ready'
     })
 
+def readiness_check(request):
+    """Readiness: warm-up finished and the database answers (503 until then)"""
+    from logistics import startup
+
+    ready, details = startup.readiness()
+    return JsonResponse({'status': 'ready' if ready else 'starting', **details}, status=200 if ready else 503)
+
+def metrics(request):
+    """Prometheus metrics for this process (Authorization: Bearer METRICS_TOKEN)"""
+    from logistics import metrics as request_metrics
+
+    if settings.METRICS_TOKEN:
+        if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {settings.METRICS_TOKEN}'):
+            return JsonResponse({'error': 'Invalid metrics token'}, status=401)
+    elif not settings.DEBUG:
+        return JsonResponse({'error': 'Set METRICS_TOKEN to enable metrics'}, status=403)
+    return HttpResponse(request_metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 urlpatterns = [
     path('health/', health_check, name='health_check'),
+    path('health/live/', health_check, name='liveness_check'),
+    path('health/ready/', readiness_check, name='readiness_check'),
+    path('metrics/', metrics, name='metrics'),
     path('admin/', admin.site.urls),
     path('', include('logistics.urls')),
 ]
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rockman_logistics.settings')
 
 application = get_wsgi_application()
+
+if os.getenv('STARTUP_WARM_UP', 'True').lower() == 'true':
+    # Load the app, connect and prime caches before this process takes requests
+    from logistics.startup import warm_up_before_serving
+
+    warm_up_before_serving()
@@ -3,8 +3,11 @@
 import React, { useState, useEffect } from 'react';
 import Link from 'next/link';
 import { apiCallWithWakeUp } from '../../lib/backendWakeUp';
+import { Change, subscribeToChanges } from '../../lib/changeFeed';
 
 const API_BASE_URL = 'https://rockmanchina.onrender.com';
+// The backend's ASGI process, which serves the live change stream
+const STREAM_BASE_URL = process.env.NEXT_PUBLIC_STREAM_URL || API_BASE_URL;
 
 interface StaffUser {
   id: number;
@@ -38,6 +41,7 @@ const Dashboard: React.FC = () => {
     totalReceipts: 0,
   });
   const [loading, setLoading] = useState(true);
+  const [recentChanges, setRecentChanges] = useState<Change[]>([]);
 
   useEffect(() => {
     const storedUser = localStorage.getItem('staffUser');
@@ -47,11 +51,39 @@ const Dashboard: React.FC = () => {
       const userData = JSON.parse(storedUser);
       setUser(userData);
       fetchDashboardStats(token);
+      // Keep the counts and activity current from the change feed instead of re-fetching
+      return subscribeToChanges(API_BASE_URL, token, applyChanges, () => fetchDashboardStats(token), STREAM_BASE_URL);
     } else {
       window.location.href = '/login';
     }
   }, []);
 
+  const applyChanges = (changes: Change[]) => {
+    const delta = (kind: Change['kind']) =>
+      changes.filter((change) => change.kind === kind && change.action === 'created').length -
+      changes.filter((change) => change.kind === kind && change.action === 'deleted').length;
+    const shipments = delta('shipment');
+    const receipts = delta('receipt');
+    if (shipments || receipts) {
+      setStats((current) => ({
+        ...current,
+        totalShipments: current.totalShipments + shipments,
+        totalReceipts: current.totalReceipts + receipts,
+      }));
+    }
+    setRecentChanges((current) => [...changes.slice().reverse(), ...current].slice(0, 10));
+  };
+
+  const describeChange = (change: Change) => {
+    const name = change.kind === 'shipment'
+      ? `Shipment ${change.data.tracking_number}`
+      : `Receipt ${change.data.receipt_number}`;
+    if (change.action === 'updated' && change.kind === 'shipment') {
+      return `${name} is ${String(change.data.status).replace('_', ' ')}`;
+    }
+    return `${name} ${change.action}`;
+  };
+
   const fetchDashboardStats = async (token: string) => {
     try {
       const response = await apiCallWithWakeUp(async () => {
@@ -235,6 +267,23 @@ const Dashboard: React.FC = () => {
           </div>
         </div>
 
+        {/* Recent Activity */}
+        {recentChanges.length > 0 && (
+          <div className="bg-white overflow-hidden shadow rounded-lg mb-8">
+            <div className="px-4 py-5 sm:p-6">
+              <h3 className="text-lg leading-6 font-medium text-gray-900 mb-4">Recent Activity</h3>
+              <ul className="divide-y divide-gray-200">
+                {recentChanges.map((change) => (
+                  <li key={change.id} className="py-2 flex justify-between text-sm">
+                    <span className="text-gray-900">{describeChange(change)}</span>
+                    <span className="text-gray-500">{new Date(change.created_at).toLocaleTimeString()}</span>
+                  </li>
+                ))}
+              </ul>
+            </div>
+          </div>
+        )}
+
         {/* Quick Actions */}
         <div className="bg-white overflow-hidden shadow rounded-lg">
           <div className="px-4 py-5 sm:p-6">
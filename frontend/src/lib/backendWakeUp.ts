@@ -1,13 +1,16 @@
 // Backend health check and wake-up service
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'https://rockmanchina.onrender.com';
 
-// Health check endpoint (lightweight, doesn't hit database)
-const HEALTH_CHECK_ENDPOINT = `${API_BASE_URL}/health/`;
+// Readiness endpoint: 200 once the backend has warmed up and its database answers, 503 before
+const HEALTH_CHECK_ENDPOINT = `${API_BASE_URL}/health/ready/`;
 
 // Backend wake-up state
 let isWakingUp = false;
 let lastWakeUpTime = 0;
+let lastReadyTime = 0;
 const WAKE_UP_COOLDOWN = 55000; // 55 seconds (less than Render's 60s sleep)
+// Only show the wake-up alert if the backend hasn't answered within this time
+const ALERT_DELAY = 1500;
 
 // Show user-friendly alert
 const showWakeUpAlert = () => {
@@ -84,13 +87,18 @@ const hideWakeUpAlert = () => {
 export const wakeUpBackend = async (): Promise<boolean> => {
   const now = Date.now();
   
+  // Recently confirmed ready: no need to ask again
+  if ((now - lastReadyTime) < WAKE_UP_COOLDOWN) {
+    return true;
+  }
   // Don't wake up if we're already in the process or recently did it
   if (isWakingUp || (now - lastWakeUpTime) < WAKE_UP_COOLDOWN) {
     return false;
   }
 
   isWakingUp = true;
-  showWakeUpAlert(); // Show user-friendly alert
+  // A warm backend answers well within the delay, so the alert only shows on a cold start
+  const alertTimer = setTimeout(showWakeUpAlert, ALERT_DELAY);
   
   try {
     // Simple health check request
@@ -105,9 +113,10 @@ export const wakeUpBackend = async (): Promise<boolean> => {
     if (response.ok) {
       hideWakeUpAlert(); // Hide alert when successful
       lastWakeUpTime = now;
+      lastReadyTime = Date.now();
       return true;
     } else {
-      console.log('⚠️ Backend responded but not healthy');
+      console.log('⚠️ Backend is up but still starting');
       return false;
     }
   } catch (error) {
@@ -116,6 +125,7 @@ export const wakeUpBackend = async (): Promise<boolean> => {
     lastWakeUpTime = now;
     return false; // Still return false as it's not ready yet
   } finally {
+    clearTimeout(alertTimer);
     isWakingUp = false;
   }
 };
@@ -136,6 +146,9 @@ export const checkBackendHealth = async (): Promise<boolean> => {
       signal: AbortSignal.timeout(5000), // 5 second timeout for health check
     });
 
+    if (response.ok) {
+      lastReadyTime = Date.now();
+    }
     return response.ok;
   } catch (error) {
     return false;
@@ -151,9 +164,11 @@ export const apiCallWithWakeUp = async (
     try {
       // First, try to wake up the backend if needed
       if (attempt === 0) {
-        await wakeUpBackend();
-        // Wait a moment for the backend to start
-        await new Promise(resolve => setTimeout(resolve, 2000));
+        const ready = await wakeUpBackend();
+        // Wait a moment for the backend to start, unless it already reported ready
+        if (!ready) {
+          await new Promise(resolve => setTimeout(resolve, 2000));
+        }
       }
 
       // Try the actual API call
@@ -0,0 +1,120 @@
+// Live shipment and receipt changes from the backend's change feed.
+//
+// EventSource can't send the Authorization header, so the /changes/stream/ Server-Sent
+// Events are read with fetch. The stream closes every few minutes and is reopened from
+// the last change seen; if it isn't available (a 501 from a non-ASGI server, or the
+// network drops it) the feed falls back to polling /changes/?since= with the same cursor.
+// The stream is served by the backend's separate ASGI process, so it can have its own
+// base URL (streamBaseUrl); everything else goes to baseUrl.
+
+export interface Change {
+  id: number;
+  kind: 'shipment' | 'receipt';
+  object_id: number;
+  action: 'created' | 'updated' | 'deleted';
+  data: Record<string, any>;
+  created_at: string;
+}
+
+const POLL_INTERVAL_MS = 5000;
+
+const sleep = (ms: number, signal: AbortSignal) =>
+  new Promise<void>((resolve) => {
+    const timer = setTimeout(resolve, ms);
+    signal.addEventListener('abort', () => { clearTimeout(timer); resolve(); }, { once: true });
+  });
+
+export function subscribeToChanges(
+  baseUrl: string,
+  token: string,
+  onChanges: (changes: Change[]) => void,
+  onReset?: () => void,
+  streamBaseUrl: string = baseUrl,
+): () => void {
+  const controller = new AbortController();
+  const { signal } = controller;
+  const headers = { Authorization: `Token ${token}` };
+  let cursor: number | null = null;
+  let retryMs = 3000;
+
+  const startCursor = async () => {
+    const response = await fetch(`${baseUrl}/changes/`, { headers, signal });
+    if (!response.ok) throw new Error(`changes: ${response.status}`);
+    cursor = (await response.json()).cursor;
+  };
+
+  // Pruned past our cursor: the caller reloads, and we continue from now
+  const expired = async () => {
+    cursor = null;
+    onReset?.();
+    await startCursor();
+  };
+
+  const stream = async (): Promise<boolean> => {
+    const response = await fetch(`${streamBaseUrl}/changes/stream/?since=${cursor}`, {
+      headers: { ...headers, Accept: 'text/event-stream' },
+      signal,
+    });
+    if (response.status === 410) {
+      await expired();
+      return true;
+    }
+    if (!response.ok || !response.body) return false;
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) return true;
+      buffer += decoder.decode(value, { stream: true });
+      const messages = buffer.split('\n\n');
+      buffer = messages.pop() ?? '';
+      const changes: Change[] = [];
+      for (const message of messages) {
+        let data = '';
+        for (const line of message.split('\n')) {
+          if (line.startsWith('data: ')) data += line.slice(6);
+          else if (line.startsWith('id: ')) cursor = Number(line.slice(4));
+          else if (line.startsWith('retry: ')) retryMs = Number(line.slice(7));
+        }
+        if (data) changes.push(JSON.parse(data));
+      }
+      if (changes.length) onChanges(changes);
+    }
+  };
+
+  const poll = async () => {
+    const response = await fetch(`${baseUrl}/changes/?since=${cursor}`, { headers, signal });
+    if (response.status === 410) {
+      await expired();
+      return;
+    }
+    if (!response.ok) throw new Error(`changes: ${response.status}`);
+    const page = await response.json();
+    cursor = page.cursor;
+    if (page.results.length) onChanges(page.results);
+    if (!page.has_more) await sleep(POLL_INTERVAL_MS, signal);
+  };
+
+  (async () => {
+    let streaming = true;
+    while (!signal.aborted) {
+      try {
+        if (cursor === null) await startCursor();
+        if (streaming) {
+          streaming = await stream();
+          if (streaming) await sleep(retryMs, signal);
+        } else {
+          await poll();
+        }
+      } catch (error) {
+        if (signal.aborted) return;
+        console.error('Change feed error:', error);
+        await sleep(retryMs, signal);
+      }
+    }
+  })();
+
+  return () => controller.abort();
+}